@@ -1,3 +1,4 @@
+import os
 from flask import Flask, jsonify, render_template
 import pymysql
 
@@ -7,13 +8,115 @@ app = Flask(__name__)
 # Secret key for flashing messages
 app.secret_key = 'your_very_secret_key_here' # IMPORTANT: Change this in a real application!
 
+# Storage backend (see app/repository.py):
+#   'mysql'  - the MySQL server configured below (run db_setup.py to create the schema)
+#   'sqlite' - an embedded database file at SQLITE_PATH, created on first use; for
+#              single-box installs, development and benchmarks without a server
+app.config['DB_BACKEND'] = 'mysql'
+
 # Database configuration
 app.config['MYSQL_HOST'] = 'localhost' # Explicitly use IPv4 loopback
 app.config['MYSQL_USER'] = 'root'
 app.config['MYSQL_PASSWORD'] = 'aditya'
 app.config['MYSQL_DB'] = 'tournament_db'
 
-# No global MySQL object initialization here.
-# Connections will be made on-demand using PyMySQL.
+# Connection pool settings (see app/db_utils.py).
+# Each request checks out at most one pooled connection and returns it in teardown.
+app.config['MYSQL_POOL_MIN_SIZE'] = 2 # Idle connections kept open regardless of idle timeout
+app.config['MYSQL_POOL_MAX_SIZE'] = 10 # Hard cap on open connections per process
+app.config['MYSQL_POOL_IDLE_TIMEOUT'] = 300 # Seconds before surplus idle connections are closed
+app.config['MYSQL_POOL_WAIT_TIMEOUT'] = 5 # Seconds to wait for a free connection when the pool is exhausted
+app.config['MYSQL_POOL_PING_ON_CHECKOUT'] = True # Ping reused connections and replace dead ones
+
+# SQLite backend (see app/sqlite_backend.py). The pool settings above apply to it too.
+app.config['SQLITE_PATH'] = os.path.join(app.instance_path, 'tournament.db')
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = 5000 # How long a writer waits for the write lock before failing
+app.config['SQLITE_CACHED_STATEMENTS'] = 256 # Prepared statements kept per connection
+app.config['SQLITE_CACHE_SIZE_KB'] = 65536 # Page cache per connection
+app.config['SQLITE_MMAP_SIZE'] = 268435456 # Bytes of the file read through memory mapping
+
+# How league_standings builds the table:
+#   'materialized' - read the standings table maintained on score entry (default)
+#   'sql'          - aggregate completed fixtures in the database (league_utils.calculate_standings_sql)
+#   'python'       - replay completed fixtures in Python (league_utils.calculate_standings_data, the reference)
+app.config['STANDINGS_ENGINE'] = 'materialized'
+# Tournaments per vectorized batch in rebuild-standings --batch / check-standings (needs numpy)
+app.config['STANDINGS_BATCH_TOURNAMENTS'] = 500
+
+# Season outcome odds (app/season_simulator.py, needs numpy): the remaining fixtures are
+# played SIMULATION_SEASONS times with scores sampled from each team's results so far.
+# Results are cached per tournament version (use CACHE_BACKEND='redis' to simulate once for
+# all workers); the same seed and data give the same odds.
+app.config['SIMULATION_SEASONS'] = 20000
+app.config['SIMULATION_SEED'] = 20240601
+app.config['SIMULATION_BATCH_SEASONS'] = 2000 # Seasons sampled per vectorized batch (and per worker task)
+app.config['SIMULATION_WORKERS'] = 0 # simulate-season CLI only: processes for the batches; 0 or 1 runs them in-process
+app.config['SIMULATION_PRIOR_MATCHES'] = 5 # Average-team matches blended into each team's scoring rates
+app.config['SIMULATION_RELEGATION_PLACES'] = 3 # Bottom places counted as relegation
+
+# Rows per multi-row INSERT when writing generated fixtures
+app.config['FIXTURE_INSERT_BATCH_SIZE'] = 500
+
+# Knockout generation. With KNOCKOUT_FULL_BRACKET every round is created up front and
+# winners move into their next match as results are entered (no manual "advance round").
+# KNOCKOUT_SEEDING: 'registration' (first team added is the top seed) or 'random' (random draw).
+app.config['KNOCKOUT_FULL_BRACKET'] = True
+app.config['KNOCKOUT_SEEDING'] = 'registration'
+
+# Cache for tournament pages (see app/cache.py), keyed on each tournament's data_version in the
+# database, so writes from any worker or CLI command invalidate it. 'memory' is a per-process
+# LRU; 'redis' shares entries between workers.
+app.config['CACHE_BACKEND'] = 'memory'
+app.config['CACHE_MAX_ENTRIES'] = 1024 # LRU bound for the 'memory' backend
+app.config['CACHE_TTL'] = 300 # Seconds; 0 keeps entries until evicted
+app.config['CACHE_REDIS_URL'] = 'redis://localhost:6379/0'
+
+# Conditional GET for tournament pages (see app/http_cache.py)
+app.config['HTTP_CACHE_MAX_AGE'] = 0 # Seconds downstream caches may serve a page before revalidating
+app.config['HTTP_ETAG_SALT'] = '3' # Change when templates change, so old ETags stop matching
+
+# Bulk import (see app/importer.py): rows per multi-row INSERT come from FIXTURE_INSERT_BATCH_SIZE
+app.config['IMPORT_COMMIT_EVERY'] = 10000 # Records per transaction (and checkpoint)
+app.config['IMPORT_MAX_REPORTED_ERRORS'] = 100 # Invalid records listed in the report; all are counted
+
+# Export / restore (see app/exporter.py)
+app.config['EXPORT_CHUNK_ROWS'] = 5000 # Rows fetched from the server-side cursor (and per snapshot chunk) at a time
+# Downloads (/api/v1/tournaments/<id>/export) are read into a spool before sending, so the
+# database connection is never paced by the client. Reading one may take at most
+# EXPORT_HTTP_MAX_SECONDS (503 after that: use the CLI export for such tournaments).
+app.config['EXPORT_HTTP_MAX_SECONDS'] = 30
+app.config['EXPORT_SPOOL_MEMORY_BYTES'] = 8 * 1024 * 1024 # Larger downloads are spooled to a temporary file
+
+# Tournament list pagination (dashboard and /api/v1/tournaments, see app/tournament_list.py)
+app.config['DASHBOARD_PAGE_SIZE'] = 25 # Tournaments per page; also the API's default limit
+app.config['API_MAX_PAGE_SIZE'] = 100 # Largest limit the API accepts
+
+# Logging (see app/logging_utils.py). Loggers are named per module ('app.routes', 'app.league_utils', ...)
+# and can be changed at runtime via /admin/log_levels.
+app.config['LOG_FORMAT'] = 'json' # 'json' (one object per line, with request id) or 'text'
+app.config['LOG_LEVELS'] = {
+    'app': 'INFO',
+    'app.league_utils': 'WARNING', # Set to 'DEBUG' to trace standings calculations fixture by fixture
+}
+
+# Per-request SQL profiling (see app/profiling.py): Server-Timing / X-DB-Queries headers,
+# slow-query log, N+1 detection and /admin/query_profiles.
+app.config['QUERY_PROFILING'] = True
+app.config['QUERY_SLOW_THRESHOLD_MS'] = 100 # Statements at least this slow are logged to 'app.profiling.slow'
+app.config['QUERY_REPEAT_THRESHOLD'] = 5 # Same statement this many times in one request is reported as N+1
+app.config['QUERY_PROFILE_HISTORY'] = 50 # Recent request profiles kept for /admin/query_profiles
+
+# Live score feed over Server-Sent Events (see app/live.py)
+# 'memory' fans out within one process; 'redis' (uses CACHE_REDIS_URL) reaches streams in every worker.
+app.config['LIVE_BACKEND'] = 'memory'
+app.config['LIVE_MAX_STREAMS'] = 500 # Open streams per process; each holds a server thread, further viewers get 503
+app.config['LIVE_MAX_QUEUED_EVENTS'] = 100 # Undelivered events per stream before a slow client is told to resync
+app.config['LIVE_HEARTBEAT_SECONDS'] = 15 # Keepalive comment interval on idle streams
+app.config['LIVE_RETRY_MS'] = 3000 # Reconnect delay suggested to browsers
+
+# Prometheus metrics on /metrics (see app/metrics.py)
+app.config['METRICS_ENABLED'] = True
+app.config['METRICS_LATENCY_BUCKETS'] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10) # Seconds
+app.config['METRICS_RENDER_BUCKETS'] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25) # Seconds
 
-from app import routes
+from app import logging_utils, profiling, db_utils, live, routes, api, importer, exporter, commands, metrics
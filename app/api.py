@@ -0,0 +1,295 @@
+import bisect
+import itertools
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import request, jsonify, Response
+
+from app import app
+from app import cache
+from app import db_utils
+from app import http_cache
+from app import tournament_list
+from app import standings_batch
+from app.routes import (load_tournament_page, load_standings_page, load_standings_history_page, load_season_odds_page,
+                        load_bracket_page)
+
+# Read-only JSON API, versioned under /api/v1, for scoreboards and the mobile app.
+#
+# - Errors are {"error": message} with a 4xx/5xx status.
+# - Tournament resources share the HTML pages' cached loaders and conditional GET
+#   (ETag / Last-Modified from the tournament's data_version), so polling clients
+#   mostly get 304s and never trigger a Jinja render.
+# - ?fields=id,status,score1 limits row objects to those fields (sparse fieldsets).
+# - ?encoding=columnar sends "columns" once and each row as an array instead of an
+#   object, which drops the repeated keys. All output uses compact separators.
+# - Documents are serialized row by row into a streamed response instead of being
+#   built as one string in memory.
+
+FIXTURE_FIELDS = ('id', 'round_number', 'match_number_in_round', 'status',
+                  'team1_id', 'team1_name', 'team2_id', 'team2_name',
+                  'score1', 'score2', 'winner_id', 'winner_name', 'version')
+BRACKET_FIELDS = FIXTURE_FIELDS + ('next_fixture_id',)
+STANDINGS_FIELDS = ('position', 'id', 'name', 'mp', 'w', 'd', 'l', 'gf', 'ga', 'gd', 'pts')
+ODDS_FIELDS = ('id', 'name', 'pts', 'expected_pts', 'title', 'relegation', 'positions')
+
+STREAM_BATCH_ROWS = 64 # Rows serialized per chunk written to the response
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@app.errorhandler(ApiError)
+def handle_api_error(error):
+    return api_error(error.message, error.status)
+
+
+def api_error(message, status):
+    return jsonify({'error': message}), status
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def dumps(value):
+    return json.dumps(value, separators=(',', ':'), default=_json_default)
+
+
+class RowEncoder:
+    """Projects rows onto the requested fields, as objects or (columnar) arrays."""
+
+    def __init__(self, available):
+        raw = request.args.get('fields')
+        if raw:
+            fields = [name.strip() for name in raw.split(',') if name.strip()]
+            unknown = [name for name in fields if name not in available]
+            if unknown:
+                raise ApiError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}")
+            self.fields = fields
+        else:
+            self.fields = list(available)
+
+        encoding = request.args.get('encoding', 'objects')
+        if encoding not in ('objects', 'columnar'):
+            raise ApiError("encoding must be 'objects' or 'columnar'")
+        self.columnar = encoding == 'columnar'
+
+    def head(self):
+        return {'columns': self.fields} if self.columnar else {}
+
+    def encode(self, row):
+        if self.columnar:
+            return [row.get(name) for name in self.fields]
+        return {name: row.get(name) for name in self.fields}
+
+
+def stream_document(head, key, items):
+    """
+    Streams {**head, key: [items...]} as JSON. `items` is an iterable of
+    JSON-serializable values, encoded STREAM_BATCH_ROWS at a time.
+    """
+    def generate():
+        opening = dumps(head)[:-1] # Drop the closing brace; the list follows
+        yield opening + (',' if head else '') + f'{dumps(key)}:['
+        first = True
+        iterator = iter(items)
+        while True:
+            batch = list(itertools.islice(iterator, STREAM_BATCH_ROWS))
+            if not batch:
+                break
+            chunk = ','.join(dumps(item) for item in batch)
+            yield chunk if first else ',' + chunk
+            first = False
+        yield ']}'
+    return Response(generate(), mimetype='application/json')
+
+
+def _load_page(kind, tournament_id, loader):
+    try:
+        page = cache.get_tournament_cache().get_or_compute(kind, tournament_id, lambda: loader(tournament_id))
+    except db_utils.DB_ERRORS as e:
+        raise ApiError(f"Database error: {e}", 503)
+    if page is None:
+        raise ApiError(f"Tournament {tournament_id} not found", 404)
+    return page
+
+
+def _tournament_head(tournament):
+    return {'id': tournament['id'], 'name': tournament['name'], 'format': tournament['format']}
+
+
+@app.route('/api/v1/tournaments')
+def api_list_tournaments():
+    """
+    Tournaments newest first, one keyset page at a time.
+    Query parameters: sport, format, limit (1..API_MAX_PAGE_SIZE), cursor (next_cursor of the previous page).
+    """
+    sport = request.args.get('sport') or None
+    tournament_format = request.args.get('format') or None
+    if tournament_format not in (None, 'league', 'knockout'):
+        return api_error("format must be 'league' or 'knockout'", 400)
+    try:
+        limit = int(request.args.get('limit', app.config['DASHBOARD_PAGE_SIZE']))
+    except ValueError:
+        return api_error("limit must be an integer", 400)
+    if not 1 <= limit <= app.config['API_MAX_PAGE_SIZE']:
+        return api_error(f"limit must be between 1 and {app.config['API_MAX_PAGE_SIZE']}", 400)
+
+    try:
+        connection = db_utils.get_request_connection()
+        with connection.cursor() as cursor:
+            rows, next_cursor = tournament_list.list_tournaments(
+                cursor, sport=sport, tournament_format=tournament_format,
+                after=request.args.get('cursor') or None, limit=limit)
+            total = tournament_list.count_tournaments(cursor, sport=sport, tournament_format=tournament_format)
+    except tournament_list.InvalidCursor as e:
+        return api_error(str(e), 400)
+    except db_utils.DB_ERRORS as e:
+        return api_error(f"Database error: {e}", 503)
+
+    return jsonify({
+        'tournaments': [
+            {
+                'id': row['id'],
+                'name': row['name'],
+                'sport': row['sport'],
+                'format': row['format'],
+                'created_at': row['created_at'].isoformat(),
+            }
+            for row in rows
+        ],
+        'total': total,
+        'next_cursor': next_cursor,
+    })
+
+
+@app.route('/api/v1/tournaments/<int:tournament_id>/fixtures')
+@http_cache.conditional_tournament_get
+def api_tournament_fixtures(tournament_id):
+    """Fixtures grouped by round: {"tournament", "rounds": [{"round", "fixtures": [...]}]}."""
+    encoder = RowEncoder(FIXTURE_FIELDS)
+    page = _load_page('tournament', tournament_id, load_tournament_page)
+    rounds = (
+        {'round': round_number, 'fixtures': [encoder.encode(fixture) for fixture in fixtures]}
+        for round_number, fixtures in itertools.groupby(page['fixtures'], key=lambda fixture: fixture['round_number'])
+    )
+    return stream_document({'tournament': _tournament_head(page['tournament']), **encoder.head()}, 'rounds', rounds)
+
+
+@app.route('/api/v1/tournaments/<int:tournament_id>/standings')
+@http_cache.conditional_tournament_get
+def api_tournament_standings(tournament_id):
+    """League table rows in ranking order: {"tournament", "rules", "standings": [...]}."""
+    encoder = RowEncoder(STANDINGS_FIELDS)
+    page = _load_page('standings', tournament_id, load_standings_page)
+    if page['tournament']['format'] != 'league':
+        raise ApiError("Standings are only available for league tournaments", 404)
+    rows = (encoder.encode({**row, 'position': position}) for position, row in enumerate(page['standings'], start=1))
+    return stream_document({'tournament': _tournament_head(page['tournament']), 'rules': page['rules'], **encoder.head()},
+                           'standings', rows)
+
+
+@app.route('/api/v1/tournaments/<int:tournament_id>/standings/history')
+@http_cache.conditional_tournament_get
+def api_tournament_standings_history(tournament_id):
+    """
+    The league table as it stood after round N (?round=N, default the latest round):
+    {"tournament", "round", "rounds": [rounds with results], "standings": [...]}.
+    Rounds without results of their own show the table of the last round before them.
+    """
+    encoder = RowEncoder(STANDINGS_FIELDS)
+    page = _load_page('standings_history', tournament_id, load_standings_history_page)
+    if page['tournament']['format'] != 'league':
+        raise ApiError("Standings are only available for league tournaments", 404)
+    if not page['rounds']:
+        raise ApiError("No results have been entered yet", 404)
+    try:
+        round_number = int(request.args.get('round', page['rounds'][-1]))
+    except ValueError:
+        raise ApiError("round must be an integer")
+    position = bisect.bisect_right(page['rounds'], round_number) # Snapshots up to and including round N
+    if position == 0:
+        raise ApiError(f"No results up to round {round_number}; the first round with results is {page['rounds'][0]}", 404)
+    standings = page['tables'][position - 1]
+    rows = (encoder.encode({**row, 'position': index}) for index, row in enumerate(standings, start=1))
+    head = {'tournament': _tournament_head(page['tournament']), 'round': page['rounds'][position - 1],
+            'rounds': page['rounds'], **encoder.head()}
+    return stream_document(head, 'standings', rows)
+
+
+@app.route('/api/v1/tournaments/<int:tournament_id>/standings/positions')
+@http_cache.conditional_tournament_get
+def api_tournament_positions(tournament_id):
+    """
+    Each team's league position after every round with results, for position-over-time
+    charts: {"tournament", "rounds": [...], "teams": [{"id", "name", "positions": [...]}]},
+    positions aligned with rounds. ?team_id=N returns that team only.
+    """
+    page = _load_page('standings_history', tournament_id, load_standings_history_page)
+    if page['tournament']['format'] != 'league':
+        raise ApiError("Standings are only available for league tournaments", 404)
+    team_id = request.args.get('team_id', type=int)
+    # Teams in the order of the latest table
+    teams = page['tables'][-1] if page['tables'] else []
+    if team_id is not None:
+        teams = [team for team in teams if team['id'] == team_id]
+        if not teams:
+            raise ApiError(f"Team {team_id} is not in tournament {tournament_id}", 404)
+    items = ({'id': team['id'], 'name': team['name'], 'positions': page['positions'][team['id']]} for team in teams)
+    return stream_document({'tournament': _tournament_head(page['tournament']), 'rounds': page['rounds']}, 'teams', items)
+
+
+@app.route('/api/v1/tournaments/<int:tournament_id>/standings/odds')
+@http_cache.conditional_tournament_get
+def api_tournament_odds(tournament_id):
+    """
+    Simulated season outcomes, teams in current table order: {"tournament", "seasons",
+    "seed", "remaining_fixtures", "relegation_places", "teams": [...]}, each team's
+    "positions" the probability of finishing 1st, 2nd, ... Needs numpy on the server.
+    """
+    if not standings_batch.available():
+        raise ApiError("Season odds are not available on this server (numpy is not installed)", 501)
+    encoder = RowEncoder(ODDS_FIELDS)
+    page = _load_page('season_odds', tournament_id, load_season_odds_page)
+    if page['tournament']['format'] != 'league':
+        raise ApiError("Season odds are only available for league tournaments", 404)
+    odds = page['odds']
+    head = {'tournament': _tournament_head(page['tournament']),
+            **{key: odds[key] for key in ('seasons', 'seed', 'remaining_fixtures', 'relegation_places')},
+            **encoder.head()}
+    return stream_document(head, 'teams', (encoder.encode(team) for team in odds['teams']))
+
+
+@app.route('/api/v1/tournaments/<int:tournament_id>/bracket')
+@http_cache.conditional_tournament_get
+def api_tournament_bracket(tournament_id):
+    """Knockout bracket state: {"tournament", "current_round", "champion", ..., "rounds": [...]}."""
+    encoder = RowEncoder(BRACKET_FIELDS)
+    page = _load_page('bracket', tournament_id, load_bracket_page)
+    if page['tournament']['format'] != 'knockout':
+        raise ApiError("Brackets are only available for knockout tournaments", 404)
+    state = page['bracket_state']
+    head = {
+        'tournament': _tournament_head(page['tournament']),
+        'current_round': state['current_round'],
+        'current_round_complete': state['current_round_complete'],
+        'champion': state['champion'],
+        'can_advance': state['can_advance'],
+        'is_full_bracket': state['is_full_bracket'],
+        **encoder.head(),
+    }
+    rounds = (
+        {'round': round_number, 'fixtures': [encoder.encode(fixture) for fixture in state['rounds'][round_number]]}
+        for round_number in sorted(state['rounds'])
+    )
+    return stream_document(head, 'rounds', rounds)
@@ -0,0 +1,51 @@
+def compute_bracket_state(fixtures):
+    """
+    Derives everything the bracket page and advance_knockout_round need from a
+    single list of a tournament's fixtures, instead of querying for it again.
+    Each fixture needs round_number, status, winner_id, winner_name and
+    next_fixture_id; the list is expected in (round_number, match_number_in_round) order.
+
+    Returns a dict with:
+      'rounds'                 {round_number: [fixture, ...]}
+      'current_round'          highest round that has fixtures (0 if none)
+      'current_round_complete' every fixture of current_round is Completed
+      'winners'                [{'id', 'name'}] of current_round, ordered by id
+      'champion'               {'id', 'name'} once the tournament is decided, else None
+      'can_advance'            a next round can be generated from 'winners'
+      'is_full_bracket'        all rounds were created up front (winners move up on their own)
+    """
+    rounds = {}
+    for fixture in fixtures:
+        rounds.setdefault(fixture['round_number'], []).append(fixture)
+
+    state = {
+        'rounds': rounds,
+        'current_round': 0,
+        'current_round_complete': False,
+        'winners': [],
+        'champion': None,
+        'can_advance': False,
+        'is_full_bracket': any(fixture['next_fixture_id'] is not None for fixture in fixtures),
+    }
+    if not rounds:
+        return state
+
+    current_round = max(rounds)
+    current_fixtures = rounds[current_round]
+    state['current_round'] = current_round
+    state['current_round_complete'] = all(fixture['status'] == 'Completed' for fixture in current_fixtures)
+
+    winners = {}
+    for fixture in current_fixtures:
+        if fixture['winner_id'] is not None:
+            winners[fixture['winner_id']] = {'id': fixture['winner_id'], 'name': fixture['winner_name']}
+    state['winners'] = [winners[winner_id] for winner_id in sorted(winners)]
+
+    if state['current_round_complete']:
+        if len(state['winners']) == 1:
+            state['champion'] = state['winners'][0]
+        elif len(state['winners']) > 1 and not state['is_full_bracket']:
+            # A full bracket's last round is the final, so it never needs advancing
+            state['can_advance'] = True
+
+    return state
@@ -0,0 +1,213 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g
+
+from app import app
+from app import db_utils
+
+# Result cache for the read-heavy tournament pages (standings, bracket, tournament view).
+#
+# Entries are keyed by page kind, tournament id and the tournament's version in the
+# database (tournaments.uid, data_version and updated_at), e.g.
+# 'standings:12:3f0c9a2e71b4d685.v7.1718000000'. The uid keeps a tournament that later
+# gets the same id (after a delete or a restore) from reading the old one's entries.
+# db_utils.touch_tournament moves that version inside every write transaction, in
+# whichever process makes the write (a server worker, the CLI, an import), so stale
+# entries are never read again by anyone and simply age out of the LRU (or expire by
+# TTL); nothing has to be deleted or scanned on invalidation. Reading the version costs
+# one primary-key lookup per page; conditional GETs pass the marker they already read.
+#
+# Backends implement CacheBackend. LRUCacheBackend lives in this process;
+# RedisCacheBackend lets several workers share entries.
+
+
+class CacheBackend:
+    """Interface for cache storage. Entry values are arbitrary picklable objects, never None."""
+
+    def get(self, key):
+        """Returns the stored value, or None on a miss (absent or expired)."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class LRUCacheBackend(CacheBackend):
+    """In-process LRU cache bounded by entry count, with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict() # key -> (expires_at or None, value); most recent last
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'default_ttl': self.default_ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+            }
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared backend for multi-worker deployments. Needs the optional 'redis' package.
+    Bounds and eviction are Redis' own (configure maxmemory with an LRU policy);
+    hit/miss counters here are per worker process.
+    """
+
+    def __init__(self, url, default_ttl=300, key_prefix='tosports:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND = 'redis' requires the 'redis' package (pip install redis)") from e
+        self._client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.key_prefix = key_prefix
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        raw = self._client.get(self.key_prefix + key)
+        with self._lock:
+            if raw is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self._client.set(self.key_prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=ttl or None)
+
+    def delete(self, key):
+        self._client.delete(self.key_prefix + key)
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'redis', 'default_ttl': self.default_ttl, 'hits': self._hits, 'misses': self._misses}
+
+
+class TournamentCache:
+    """Version-keyed cache of per-tournament page data on top of a CacheBackend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def version(self, tournament_id, marker=None):
+        """
+        The tournament's current version as a key part, from its tournament_marker row
+        (read from the database unless the caller has it), or None if it does not exist.
+        Inside a conditional GET the marker its ETag was made from is used.
+        """
+        if marker is None and g.get('tournament_marker', (None,))[0] == tournament_id:
+            marker = g.tournament_marker[1]
+        if marker is None:
+            connection = db_utils.get_request_connection()
+            with connection.cursor() as cursor:
+                marker = db_utils.repository().tournament_marker(cursor, tournament_id)
+            if marker is None:
+                return None
+        return f"{marker['uid']}.v{marker['data_version']}.{int(marker['updated_ts'])}"
+
+    def get_or_compute(self, kind, tournament_id, compute):
+        """
+        Returns the cached value for (kind, tournament_id) at the tournament's current
+        version, or calls compute() and caches what it returns. A None result
+        (e.g. tournament not found) is returned but not cached.
+        """
+        version = self.version(tournament_id)
+        if version is None:
+            return compute() # No such tournament (or just deleted): nothing to key on
+        key = f"{kind}:{tournament_id}:{version}"
+        value = self.backend.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.backend.set(key, value)
+        return value
+
+    def list_version(self, cursor):
+        # list_versions.tournaments moves in every transaction that creates or deletes a tournament
+        return f"v{db_utils.repository().tournament_list_version(cursor)}"
+
+    def get_or_compute_list(self, kind, params, compute, cursor):
+        """Like get_or_compute, for values derived from the whole tournament list (e.g. counts per filter)."""
+        key = f"list_{kind}:{'|'.join(map(str, params))}:{self.list_version(cursor)}"
+        value = self.backend.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.backend.set(key, value)
+        return value
+
+    def stats(self):
+        return self.backend.stats()
+
+
+_tournament_cache = None
+_tournament_cache_lock = threading.Lock()
+
+
+def get_tournament_cache():
+    """Returns the process-wide TournamentCache, built from app.config on first use."""
+    global _tournament_cache
+    if _tournament_cache is None:
+        with _tournament_cache_lock:
+            if _tournament_cache is None:
+                if app.config['CACHE_BACKEND'] == 'redis':
+                    backend = RedisCacheBackend(app.config['CACHE_REDIS_URL'], default_ttl=app.config['CACHE_TTL'])
+                else:
+                    backend = LRUCacheBackend(max_entries=app.config['CACHE_MAX_ENTRIES'], default_ttl=app.config['CACHE_TTL'])
+                _tournament_cache = TournamentCache(backend)
+    return _tournament_cache
@@ -0,0 +1,193 @@
+import os
+import time
+
+import click
+
+from app import app
+from app import db_utils
+from app import exporter
+from app import importer
+from app import season_simulator
+from app import standings_batch
+from app import standings_store
+from app.routes import build_standings
+
+# Maintenance commands, run with the Flask CLI, e.g.:
+#   flask --app run rebuild-standings
+#   flask --app run rebuild-standings 42
+#   flask --app run rebuild-standings --batch
+#   flask --app run check-standings
+#   flask --app run simulate-season 42 --seasons 100000 --workers 4
+#   flask --app run import results seasons.csv --create-missing-teams
+#   flask --app run export --format snapshot archive.tosnap.gz
+#   flask --app run restore archive.tosnap.gz
+
+
+@app.cli.command('rebuild-standings')
+@click.argument('tournament_id', type=int, required=False)
+@click.option('--batch', is_flag=True,
+              help="Use the vectorized engine, STANDINGS_BATCH_TOURNAMENTS tournaments per transaction (needs numpy).")
+def rebuild_standings_command(tournament_id, batch):
+    """Recompute the stored league table for one tournament, or for every league tournament."""
+    connection = db_utils.get_request_connection()
+    with connection.cursor() as cursor:
+        if tournament_id is None:
+            tournament_ids = db_utils.repository().league_tournament_ids(cursor)
+        else:
+            tournament_ids = [tournament_id]
+
+        if batch:
+            if not standings_batch.available():
+                raise click.ClickException("--batch requires the 'numpy' package (pip install numpy)")
+            started = time.perf_counter()
+            row_count = 0
+            for standings in standings_batch.iter_standings_batches(cursor, tournament_ids):
+                row_count += standings_store.replace_standings(cursor, standings)
+                for t_id in standings:
+                    db_utils.touch_tournament(cursor, t_id)
+                connection.commit()
+            click.echo(f"Rebuilt {row_count} standings rows for {len(tournament_ids)} tournament(s) "
+                       f"in {time.perf_counter() - started:.1f}s.")
+            return
+
+        for t_id in tournament_ids:
+            row_count = standings_store.rebuild_standings(cursor, t_id)
+            db_utils.touch_tournament(cursor, t_id)
+            connection.commit() # One transaction per tournament keeps lock time short
+            click.echo(f"Tournament {t_id}: rebuilt {row_count} standings rows.")
+
+
+def _standings_differences(reference, candidate):
+    # Rows must match per team, and the ranking must be the same. Every engine ranks
+    # with league_utils.rank_standings, so even full ties are in the same order.
+    columns = standings_store.STANDINGS_COLUMNS
+    ref_rows = {row['id']: tuple(row[c] for c in columns) for row in reference}
+    cand_rows = {row['id']: tuple(row[c] for c in columns) for row in candidate}
+    differences = [team_id for team_id in ref_rows.keys() | cand_rows.keys()
+                   if ref_rows.get(team_id) != cand_rows.get(team_id)]
+    ref_order = [row['id'] for row in reference]
+    cand_order = [row['id'] for row in candidate]
+    return differences, ref_order != cand_order
+
+
+@app.cli.command('check-standings')
+@click.argument('tournament_id', type=int, required=False)
+def check_standings_command(tournament_id):
+    """Check that the SQL, materialized (and, with numpy, batch) standings engines match the Python reference."""
+    connection = db_utils.get_request_connection()
+    failures = 0
+    with connection.cursor() as cursor:
+        if tournament_id is None:
+            tournament_ids = db_utils.repository().league_tournament_ids(cursor)
+        else:
+            tournament_ids = [tournament_id]
+
+        batches = standings_batch.iter_standings_batches(cursor, tournament_ids) if standings_batch.available() else ()
+        batch_standings = {}
+        for standings in batches:
+            batch_standings.update(standings)
+
+        for t_id in tournament_ids:
+            reference = build_standings(cursor, t_id, engine='python')
+            candidates = [(engine, build_standings(cursor, t_id, engine=engine)) for engine in ('sql', 'materialized')]
+            if t_id in batch_standings:
+                candidates.append(('batch', batch_standings[t_id]))
+            for engine, candidate in candidates:
+                differences, order_differs = _standings_differences(reference, candidate)
+                if differences or order_differs:
+                    failures += 1
+                    click.echo(f"Tournament {t_id}: '{engine}' engine differs from 'python' "
+                               f"(teams {sorted(differences)}, ranking differs: {order_differs})")
+    click.echo(f"Checked {len(tournament_ids)} tournament(s), {failures} mismatch(es).")
+    if failures:
+        raise SystemExit(1)
+
+
+@app.cli.command('simulate-season')
+@click.argument('tournament_id', type=int)
+@click.option('--seasons', type=int, default=None, help="Simulated seasons (default: SIMULATION_SEASONS).")
+@click.option('--seed', type=int, default=None, help="Random seed (default: SIMULATION_SEED).")
+@click.option('--workers', type=int, default=None, help="Worker processes (default: SIMULATION_WORKERS).")
+def simulate_season_command(tournament_id, seasons, seed, workers):
+    """Print each team's title and relegation odds from the remaining fixtures (needs numpy)."""
+    if not standings_batch.available():
+        raise click.ClickException("simulate-season requires the 'numpy' package (pip install numpy)")
+    connection = db_utils.get_request_connection()
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        odds = season_simulator.load_season_odds(
+            cursor, tournament_id, seasons=seasons, seed=seed,
+            workers=app.config['SIMULATION_WORKERS'] if workers is None else workers)
+    click.echo(f"{odds['seasons']:,} seasons (seed {odds['seed']}), {odds['remaining_fixtures']} fixture(s) left, "
+               f"in {time.perf_counter() - started:.1f}s.")
+    click.echo(f"{'Team':<30} {'Pts':>4} {'xPts':>6} {'Title':>7} {'Releg.':>7}")
+    for team in odds['teams']:
+        click.echo(f"{team['name'][:30]:<30} {team['pts']:>4} {team['expected_pts']:>6.1f} "
+                   f"{team['title']:>7.1%} {team['relegation']:>7.1%}")
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(importer.IMPORT_KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'data_format', type=click.Choice(importer.IMPORT_FORMATS), default=None,
+              help="Input format (default: from the file extension).")
+@click.option('--import-key', default=None, help="Checkpoint name (default: KIND:file name:content hash).")
+@click.option('--create-missing-teams', is_flag=True, help="Add unknown team names in results as participants.")
+@click.option('--restart', is_flag=True, help="Ignore the checkpoint of an earlier run and start from the first record.")
+def import_command(kind, path, data_format, import_key, create_missing_teams, restart):
+    """Stream participants or historical results from a CSV / NDJSON file into the database."""
+    if import_key is None:
+        with open(path, 'rb') as binary:
+            import_key = importer.default_import_key(kind, os.path.basename(path), binary)
+    connection = db_utils.get_request_connection()
+    if restart:
+        importer.reset_checkpoint(connection, import_key)
+
+    def progress(report):
+        click.echo(f"  {report.records:,} records, {report.records_per_second:,.0f} records/s")
+
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        records = importer.read_records(stream, data_format or importer.detect_format(path))
+        report = importer.Importer(connection, kind, import_key, create_missing_teams=create_missing_teams,
+                                   progress=progress).run(records)
+
+    if report.resumed_from:
+        click.echo(f"Resumed after record {report.resumed_from:,} (checkpoint '{import_key}').")
+    click.echo(f"Imported {report.participants_inserted:,} participant(s) and {report.fixtures_inserted:,} fixture(s) "
+               f"from {report.records:,} records in {report.elapsed:.1f}s ({report.records_per_second:,.0f} records/s); "
+               f"{report.duplicates:,} duplicate(s), {report.invalid:,} invalid.")
+    for record_number, message in report.errors:
+        click.echo(f"  record {record_number}: {message}")
+
+
+@app.cli.command('export')
+@click.argument('output', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--tournament', 'tournament_ids', type=int, multiple=True, help="Export only this tournament (repeatable).")
+@click.option('--format', 'data_format', type=click.Choice(exporter.EXPORT_FORMATS), default='ndjson')
+@click.option('--gzip', 'compress', is_flag=True, help="Compress NDJSON output (snapshots are always compressed).")
+def export_command(output, tournament_ids, data_format, compress):
+    """Stream tournaments, participants and fixtures to OUTPUT ('-' for stdout)."""
+    connection = db_utils.get_request_connection()
+    lines = exporter.iter_export(connection, data_format, list(tournament_ids) or None)
+    started = time.perf_counter()
+    if data_format == 'snapshot' or compress:
+        with click.open_file(output, 'wb') as out:
+            for chunk in exporter.gzip_chunks(lines):
+                out.write(chunk)
+    else:
+        with click.open_file(output, 'w', encoding='utf-8') as out:
+            out.writelines(lines)
+    if output != '-':
+        click.echo(f"Exported to {output} in {time.perf_counter() - started:.1f}s ({os.path.getsize(output):,} bytes).")
+
+
+@app.cli.command('restore')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def restore_command(path):
+    """Load an export (NDJSON or snapshot, gzip or not) into an empty database."""
+    connection = db_utils.get_request_connection()
+    started = time.perf_counter()
+    with exporter.open_export_file(path) as lines:
+        counts = exporter.restore(connection, lines, progress=lambda counts: click.echo(f"  {counts}"))
+    click.echo(f"Restored {', '.join(f'{rows:,} {table}' for table, rows in counts.items())} "
+               f"in {time.perf_counter() - started:.1f}s.")
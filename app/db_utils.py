@@ -0,0 +1,277 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+from flask import g
+
+from app import app
+from app import profiling
+from app import repository as repositories
+from app import sqlite_backend
+
+# Errors any storage backend raises; catch these rather than one driver's base class
+DB_ERRORS = (pymysql.MySQLError, sqlite3.Error)
+
+
+class PoolTimeoutError(pymysql.err.OperationalError):
+    """Raised when every pooled connection stayed checked out for longer than the wait timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded pool of database connections: PyMySQL's, or sqlite_backend's when
+    a different `connect` function is given.
+
+    - At most `max_size` connections are open at once (idle + checked out).
+    - Up to `min_size` idle connections are kept regardless of age; idle
+      connections above that are closed once they exceed `idle_timeout` seconds.
+    - When the pool is exhausted, acquire() waits up to `wait_timeout` seconds
+      for a connection to be released before raising PoolTimeoutError.
+    - With `ping_on_checkout`, reused connections are pinged and transparently
+      replaced if the server dropped them (e.g. MySQL's own wait_timeout).
+    """
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10, idle_timeout=300,
+                 wait_timeout=5, ping_on_checkout=True, connect=pymysql.connect):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool bounds: min_size={min_size}, max_size={max_size}")
+        self.connect_kwargs = connect_kwargs
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.ping_on_checkout = ping_on_checkout
+
+        self._idle = deque()  # (connection, released_at); newest on the right
+        self._size = 0        # open connections, idle + checked out
+        self._cond = threading.Condition()
+        self._counters = {
+            'checkouts': 0, 'connections_created': 0, 'connections_reused': 0,
+            'closed_idle': 0, 'closed_dead': 0, 'waits': 0, 'timeouts': 0,
+        }
+
+    def _connect(self):
+        connection = self.connect(**self.connect_kwargs)
+        with self._cond:
+            self._counters['connections_created'] += 1
+        return connection
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _reap_idle_locked(self, now):
+        # Oldest idle connections sit on the left; keep min_size of them no matter how old.
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            self._counters['closed_idle'] += 1
+            self._close_quietly(connection)
+
+    def warm(self):
+        """Open connections until min_size are idle. Connection errors are left to the caller."""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size or self._size >= self.max_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            self.release(connection)
+
+    def acquire(self):
+        deadline = None
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._reap_idle_locked(now)
+                if self._idle:
+                    connection, _ = self._idle.pop()  # LIFO: most recently used is least likely to be stale
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # reserve the slot, connect outside the lock
+                    connection = None
+                    break
+                if deadline is None:
+                    deadline = now + self.wait_timeout
+                    self._counters['waits'] += 1
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available within {self.wait_timeout}s "
+                        f"(pool max_size={self.max_size})")
+                self._cond.wait(remaining)
+            self._counters['checkouts'] += 1
+
+        if connection is not None:
+            if not self.ping_on_checkout:
+                with self._cond:
+                    self._counters['connections_reused'] += 1
+                return connection
+            try:
+                connection.ping(reconnect=False)
+                with self._cond:
+                    self._counters['connections_reused'] += 1
+                return connection
+            except DB_ERRORS:
+                self._close_quietly(connection)
+                with self._cond:
+                    self._counters['closed_dead'] += 1
+                # Fall through and replace it, keeping the reserved slot.
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    @staticmethod
+    def _in_transaction(connection):
+        if isinstance(connection, sqlite_backend.SQLiteConnection):
+            return connection.in_transaction
+        return bool(connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+
+    def release(self, connection):
+        healthy = connection.open
+        if healthy and self._in_transaction(connection):
+            # Never hand an open transaction (or a stale REPEATABLE READ snapshot) to the next request.
+            try:
+                connection.rollback()
+            except DB_ERRORS:
+                healthy = False
+        with self._cond:
+            if healthy:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._size -= 1
+                self._counters['closed_dead'] += 1
+                self._close_quietly(connection)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                connection, _ = self._idle.popleft()
+                self._size -= 1
+                self._close_quietly(connection)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            stats = {
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'idle_timeout': self.idle_timeout,
+                'wait_timeout': self.wait_timeout,
+            }
+            stats.update(self._counters)
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide pool, creating it from app.config on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if app.config['DB_BACKEND'] == 'sqlite':
+                    os.makedirs(os.path.dirname(os.path.abspath(app.config['SQLITE_PATH'])), exist_ok=True)
+                    connect = sqlite_backend.connect
+                    connect_kwargs = {'database': app.config['SQLITE_PATH']}
+                else:
+                    connect = pymysql.connect
+                    connect_kwargs = {
+                        'host': app.config['MYSQL_HOST'],
+                        'user': app.config['MYSQL_USER'],
+                        'password': app.config['MYSQL_PASSWORD'],
+                        'database': app.config['MYSQL_DB'],
+                        'charset': 'utf8mb4',
+                        'cursorclass': profiling.cursor_class(),
+                    }
+                pool = ConnectionPool(
+                    connect_kwargs=connect_kwargs,
+                    connect=connect,
+                    min_size=app.config['MYSQL_POOL_MIN_SIZE'],
+                    max_size=app.config['MYSQL_POOL_MAX_SIZE'],
+                    idle_timeout=app.config['MYSQL_POOL_IDLE_TIMEOUT'],
+                    wait_timeout=app.config['MYSQL_POOL_WAIT_TIMEOUT'],
+                    ping_on_checkout=app.config['MYSQL_POOL_PING_ON_CHECKOUT'],
+                )
+                try:
+                    pool.warm()
+                except DB_ERRORS:
+                    pass  # The first acquire() will surface the error to the request.
+                _pool = pool
+    return _pool
+
+
+_repository = None
+
+
+def repository():
+    """The data access object for DB_BACKEND (see app/repository.py)."""
+    global _repository
+    if _repository is None or _repository.backend != app.config['DB_BACKEND']:
+        _repository = repositories.REPOSITORIES[app.config['DB_BACKEND']]()
+    return _repository
+
+
+def get_request_connection():
+    """
+    Returns the connection bound to the current request, checking one out of
+    the pool on first use. It goes back to the pool in teardown, so routes
+    must not close it themselves.
+    """
+    if 'db_connection' not in g:
+        g.db_connection = get_pool().acquire()
+    return g.db_connection
+
+
+@app.teardown_appcontext
+def release_request_connection(exception=None):
+    connection = g.pop('db_connection', None)
+    if connection is not None:
+        get_pool().release(connection)
+
+
+def touch_tournament(cursor, tournament_id):
+    """
+    Marks a tournament's data as changed. Call it inside the transaction that
+    changes its teams or fixtures (just before commit, to keep the row lock short):
+    data_version and updated_at drive the pages' ETag and Last-Modified headers.
+    Returns the new data_version (None if there is no such tournament), read under
+    the same row lock, so it is this write's version even if another commits next:
+    the id to publish the write's live events with.
+    """
+    cursor.execute("""
+        UPDATE tournaments
+        SET data_version = data_version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+    """, (tournament_id,))
+    cursor.execute("SELECT data_version FROM tournaments WHERE id = %s", (tournament_id,))
+    row = cursor.fetchone()
+    return row['data_version'] if row else None
@@ -0,0 +1,296 @@
+import gzip
+import json
+import logging
+import tempfile
+import time
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import request, jsonify, Response
+
+from app import app
+from app import db_utils
+from app import profiling
+from app import repository
+from app import standings_store
+
+# Tournament export and restore.
+#
+# Rows are read with a server-side (unbuffered) cursor, EXPORT_CHUNK_ROWS at a
+# time, and written out as they arrive, so an export holds one chunk in memory
+# whatever the size of the database. Tables are read one after another: an
+# unbuffered result must be consumed before the connection can run the next query.
+#
+# Two formats, both line-oriented text (optionally gzip-compressed):
+#   ndjson    one JSON object per row: {"table": "fixtures", "row": {...}}
+#   snapshot  one JSON object per chunk, stored column by column:
+#             {"table": "fixtures", "columns": [...], "data": [[ids...], [rounds...], ...]}
+#             Repeated keys disappear and similar values sit together, so gzip
+#             compresses it several times better than NDJSON. Written as .tosnap.gz.
+# Both start with a header line and end with a footer carrying row counts, which
+# restore() checks to detect truncated files.
+#
+# Standings are not exported; restore() rebuilds them for league tournaments.
+
+log = logging.getLogger(__name__)
+
+EXPORT_FORMAT_NAME = 'tosports-export'
+EXPORT_FORMAT_VERSION = 1
+EXPORT_FORMATS = ('ndjson', 'snapshot')
+
+# (table, columns, column the tournament filter applies to), in restore order
+EXPORT_TABLES = (
+    ('tournaments', ('id', 'name', 'sport', 'format', 'created_at', 'data_version', 'updated_at',
+                     'points_win', 'points_draw', 'points_loss', 'tiebreakers'), 'id'),
+    ('participants', ('id', 'tournament_id', 'name'), 'tournament_id'),
+    ('fixtures', ('id', 'tournament_id', 'round_number', 'match_number_in_round', 'team1_id', 'team2_id',
+                  'status', 'score1', 'score2', 'winner_id', 'next_fixture_id', 'next_slot'), 'tournament_id'),
+)
+EXPORT_COLUMNS = {table: columns for table, columns, _ in EXPORT_TABLES}
+# Values for NOT NULL columns that exports made before they existed do not carry
+EXPORT_DEFAULTS = {'points_win': 3, 'points_draw': 1, 'points_loss': 0, 'tiebreakers': 'gd,gf'}
+
+
+class RestoreError(ValueError):
+    pass
+
+
+def _plain(value):
+    # MySQL accepts 'YYYY-MM-DD HH:MM:SS' strings back for DATETIME / TIMESTAMP columns
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def stream_table(connection, table, columns, filter_column, tournament_ids=None):
+    """Yields lists of up to EXPORT_CHUNK_ROWS row tuples, read with an unbuffered cursor."""
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    params = []
+    if tournament_ids:
+        sql += f" WHERE {filter_column} IN ({', '.join(['%s'] * len(tournament_ids))})"
+        params = list(tournament_ids)
+    sql += " ORDER BY id"
+    chunk_rows = app.config['EXPORT_CHUNK_ROWS']
+    with connection.cursor(profiling.streaming_cursor_class()) as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield [tuple(_plain(row[column]) for column in columns) for row in rows]
+
+
+def iter_export(connection, data_format='ndjson', tournament_ids=None):
+    """Yields the export as text lines (each ending in a newline)."""
+    if data_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {data_format}")
+    started = time.perf_counter()
+    yield _dumps({'format': EXPORT_FORMAT_NAME, 'version': EXPORT_FORMAT_VERSION, 'encoding': data_format,
+                  'tournament_ids': sorted(tournament_ids) if tournament_ids else None}) + '\n'
+    counts = {}
+    for table, columns, filter_column in EXPORT_TABLES:
+        counts[table] = 0
+        for rows in stream_table(connection, table, columns, filter_column, tournament_ids):
+            counts[table] += len(rows)
+            if data_format == 'ndjson':
+                yield ''.join(_dumps({'table': table, 'row': dict(zip(columns, row))}) + '\n' for row in rows)
+            else:
+                yield _dumps({'table': table, 'columns': columns, 'data': [list(values) for values in zip(*rows)]}) + '\n'
+    yield _dumps({'end': True, 'rows': counts}) + '\n'
+    log.info("Exported %s rows as %s in %.1fs", counts, data_format, time.perf_counter() - started)
+
+
+def gzip_chunks(lines):
+    """Compresses an iterable of text lines into a gzip byte stream, chunk by chunk."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31: gzip container
+    for line in lines:
+        data = compressor.compress(line.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class ExportTimeout(Exception):
+    pass
+
+
+def spool_export(connection, data_format, tournament_ids, compress, max_seconds):
+    """
+    Writes an export into a SpooledTemporaryFile (in memory up to
+    EXPORT_SPOOL_MEMORY_BYTES) and returns it rewound. Raises ExportTimeout if
+    reading takes longer than max_seconds.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=app.config['EXPORT_SPOOL_MEMORY_BYTES'])
+    lines = iter_export(connection, data_format, tournament_ids)
+    deadline = time.monotonic() + max_seconds
+    try:
+        for chunk in (gzip_chunks(lines) if compress else (line.encode('utf-8') for line in lines)):
+            spool.write(chunk)
+            if time.monotonic() > deadline:
+                raise ExportTimeout(f"Export took longer than {max_seconds}s")
+    except BaseException:
+        spool.close()
+        raise
+    finally:
+        lines.close() # Ends the unbuffered query if the export stopped early
+    spool.seek(0)
+    return spool
+
+
+def open_export_file(path, mode='rt'):
+    """Opens an export for reading, gzip-compressed or not (detected from the magic bytes)."""
+    with open(path, 'rb') as probe:
+        compressed = probe.read(2) == b'\x1f\x8b'
+    if compressed:
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def restore(connection, lines, progress=None):
+    """
+    Loads an export (an iterable of its text lines) with multi-row INSERTs,
+    keeping ids, and commits every IMPORT_COMMIT_EVERY rows. Meant for an empty
+    database: rows that already exist fail with an IntegrityError.
+    Rebuilds the stored standings of restored league tournaments.
+    Returns {table: rows restored}.
+    """
+    lines = iter(lines)
+    try:
+        header = json.loads(next(lines))
+    except (StopIteration, ValueError):
+        raise RestoreError("Not an export file (missing header)")
+    if header.get('format') != EXPORT_FORMAT_NAME or header.get('version') != EXPORT_FORMAT_VERSION:
+        raise RestoreError(f"Unsupported export: {header.get('format')} version {header.get('version')}")
+
+    batch_size = app.config['FIXTURE_INSERT_BATCH_SIZE']
+    commit_every = app.config['IMPORT_COMMIT_EVERY']
+    counts = {table: 0 for table in EXPORT_COLUMNS}
+    restored_ids = []
+    league_ids = []
+    pending = {table: [] for table in EXPORT_COLUMNS}
+    footer = None
+    since_commit = 0
+
+    def flush(cursor, table):
+        columns = EXPORT_COLUMNS[table]
+        rows = pending[table]
+        if table == 'tournaments': # A new uid: to caches and clients, a restored tournament is a new one
+            columns += ('uid',)
+            rows = [row + (repository.new_tournament_uid(),) for row in rows]
+            if rows:
+                db_utils.repository().bump_tournament_list_version(cursor)
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+        counts[table] += len(rows)
+        pending[table] = []
+
+    with connection.cursor() as cursor:
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('end'):
+                footer = record
+                break
+            table = record.get('table')
+            if table not in EXPORT_COLUMNS:
+                raise RestoreError(f"Unknown table in export: {table!r}")
+            columns = EXPORT_COLUMNS[table]
+
+            # Only known column names ever reach the INSERT, in our order
+            if 'row' in record:
+                rows = [tuple(record['row'].get(column, EXPORT_DEFAULTS.get(column)) for column in columns)]
+            else:
+                positions = [record['columns'].index(column) if column in record['columns'] else None for column in columns]
+                data = record['data']
+                row_count = len(data[0]) if data else 0
+                defaults = [EXPORT_DEFAULTS.get(column) for column in columns]
+                rows = [tuple(data[p][i] if p is not None else default for p, default in zip(positions, defaults))
+                        for i in range(row_count)]
+            if table == 'tournaments':
+                restored_ids.extend(row[0] for row in rows)
+                league_ids.extend(row[0] for row in rows if row[3] == 'league')
+
+            # Parents are flushed before children, so foreign keys are satisfied
+            for earlier, _, _ in EXPORT_TABLES:
+                if earlier == table:
+                    break
+                if pending[earlier]:
+                    flush(cursor, earlier)
+            pending[table].extend(rows)
+            since_commit += len(rows)
+            if len(pending[table]) >= batch_size:
+                flush(cursor, table)
+            if since_commit >= commit_every:
+                for name in EXPORT_COLUMNS:
+                    flush(cursor, name)
+                connection.commit()
+                since_commit = 0
+                if progress:
+                    progress(counts)
+
+        for name in EXPORT_COLUMNS:
+            flush(cursor, name)
+        connection.commit()
+        if footer is None:
+            raise RestoreError(f"Export is truncated (no footer); restored {counts} before the end")
+        if footer['rows'] != counts:
+            raise RestoreError(f"Row counts differ from the export: expected {footer['rows']}, restored {counts}")
+
+        for tournament_id in league_ids:
+            standings_store.rebuild_standings(cursor, tournament_id)
+        # The restored data_version / updated_at are the exported ones; moving them on
+        # keeps cached pages (and ETags) of an earlier database from matching
+        for tournament_id in restored_ids:
+            db_utils.touch_tournament(cursor, tournament_id)
+        connection.commit()
+    return counts
+
+
+@app.route('/api/v1/tournaments/<int:tournament_id>/export')
+def api_export_tournament(tournament_id):
+    """
+    Streams one tournament as an export file. ?format=ndjson (default) or snapshot;
+    snapshots, and NDJSON with ?compress=gzip, are sent gzip-compressed.
+
+    The export is read on the request's connection into a spool first, and only then
+    sent: a slow client holds a worker thread and the spool, never a database
+    connection or an open server-side query (which MySQL would cut off after
+    net_write_timeout). Pool exhaustion and database errors are a 503 before any byte
+    is sent, and so is a tournament too big to read in EXPORT_HTTP_MAX_SECONDS.
+    """
+    data_format = request.args.get('format', 'ndjson')
+    if data_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    compress = data_format == 'snapshot' or request.args.get('compress') == 'gzip'
+    try:
+        connection = db_utils.get_request_connection()
+        with connection.cursor() as cursor:
+            if db_utils.repository().get_tournament(cursor, tournament_id) is None:
+                return jsonify({'error': f"Tournament {tournament_id} not found"}), 404
+        spool = spool_export(connection, data_format, [tournament_id], compress, app.config['EXPORT_HTTP_MAX_SECONDS'])
+    except db_utils.DB_ERRORS as e:
+        return jsonify({'error': f"Database error: {e}"}), 503
+    except ExportTimeout as e:
+        return jsonify({'error': f"{e}; export this tournament with the CLI (flask export --tournament {tournament_id})"}), 503
+    size = spool.seek(0, 2)
+    spool.seek(0)
+
+    def generate():
+        with spool:
+            yield from iter(lambda: spool.read(65536), b'')
+
+    extension = 'tosnap.gz' if data_format == 'snapshot' else ('ndjson.gz' if compress else 'ndjson')
+    return Response(generate(), mimetype='application/gzip' if compress else 'application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename="tournament-{tournament_id}.{extension}"',
+                             'Content-Length': str(size)})
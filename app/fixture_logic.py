@@ -1,34 +1,51 @@
 import random
 
-def generate_league_fixtures(teams):
+def generate_round_robin_rounds(teams, double_round_robin=False, shuffle=True):
     """
-    Generates fixtures for a league (round-robin) tournament.
-    Each team plays every other team once.
+    Generates a league schedule with the circle (Berger) method, one round at a time.
     Assumes 'teams' is a list of participant objects/dictionaries, each with an 'id'.
-    Returns a list of match tuples: (team1_id, team2_id)
-    """
-    if not teams or len(teams) < 2:
-        return []
+    Yields (round_number, [(home_id, away_id), ...]) for every round, so callers can
+    stream a large schedule into the database without materialising it.
 
-    matches = []
-    # Create a list of team IDs
+    - Every team plays every other team once per leg, and at most once per round.
+    - Home/away is balanced: each team's home and away counts differ by at most one,
+      with the minimum number of consecutive home (or away) games.
+    - With an odd number of teams, one team sits out each round (the bye is not emitted
+      as a fixture, so it does not count as a win in the standings).
+    - double_round_robin=True appends a second leg with home and away swapped.
+    """
     team_ids = [team['id'] for team in teams]
+    if len(team_ids) < 2:
+        return
+    if shuffle:
+        random.shuffle(team_ids) # Random draw for who gets which schedule slot
+    if len(team_ids) % 2:
+        team_ids.append(None) # Whoever is paired with None has a bye that round
 
-    # Simple round-robin: iterate through all unique pairs
-    for i in range(len(team_ids)):
-        for j in range(i + 1, len(team_ids)):
-            # Ensure order doesn't matter for now, or decide on home/away later
-            # For simplicity, let team with lower index be team1, or randomize
-            match = tuple(sorted((team_ids[i], team_ids[j])))
-            matches.append(match)
-    
-    # Shuffle the matches to make the order less predictable if desired
-    random.shuffle(matches)
-    
-    # For a more structured round-robin (e.g., Circle method), a more complex algorithm is needed,
-    # especially for assigning rounds. This version just creates all pairs.
-    # We will assign round numbers and match numbers in the route that calls this.
-    return matches
+    n = len(team_ids)
+    rounds_per_leg = n - 1
+    fixed_team = team_ids[-1]
+    legs = 2 if double_round_robin else 1
+
+    for leg in range(legs):
+        for r in range(rounds_per_leg):
+            pairs = []
+            # The fixed team meets the team at position r, alternating home and away
+            other = team_ids[r]
+            pairs.append((fixed_team, other) if r % 2 == 0 else (other, fixed_team))
+            # Everyone else is paired symmetrically around position r on the circle;
+            # alternating orientation by distance keeps home/away breaks to a minimum.
+            for k in range(1, n // 2):
+                a = team_ids[(r + k) % rounds_per_leg]
+                b = team_ids[(r - k) % rounds_per_leg]
+                pairs.append((a, b) if k % 2 == 1 else (b, a))
+
+            matches = []
+            for home, away in pairs:
+                if home is None or away is None:
+                    continue # Bye
+                matches.append((away, home) if leg == 1 else (home, away))
+            yield leg * rounds_per_leg + r + 1, matches
 
 
 def generate_knockout_fixtures(teams):
@@ -62,20 +79,86 @@ def generate_knockout_fixtures(teams):
             
     return matches
 
+def bracket_seed_positions(bracket_size):
+    """
+    Returns seed numbers in bracket order for a power-of-two bracket, e.g. for 8:
+    [1, 8, 4, 5, 2, 7, 3, 6], so consecutive pairs are 1v8, 4v5, 2v7, 3v6 and the
+    top two seeds can only meet in the final.
+    """
+    positions = [1]
+    while len(positions) < bracket_size:
+        mirror = 2 * len(positions) + 1
+        positions = [seed for p in positions for seed in (p, mirror - p)]
+    return positions
+
+
+def generate_knockout_bracket(teams, shuffle=False):
+    """
+    Generates every match of a single-elimination bracket up front.
+    Assumes 'teams' is a list of participant objects/dictionaries, each with an 'id',
+    in seed order (first = top seed); shuffle=True makes it a random draw instead.
+    Returns a list of (round_number, [(team1_id, team2_id, status, winner_id), ...]).
+
+    The bracket is padded to the next power of two. Byes go to the top seeds as
+    completed round-1 matches (team2 None) whose winners are already placed in
+    round 2. Later slots start empty with status 'Pending' and are filled as
+    results come in: match m of round r feeds slot 1 (m odd) or slot 2 (m even)
+    of match (m + 1) // 2 in round r + 1.
+    """
+    team_ids = [team['id'] for team in teams]
+    if len(team_ids) < 2:
+        return []
+    if shuffle:
+        random.shuffle(team_ids)
+
+    bracket_size = 1
+    while bracket_size < len(team_ids):
+        bracket_size *= 2
+    total_rounds = bracket_size.bit_length() - 1
+
+    # Seed s sits at slot position; seeds beyond the team count are byes (None)
+    slots = [team_ids[seed - 1] if seed <= len(team_ids) else None
+             for seed in bracket_seed_positions(bracket_size)]
+
+    rounds = []
+    first_round = []
+    for i in range(0, bracket_size, 2):
+        team1_id, team2_id = slots[i], slots[i + 1]
+        if team2_id is None: # Top seed against an empty slot: bye
+            first_round.append((team1_id, None, 'Completed', team1_id))
+        else:
+            first_round.append((team1_id, team2_id, 'Scheduled', None))
+    rounds.append((1, first_round))
+
+    previous_round = first_round
+    for round_number in range(2, total_rounds + 1):
+        current_round = []
+        for i in range(0, len(previous_round), 2):
+            # Winners already known (byes) move straight into their slot
+            team1_id = previous_round[i][3]
+            team2_id = previous_round[i + 1][3]
+            status = 'Scheduled' if team1_id is not None and team2_id is not None else 'Pending'
+            current_round.append((team1_id, team2_id, status, None))
+        rounds.append((round_number, current_round))
+        previous_round = current_round
+
+    return rounds
+
+
 if __name__ == '__main__':
     # Example Usage (for testing this file directly)
     print("--- Testing League Fixture Generation ---")
     sample_teams_league = [{'id': 1, 'name': 'Team A'}, {'id': 2, 'name': 'Team B'}, {'id': 3, 'name': 'Team C'}, {'id': 4, 'name': 'Team D'}]
-    league_matches = generate_league_fixtures(sample_teams_league)
+    league_rounds = list(generate_round_robin_rounds(sample_teams_league))
     print(f"Teams: {sample_teams_league}")
-    print(f"Generated League Matches ({len(league_matches)}): {league_matches}")
-    # Expected for 4 teams: (4*3)/2 = 6 matches
+    print(f"Generated League Rounds ({len(league_rounds)}): {league_rounds}")
+    # Expected for 4 teams: 3 rounds of 2 matches, (4*3)/2 = 6 matches
 
     sample_teams_league_odd = [{'id': 1, 'name': 'Team A'}, {'id': 2, 'name': 'Team B'}, {'id': 3, 'name': 'Team C'}]
-    league_matches_odd = generate_league_fixtures(sample_teams_league_odd)
+    league_rounds_odd = list(generate_round_robin_rounds(sample_teams_league_odd))
     print(f"Teams (odd): {sample_teams_league_odd}")
-    print(f"Generated League Matches ({len(league_matches_odd)}): {league_matches_odd}")
-     # Expected for 3 teams: (3*2)/2 = 3 matches
+    print(f"Generated League Rounds ({len(league_rounds_odd)}): {league_rounds_odd}")
+    # Expected for 3 teams: 3 rounds of 1 match (each team sits one out), 3 matches
 
 
     print("\n--- Testing Knockout Fixture Generation ---")
@@ -0,0 +1,131 @@
+import time
+from collections import namedtuple
+
+from app import app
+from app import db_utils
+
+# Bulk writer for the fixtures table. Fixture generation, knockout round
+# advancement and imports all go through write_fixtures, so a 4,000-match
+# schedule costs a handful of multi-row INSERTs instead of 4,000 round trips.
+
+FIXTURE_COLUMNS = ('tournament_id', 'round_number', 'match_number_in_round', 'team1_id', 'team2_id', 'status')
+BRACKET_COLUMNS = FIXTURE_COLUMNS + ('winner_id',)
+
+FixtureWriteReport = namedtuple('FixtureWriteReport', ['rows', 'batches', 'elapsed'])
+
+
+def rows_from_rounds(tournament_id, rounds, status='Scheduled'):
+    """
+    Turns (round_number, [(team1_id, team2_id), ...]) rounds, as produced by
+    fixture_logic, into FIXTURE_COLUMNS rows numbered 1..n within each round.
+    Lazy, so a streamed schedule stays streamed.
+    """
+    for round_number, round_matches in rounds:
+        for match_number, (team1_id, team2_id) in enumerate(round_matches, start=1):
+            yield (tournament_id, round_number, match_number, team1_id, team2_id, status)
+
+
+def rows_from_bracket(tournament_id, rounds):
+    """
+    Turns fixture_logic.generate_knockout_bracket output, i.e. rounds of
+    (team1_id, team2_id, status, winner_id), into BRACKET_COLUMNS rows.
+    """
+    for round_number, round_matches in rounds:
+        for match_number, (team1_id, team2_id, status, winner_id) in enumerate(round_matches, start=1):
+            yield (tournament_id, round_number, match_number, team1_id, team2_id, status, winner_id)
+
+
+def write_fixtures(connection, rows, columns=FIXTURE_COLUMNS, batch_size=None, commit=True):
+    """
+    Inserts an iterable of row tuples (matching `columns`) into fixtures in chunks
+    of `batch_size` rows, each sent as one multi-row INSERT by executemany.
+    Commits once at the end unless commit=False (the caller then owns the
+    transaction). Returns a FixtureWriteReport(rows, batches, elapsed seconds).
+    """
+    batch_size = batch_size or app.config['FIXTURE_INSERT_BATCH_SIZE']
+    column_list = ', '.join(columns)
+    placeholders = ', '.join(['%s'] * len(columns))
+    sql = f"INSERT INTO fixtures ({column_list}) VALUES ({placeholders})"
+
+    started = time.perf_counter()
+    row_count = 0
+    batch_count = 0
+    batch = []
+    with connection.cursor() as cursor:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                row_count += len(batch)
+                batch_count += 1
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            row_count += len(batch)
+            batch_count += 1
+    if commit and row_count:
+        connection.commit()
+    return FixtureWriteReport(row_count, batch_count, time.perf_counter() - started)
+
+
+def link_bracket(cursor, tournament_id):
+    """
+    Points every bracket fixture at the slot its winner moves into: match m of
+    round r feeds slot 1 (m odd) or slot 2 (m even) of match (m + 1) / 2 in
+    round r + 1. One self-join UPDATE after the bracket rows are inserted (its
+    syntax differs per backend, see repository.py). Returns the rows linked.
+    """
+    return db_utils.repository().link_bracket(cursor, tournament_id)
+
+
+def advance_winner(cursor, next_fixture_id, next_slot, winner_id):
+    """
+    Drops a result into the parent slot with a single UPDATE. A None winner
+    (e.g. a draw that still needs a decider) empties the slot again. Matches that
+    are already being played or completed are left alone.
+    """
+    team_column, other_column = ('team1_id', 'team2_id') if next_slot == 1 else ('team2_id', 'team1_id')
+    cursor.execute(f"""
+        UPDATE fixtures
+        SET {team_column} = %s,
+            status = CASE WHEN %s IS NOT NULL AND {other_column} IS NOT NULL THEN 'Scheduled' ELSE 'Pending' END,
+            version = version + 1 -- The slot's team changed under anyone scoring it (see results.py)
+        WHERE id = %s AND status IN ('Pending', 'Scheduled')
+    """, (winner_id, winner_id, next_fixture_id))
+    return cursor.rowcount
+
+
+def advance_winners(cursor, moves):
+    """
+    advance_winner for many (next_fixture_id, next_slot, winner_id) moves in one
+    UPDATE, e.g. a whole round's results. Both children of a parent match may be
+    in the same batch. The status CASE repeats the slot expressions rather than
+    reading team1_id / team2_id, because SQLite evaluates every SET expression
+    against the old row (MySQL goes left to right); it gives the same answer on both.
+    """
+    if not moves:
+        return 0
+    slot_cases = {1: [], 2: []}
+    params = {1: [], 2: []}
+    for next_fixture_id, next_slot, winner_id in moves:
+        slot = 1 if next_slot == 1 else 2
+        slot_cases[slot].append("WHEN %s THEN %s")
+        params[slot].extend([next_fixture_id, winner_id])
+
+    new_slots, assignments, values = {}, [], []
+    for slot in (1, 2):
+        if slot_cases[slot]:
+            new_slots[slot] = f"CASE id {' '.join(slot_cases[slot])} ELSE team{slot}_id END"
+            assignments.append(f"team{slot}_id = {new_slots[slot]}")
+            values.extend(params[slot])
+        else:
+            new_slots[slot] = f"team{slot}_id"
+    parent_ids = sorted({next_fixture_id for next_fixture_id, _, _ in moves})
+    cursor.execute(f"""
+        UPDATE fixtures
+        SET {', '.join(assignments)},
+            status = CASE WHEN {new_slots[1]} IS NOT NULL AND {new_slots[2]} IS NOT NULL THEN 'Scheduled' ELSE 'Pending' END,
+            version = version + 1
+        WHERE id IN ({', '.join(['%s'] * len(parent_ids))}) AND status IN ('Pending', 'Scheduled')
+    """, values + params[1] + params[2] + parent_ids)
+    return cursor.rowcount
@@ -0,0 +1,84 @@
+import functools
+from datetime import datetime, timezone
+
+from flask import g, request, session, make_response
+
+from app import app
+from app import db_utils
+
+# HTTP conditional GET for tournament pages.
+#
+# A page's representation only changes when the tournament's data_version does
+# (db_utils.touch_tournament bumps it in every write transaction), so the strong
+# ETag is derived from that marker, together with the row's uid: a tournament that
+# later gets the same id starts again from the same data_version. The check costs one primary-key lookup and
+# happens before the view runs, so a 304 skips the page queries and the Jinja
+# render entirely. The view's cached page is looked up under the same marker
+# (g.tournament_marker, read by TournamentCache.version), so a body is never sent
+# with the ETag of another version.
+
+
+def _tournament_marker(tournament_id):
+    connection = db_utils.get_request_connection()
+    with connection.cursor() as cursor:
+        return db_utils.repository().tournament_marker(cursor, tournament_id)
+
+
+def _cache_control():
+    return f"public, max-age={app.config['HTTP_CACHE_MAX_AGE']}, must-revalidate"
+
+
+def conditional_tournament_get(view):
+    """
+    Decorator for GET views that take a tournament_id. Adds ETag, Last-Modified (once
+    the second of the last write is over) and Cache-Control to 200 responses and answers If-None-Match / If-Modified-Since
+    with 304 Not Modified when the tournament has not changed.
+
+    Responses carrying flash messages from an earlier request are personal, so they
+    are neither revalidated nor marked cacheable.
+    """
+    @functools.wraps(view)
+    def wrapper(tournament_id, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+            response = make_response(view(tournament_id, *args, **kwargs))
+            response.headers['Cache-Control'] = 'private, no-store'
+            return response
+
+        try:
+            marker = _tournament_marker(tournament_id)
+        except db_utils.DB_ERRORS:
+            marker = None # Let the view report the database problem
+        if marker is None:
+            return view(tournament_id, *args, **kwargs) # Not found / error paths stay uncached
+        g.tournament_marker = (tournament_id, marker)
+
+        etag = f"{request.endpoint}-{tournament_id}-{marker['uid']}-v{marker['data_version']}-{app.config['HTTP_ETAG_SALT']}"
+        # Last-Modified has one-second resolution: a write later in the same second
+        # would keep the same date, and If-Modified-Since would then answer 304 for the
+        # older body. So it is only sent once that second is over (by the database's
+        # clock, which stamps updated_at); until then clients revalidate with the ETag.
+        last_modified = None
+        if int(marker['now_ts']) > int(marker['updated_ts']):
+            last_modified = datetime.fromtimestamp(int(marker['updated_ts']), timezone.utc)
+
+        # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110, 13.2.2)
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        elif request.if_modified_since and last_modified is not None:
+            not_modified = last_modified <= request.if_modified_since
+        else:
+            not_modified = False
+
+        if not_modified:
+            response = make_response('', 304)
+        else:
+            response = make_response(view(tournament_id, *args, **kwargs))
+            if response.status_code != 200:
+                return response # Redirects (wrong format etc.) are not validated
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = _cache_control()
+        return response
+
+    return wrapper
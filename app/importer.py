@@ -0,0 +1,402 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import time
+
+from flask import request, jsonify
+
+from app import app
+from app import db_utils
+from app import fixture_store
+from app import results
+from app import standings_store
+
+# Streaming bulk import of participants and historical results from CSV or NDJSON.
+#
+# Records are read one at a time from the input stream, validated, and buffered
+# into multi-row INSERTs of FIXTURE_INSERT_BATCH_SIZE rows. Every
+# IMPORT_COMMIT_EVERY records the buffers are flushed and the transaction is
+# committed together with the import's checkpoint row, so memory stays constant
+# however large the file is, and an import that fails can be re-run with the same
+# import key: the records already committed are skipped, exactly once. The checkpoint
+# is deleted when the import finishes, and the default key includes a hash of the
+# file's content, so only a re-run of the same file resumes.
+#
+# Record fields (CSV header names / NDJSON keys):
+#   participants: tournament_id, name
+#   results:      tournament_id, round, [match], team1, [team2], [score1], [score2]
+#                 team names are resolved to participant ids (case-insensitively);
+#                 a missing team2 is a bye; match numbers continue after the highest
+#                 existing one in the round when omitted.
+#
+# Imported league results update the stored standings as they are committed.
+# Memory use is bounded by the number of distinct teams and rounds, not by the
+# number of records.
+
+log = logging.getLogger(__name__)
+
+IMPORT_KINDS = ('participants', 'results')
+IMPORT_FORMATS = ('csv', 'ndjson')
+RESULT_IMPORT_COLUMNS = fixture_store.FIXTURE_COLUMNS + ('score1', 'score2', 'winner_id')
+MAX_NAME_LENGTH = 255 # participants.name is VARCHAR(255)
+
+
+class RecordError(ValueError):
+    """A record that cannot be imported; it is reported and skipped."""
+
+
+class ImportReport:
+    def __init__(self, import_key, kind):
+        self.import_key = import_key
+        self.kind = kind
+        self.records = 0            # records read in this run, including skipped ones
+        self.resumed_from = 0       # records skipped because an earlier run committed them
+        self.participants_inserted = 0
+        self.fixtures_inserted = 0
+        self.duplicates = 0         # participants that already existed
+        self.invalid = 0
+        self.errors = []            # (record number, message), at most IMPORT_MAX_REPORTED_ERRORS
+        self.commits = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def records_per_second(self):
+        processed = self.records - self.resumed_from
+        return processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def add_error(self, record_number, message):
+        self.invalid += 1
+        if len(self.errors) < app.config['IMPORT_MAX_REPORTED_ERRORS']:
+            self.errors.append((record_number, message))
+
+    def as_dict(self):
+        return {
+            'import_key': self.import_key,
+            'kind': self.kind,
+            'records': self.records,
+            'resumed_from': self.resumed_from,
+            'participants_inserted': self.participants_inserted,
+            'fixtures_inserted': self.fixtures_inserted,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': [{'record': number, 'error': message} for number, message in self.errors],
+            'commits': self.commits,
+            'elapsed': round(self.elapsed, 3),
+            'records_per_second': round(self.records_per_second, 1),
+        }
+
+
+def read_records(stream, data_format):
+    """
+    Yields one dict per record from a text stream, or a RecordError for an
+    NDJSON line that is not a JSON object. Nothing is read ahead.
+    """
+    if data_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+    elif data_format == 'ndjson':
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield RecordError(f"Invalid JSON: {e}")
+                continue
+            yield record if isinstance(record, dict) else RecordError("Expected a JSON object")
+    else:
+        raise ValueError(f"Unknown import format: {data_format}")
+
+
+def _required_int(record, field, minimum=None):
+    raw = record.get(field)
+    if raw is None or str(raw).strip() == '':
+        raise RecordError(f"Missing {field}")
+    try:
+        value = int(str(raw).strip())
+    except ValueError:
+        raise RecordError(f"{field} must be a whole number")
+    if minimum is not None and value < minimum:
+        raise RecordError(f"{field} must be at least {minimum}")
+    return value
+
+
+def _name(record, field, required=True):
+    raw = record.get(field)
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        raw = str(raw) # An NDJSON number, e.g. a team called 1860
+    elif raw is not None and not isinstance(raw, str):
+        raise RecordError(f"{field} must be text")
+    value = (raw or '').strip()
+    if not value:
+        if required:
+            raise RecordError(f"Missing {field}")
+        return None
+    if len(value) > MAX_NAME_LENGTH:
+        raise RecordError(f"{field} is longer than {MAX_NAME_LENGTH} characters")
+    return value
+
+
+def _team_key(name):
+    # The database compares names case-insensitively (utf8mb4_unicode_ci), so the map does too
+    return name.casefold()
+
+
+class Importer:
+    """
+    One import run on a connection. Call run(records) once; it commits as it goes.
+    With create_missing_teams, unknown team names in results are added as participants
+    instead of being rejected.
+    """
+
+    def __init__(self, connection, kind, import_key, create_missing_teams=False, progress=None):
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"Unknown import kind: {kind}")
+        self.connection = connection
+        self.kind = kind
+        self.import_key = import_key
+        self.create_missing_teams = create_missing_teams
+        self.progress = progress # Called with the report after every commit
+        self.report = ImportReport(import_key, kind)
+
+        self._tournaments = {}  # tournament_id -> format, or None if it does not exist
+        self._teams = {}        # tournament_id -> {team key: participant id}
+        self._next_match = {}   # (tournament_id, round_number) -> next match number
+        self._participant_rows = []
+        self._fixture_rows = []
+        self._dirty = set()     # tournaments written to since the last commit
+
+    # --- lookups (one query per tournament / round, then served from memory) ---
+
+    def _tournament_format(self, cursor, tournament_id):
+        if tournament_id not in self._tournaments:
+            cursor.execute("SELECT format FROM tournaments WHERE id = %s", (tournament_id,))
+            row = cursor.fetchone()
+            self._tournaments[tournament_id] = row['format'] if row else None
+        tournament_format = self._tournaments[tournament_id]
+        if tournament_format is None:
+            raise RecordError(f"Tournament {tournament_id} does not exist")
+        return tournament_format
+
+    def _team_map(self, cursor, tournament_id):
+        teams = self._teams.get(tournament_id)
+        if teams is None:
+            cursor.execute("SELECT id, name FROM participants WHERE tournament_id = %s", (tournament_id,))
+            teams = {_team_key(row['name']): row['id'] for row in cursor.fetchall()}
+            self._teams[tournament_id] = teams
+        return teams
+
+    def _resolve_team(self, cursor, tournament_id, name):
+        teams = self._team_map(cursor, tournament_id)
+        key = _team_key(name)
+        team_id = teams.get(key)
+        if team_id is not None:
+            return team_id
+        if not self.create_missing_teams:
+            raise RecordError(f"Unknown team '{name}' in tournament {tournament_id}")
+        # New teams are rare next to result rows, so they are inserted one by one for their ids
+        cursor.execute("INSERT INTO participants (tournament_id, name) VALUES (%s, %s)", (tournament_id, name))
+        teams[key] = cursor.lastrowid
+        self.report.participants_inserted += 1
+        self._dirty.add(tournament_id)
+        return teams[key]
+
+    def _match_number(self, cursor, tournament_id, round_number, requested):
+        key = (tournament_id, round_number)
+        if key not in self._next_match:
+            cursor.execute("""
+                SELECT COALESCE(MAX(match_number_in_round), 0) AS last_match
+                FROM fixtures WHERE tournament_id = %s AND round_number = %s
+            """, key)
+            self._next_match[key] = cursor.fetchone()['last_match'] + 1
+        if requested is not None:
+            self._next_match[key] = max(self._next_match[key], requested + 1)
+            return requested
+        number = self._next_match[key]
+        self._next_match[key] = number + 1
+        return number
+
+    # --- per-record handling ---
+
+    def _add_participant(self, cursor, record):
+        tournament_id = _required_int(record, 'tournament_id', minimum=1)
+        name = _name(record, 'name')
+        self._tournament_format(cursor, tournament_id)
+        teams = self._team_map(cursor, tournament_id)
+        key = _team_key(name)
+        if key in teams:
+            self.report.duplicates += 1
+            return
+        teams[key] = None # Id not known until flushed; enough to catch duplicates within the file
+        self._participant_rows.append((tournament_id, name))
+        self._dirty.add(tournament_id)
+
+    def _add_result(self, cursor, record):
+        tournament_id = _required_int(record, 'tournament_id', minimum=1)
+        round_number = _required_int(record, 'round', minimum=1)
+        match_number = _required_int(record, 'match', minimum=1) if str(record.get('match') or '').strip() else None
+        team1_name = _name(record, 'team1')
+        team2_name = _name(record, 'team2', required=False)
+        try:
+            score1 = results.parse_score(record.get('score1'))
+            score2 = results.parse_score(record.get('score2'))
+        except ValueError as e:
+            raise RecordError(str(e))
+        self._tournament_format(cursor, tournament_id)
+
+        team1_id = self._resolve_team(cursor, tournament_id, team1_name)
+        team2_id = self._resolve_team(cursor, tournament_id, team2_name) if team2_name else None
+        if team1_id == team2_id:
+            raise RecordError("A team cannot play itself")
+        fixture = {'team1_id': team1_id, 'team2_id': team2_id}
+        winner_id, status = results.decide_result(fixture, score1, score2)
+        match_number = self._match_number(cursor, tournament_id, round_number, match_number)
+        self._fixture_rows.append((tournament_id, round_number, match_number, team1_id, team2_id, status,
+                                   score1, score2, winner_id))
+        self._dirty.add(tournament_id)
+
+    # --- writing ---
+
+    def _flush(self, cursor):
+        if self._participant_rows:
+            batch_size = app.config['FIXTURE_INSERT_BATCH_SIZE']
+            for start in range(0, len(self._participant_rows), batch_size):
+                cursor.executemany("INSERT INTO participants (tournament_id, name) VALUES (%s, %s)",
+                                   self._participant_rows[start:start + batch_size])
+            self.report.participants_inserted += len(self._participant_rows)
+            self._participant_rows = []
+
+        if self._fixture_rows:
+            fixture_store.write_fixtures(self.connection, self._fixture_rows, columns=RESULT_IMPORT_COLUMNS, commit=False)
+            self.report.fixtures_inserted += len(self._fixture_rows)
+
+            # Keep the stored league tables in step, in the same transaction
+            by_tournament = {}
+            for row in self._fixture_rows:
+                if self._tournaments[row[0]] == 'league' and row[5] == 'Completed':
+                    fixture = {'team1_id': row[3], 'team2_id': row[4], 'score1': row[6], 'score2': row[7],
+                               'winner_id': row[8], 'status': row[5]}
+                    by_tournament.setdefault(row[0], []).append((None, fixture))
+            for tournament_id, changes in by_tournament.items():
+                standings_store.apply_fixture_changes(cursor, tournament_id, changes)
+            self._fixture_rows = []
+
+    def _commit(self, cursor, records_committed, finished=False):
+        self._flush(cursor)
+        for tournament_id in self._dirty:
+            db_utils.touch_tournament(cursor, tournament_id)
+        if finished:
+            # Done: nothing left to resume, and the key is free for the next file
+            db_utils.repository().delete_import_checkpoint(cursor, self.import_key)
+        else:
+            save_checkpoint(cursor, self.import_key, self.kind, records_committed)
+        self.connection.commit()
+        self._dirty = set()
+        self.report.commits += 1
+        self.report.elapsed = time.perf_counter() - self.report.started
+        log.info("Import %s: %d records, %.0f records/s", self.import_key, self.report.records,
+                 self.report.records_per_second)
+        if self.progress:
+            self.progress(self.report)
+
+    def run(self, records):
+        commit_every = app.config['IMPORT_COMMIT_EVERY']
+        batch_size = app.config['FIXTURE_INSERT_BATCH_SIZE']
+        add = self._add_participant if self.kind == 'participants' else self._add_result
+
+        with self.connection.cursor() as cursor:
+            skip = load_checkpoint(cursor, self.import_key)
+            self.report.resumed_from = skip
+            last_commit = skip
+            try:
+                for record_number, record in enumerate(records, start=1):
+                    self.report.records = record_number
+                    if record_number <= skip:
+                        continue # Committed by an earlier run
+                    try:
+                        if isinstance(record, RecordError):
+                            raise record
+                        add(cursor, record)
+                    except RecordError as e:
+                        self.report.add_error(record_number, str(e))
+
+                    if len(self._participant_rows) + len(self._fixture_rows) >= batch_size:
+                        self._flush(cursor)
+                    if record_number - last_commit >= commit_every:
+                        self._commit(cursor, record_number)
+                        last_commit = record_number
+                self._commit(cursor, self.report.records, finished=True)
+            except Exception:
+                self.connection.rollback() # Everything after the last checkpoint is redone on resume
+                raise
+        return self.report
+
+
+def load_checkpoint(cursor, import_key):
+    return db_utils.repository().load_import_checkpoint(cursor, import_key)
+
+
+def save_checkpoint(cursor, import_key, kind, records_committed):
+    db_utils.repository().save_import_checkpoint(cursor, import_key, kind, records_committed)
+
+
+def reset_checkpoint(connection, import_key):
+    with connection.cursor() as cursor:
+        db_utils.repository().delete_import_checkpoint(cursor, import_key)
+    connection.commit()
+
+
+def default_import_key(kind, filename, binary_stream):
+    """
+    kind:filename:content hash. Reads binary_stream to the end in chunks and rewinds
+    it, so a different file uploaded under the same name gets its own checkpoint.
+    """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: binary_stream.read(1 << 20), b''):
+        digest.update(chunk)
+    binary_stream.seek(0)
+    return f"{kind}:{filename}:{digest.hexdigest()[:16]}"
+
+
+def detect_format(filename, default='csv'):
+    lowered = (filename or '').lower()
+    if lowered.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if lowered.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+@app.route('/admin/import', methods=['POST'])
+def import_upload():
+    """
+    Multipart upload: file (CSV or NDJSON), kind ('participants' or 'results'),
+    optional format (else taken from the file name), import_key (defaults to
+    kind:filename:content hash, so re-uploading the same file after a failure
+    resumes it) and create_missing_teams. Returns the import report as JSON.
+    """
+    upload = request.files.get('file')
+    kind = request.form.get('kind')
+    if upload is None or kind not in IMPORT_KINDS:
+        return jsonify({'error': f"Send a file and a kind ({', '.join(IMPORT_KINDS)})."}), 400
+    data_format = request.form.get('format') or detect_format(upload.filename)
+    if data_format not in IMPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(IMPORT_FORMATS)}"}), 400
+    import_key = request.form.get('import_key') or default_import_key(kind, upload.filename, upload.stream)
+
+    # Werkzeug spools large uploads to a temporary file; this reads it as a text stream
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    try:
+        importer = Importer(db_utils.get_request_connection(), kind, import_key,
+                            create_missing_teams=bool(request.form.get('create_missing_teams')))
+        report = importer.run(read_records(stream, data_format))
+    except (csv.Error, UnicodeDecodeError) as e:
+        return jsonify({'error': f"Could not read the file: {e}", 'import_key': import_key}), 400
+    except db_utils.DB_ERRORS as e:
+        return jsonify({'error': f"Database error; re-upload with the same import_key to resume: {e}",
+                        'import_key': import_key}), 503
+    return jsonify(report.as_dict())
@@ -1,4 +1,194 @@
-def calculate_standings_data(teams, completed_fixtures, points_win=3, points_draw=1, points_loss=0):
+import itertools
+import logging
+
+from app import db_utils
+
+log = logging.getLogger(__name__)
+
+# --- Points rules and tiebreakers ---
+# Each tournament stores its points for a win, draw and loss and an ordered list of
+# tiebreakers (tournaments.points_* and tournaments.tiebreakers, comma-separated).
+# Teams level on points are separated by the tiebreakers in order; teams still level
+# after all of them are listed by name (then id, so equal names order the same everywhere).
+TIEBREAKERS = {
+    'gd': 'Goal difference',
+    'gf': 'Goals scored',
+    'w': 'Wins',
+    'away_gf': 'Away goals scored',
+    'h2h_pts': 'Head-to-head points',
+    'h2h_gd': 'Head-to-head goal difference',
+    'h2h_gf': 'Head-to-head goals scored',
+    'h2h_away_gf': 'Head-to-head away goals scored',
+}
+DEFAULT_TIEBREAKERS = ('gd', 'gf')
+
+# Computed from the fixtures, not from the standings row itself
+FIXTURE_TIEBREAKERS = frozenset(('away_gf', 'h2h_pts', 'h2h_gd', 'h2h_gf', 'h2h_away_gf'))
+HEAD_TO_HEAD_TIEBREAKERS = frozenset(('h2h_pts', 'h2h_gd', 'h2h_gf', 'h2h_away_gf'))
+
+
+def parse_tiebreakers(text):
+    """'h2h_pts, gd,gf' -> ('h2h_pts', 'gd', 'gf'). Raises ValueError for unknown or repeated names."""
+    tiebreakers = tuple(name.strip() for name in (text or '').split(',') if name.strip())
+    unknown = [name for name in tiebreakers if name not in TIEBREAKERS]
+    if unknown:
+        raise ValueError(f"Unknown tiebreaker(s): {', '.join(unknown)}. Choose from {', '.join(TIEBREAKERS)}.")
+    if len(set(tiebreakers)) != len(tiebreakers):
+        raise ValueError("Each tiebreaker can only be used once.")
+    return tiebreakers
+
+
+class StandingsRules:
+    """A tournament's points for a win, draw and loss, and its tiebreakers in order."""
+
+    def __init__(self, points_win=3, points_draw=1, points_loss=0, tiebreakers=DEFAULT_TIEBREAKERS):
+        self.points_win = points_win
+        self.points_draw = points_draw
+        self.points_loss = points_loss
+        self.tiebreakers = tuple(tiebreakers)
+
+    @classmethod
+    def from_row(cls, row):
+        # None (no such tournament) gets the defaults
+        if not row:
+            return cls()
+        return cls(row['points_win'], row['points_draw'], row['points_loss'], parse_tiebreakers(row['tiebreakers']))
+
+    @property
+    def points(self):
+        """Keyword arguments for the standings functions."""
+        return {'points_win': self.points_win, 'points_draw': self.points_draw, 'points_loss': self.points_loss}
+
+    def as_dict(self):
+        return dict(self.points, tiebreakers=','.join(self.tiebreakers))
+
+
+class HeadToHeadIndex:
+    """
+    Results between every pair of teams, built in one pass over the completed
+    fixtures (or one add() at a time). A tie group's mini-table is then summed
+    from the pairs inside the group, without going back to the fixture list.
+    """
+
+    def __init__(self, completed_fixtures=(), points_win=3, points_draw=1, points_loss=0):
+        self.points = {'points_win': points_win, 'points_draw': points_draw, 'points_loss': points_loss}
+        self.pairs = {} # team_id -> {opponent_id: [pts, gf, ga, away_gf]}
+        self.away_gf = {} # team_id -> goals scored as team2, over all fixtures
+        for fixture in completed_fixtures:
+            self.add(fixture)
+
+    def add(self, fixture, delta=None):
+        # delta: the fixture's fixture_standings_delta, if the caller already has it
+        team1_id, team2_id = fixture['team1_id'], fixture['team2_id']
+        if team1_id is None or team2_id is None: # A bye has no opponent
+            return
+        delta = delta or fixture_standings_delta(fixture, **self.points)
+        away_goals = delta[team2_id]['gf']
+        self.away_gf[team2_id] = self.away_gf.get(team2_id, 0) + away_goals
+        for team_id, opponent_id, away in ((team1_id, team2_id, 0), (team2_id, team1_id, away_goals)):
+            record = self.pairs.setdefault(team_id, {}).setdefault(opponent_id, [0, 0, 0, 0])
+            row = delta[team_id]
+            record[0] += row['pts']
+            record[1] += row['gf']
+            record[2] += row['ga']
+            record[3] += away
+
+    def mini_table(self, team_ids):
+        """{team_id: {'h2h_pts', 'h2h_gd', 'h2h_gf', 'h2h_away_gf'}} over the matches among team_ids only."""
+        group = set(team_ids)
+        table = {}
+        for team_id in group:
+            pts = gf = ga = away_gf = 0
+            opponents = self.pairs.get(team_id, {})
+            # Walk whichever is smaller: the group or this team's opponents
+            if len(opponents) <= len(group):
+                records = [record for opponent_id, record in opponents.items() if opponent_id in group]
+            else:
+                records = [opponents[opponent_id] for opponent_id in group if opponent_id in opponents]
+            for record in records:
+                pts += record[0]
+                gf += record[1]
+                ga += record[2]
+                away_gf += record[3]
+            table[team_id] = {'h2h_pts': pts, 'h2h_gd': gf - ga, 'h2h_gf': gf, 'h2h_away_gf': away_gf}
+        return table
+
+
+def rank_standings(standings, tiebreakers=DEFAULT_TIEBREAKERS, load_fixtures=None,
+                   points_win=3, points_draw=1, points_loss=0, head_to_head=None):
+    """
+    Sorts standings rows (dicts with id, name and the table columns) by points, then
+    by the tiebreakers in order, then by name and id.
+
+    Head-to-head tiebreakers compare the teams of a tie group on the matches among
+    themselves. When they split a group only partly, they are applied again to the
+    teams still level, on the matches among those teams only; the remaining
+    tiebreakers apply once no head-to-head tiebreaker separates them any further.
+
+    load_fixtures returns the completed fixtures; it is only called, once, if a tie
+    reaches a tiebreaker that needs them (away goals, head-to-head). A caller that
+    already keeps a HeadToHeadIndex of those fixtures passes it as head_to_head.
+    """
+    ranked = sorted(standings, key=lambda row: (-row['pts'], row['name'], row['id']))
+    if not tiebreakers or len(ranked) < 2:
+        return ranked
+
+    index = head_to_head
+
+    def get_index():
+        nonlocal index
+        if index is None:
+            index = HeadToHeadIndex(load_fixtures() if load_fixtures else [], points_win, points_draw, points_loss)
+        return index
+
+    def split(group, key):
+        # Stable sort keeps the name order inside each run of equal keys
+        group = sorted(group, key=key)
+        runs, start = [], 0
+        for position in range(1, len(group) + 1):
+            if position == len(group) or key(group[position]) != key(group[start]):
+                runs.append(group[start:position])
+                start = position
+        return runs
+
+    def resolve(group, criteria):
+        if len(group) < 2 or not criteria:
+            return group
+        # The leading block of criteria of one kind is applied together
+        head_to_head = criteria[0] in HEAD_TO_HEAD_TIEBREAKERS
+        block_size = 1
+        while block_size < len(criteria) and (criteria[block_size] in HEAD_TO_HEAD_TIEBREAKERS) == head_to_head:
+            block_size += 1
+        block, rest = criteria[:block_size], criteria[block_size:]
+
+        if head_to_head:
+            table = get_index().mini_table([row['id'] for row in group])
+            runs = split(group, lambda row: tuple(-table[row['id']][name] for name in block))
+        else:
+            if 'away_gf' in block:
+                away_gf = get_index().away_gf
+                values = lambda row, name: away_gf.get(row['id'], 0) if name == 'away_gf' else row[name]
+            else:
+                values = lambda row, name: row[name]
+            runs = split(group, lambda row: tuple(-values(row, name) for name in block))
+
+        ordered = []
+        for run in runs:
+            if head_to_head and 1 < len(run) < len(group):
+                ordered.extend(resolve(run, criteria)) # Mini-table again, among the teams still level
+            else:
+                ordered.extend(resolve(run, rest))
+        return ordered
+
+    result = []
+    for group in split(ranked, lambda row: -row['pts']):
+        result.extend(resolve(group, tiebreakers))
+    return result
+
+
+
+def calculate_standings_data(teams, completed_fixtures, points_win=3, points_draw=1, points_loss=0,
+                             tiebreakers=DEFAULT_TIEBREAKERS):
     if not teams:
         return []
 
@@ -10,11 +200,12 @@ def calculate_standings_data(teams, completed_fixtures, points_win=3, points_dra
             'gf': 0, 'ga': 0, 'gd': 0, 'pts': 0
         } for team in teams
     }
-    print(f"--- Initial Standings Dict: {standings}") # DEBUG
-    print(f"--- Processing {len(completed_fixtures)} Completed Fixtures: {completed_fixtures}") # DEBUG
+    # Checked once: with debug off the loop below does no logging work at all
+    debug = log.isEnabledFor(logging.DEBUG)
+    if debug:
+        log.debug("Calculating standings for %d teams from %d completed fixtures", len(standings), len(completed_fixtures))
 
     for fixture in completed_fixtures:
-        print(f"--- Processing Fixture: {fixture}") # DEBUG
         team1_id = fixture['team1_id']
         team2_id = fixture['team2_id']
         score1 = fixture['score1']
@@ -24,11 +215,12 @@ def calculate_standings_data(teams, completed_fixtures, points_win=3, points_dra
         s1 = int(score1) if score1 is not None else 0
         s2 = int(score2) if score2 is not None else 0
         
-        print(f"Fixture details: T1_ID={team1_id}, T2_ID={team2_id}, S1={s1}, S2={s2}, Winner_ID={winner_id}") # DEBUG
+        if debug:
+            log.debug("Fixture %s: T1_ID=%s, T2_ID=%s, S1=%s, S2=%s, Winner_ID=%s",
+                      fixture.get('id'), team1_id, team2_id, s1, s2, winner_id)
 
         # --- Update stats for Team 1 ---
         if team1_id in standings:
-            print(f"Updating Team 1 ({standings[team1_id]['name']})") # DEBUG
             standings[team1_id]['mp'] += 1
             standings[team1_id]['gf'] += s1
             standings[team1_id]['ga'] += s2
@@ -36,25 +228,20 @@ def calculate_standings_data(teams, completed_fixtures, points_win=3, points_dra
             if team2_id is None: 
                 standings[team1_id]['w'] += 1
                 standings[team1_id]['pts'] += points_win
-                print(f"  Team 1 Bye Win. New Pts: {standings[team1_id]['pts']}") # DEBUG
             elif winner_id == team1_id:
                 standings[team1_id]['w'] += 1
                 standings[team1_id]['pts'] += points_win
-                print(f"  Team 1 Win. New Pts: {standings[team1_id]['pts']}") # DEBUG
             elif winner_id == team2_id: 
                 standings[team1_id]['l'] += 1
                 standings[team1_id]['pts'] += points_loss
-                print(f"  Team 1 Loss. New Pts: {standings[team1_id]['pts']}") # DEBUG
             elif winner_id is None and score1 is not None and score2 is not None and s1 == s2 : # Explicitly check s1 == s2 for draw
                 standings[team1_id]['d'] += 1
                 standings[team1_id]['pts'] += points_draw
-                print(f"  Team 1 Draw. New Pts: {standings[team1_id]['pts']}") # DEBUG
-            else:
-                print(f"  Team 1: No points condition met (Winner ID: {winner_id}, S1: {score1}, S2: {score2})") # DEBUG
+            elif debug:
+                log.debug("Team 1: No points condition met (Winner ID: %s, S1: %s, S2: %s)", winner_id, score1, score2)
 
         # --- Update stats for Team 2 (if it's not a bye) ---
         if team2_id and team2_id in standings:
-            print(f"Updating Team 2 ({standings[team2_id]['name']})") # DEBUG
             standings[team2_id]['mp'] += 1
             standings[team2_id]['gf'] += s2
             standings[team2_id]['ga'] += s1
@@ -62,19 +249,14 @@ def calculate_standings_data(teams, completed_fixtures, points_win=3, points_dra
             if winner_id == team2_id:
                 standings[team2_id]['w'] += 1
                 standings[team2_id]['pts'] += points_win
-                print(f"  Team 2 Win. New Pts: {standings[team2_id]['pts']}") # DEBUG
             elif winner_id == team1_id: 
                 standings[team2_id]['l'] += 1
                 standings[team2_id]['pts'] += points_loss
-                print(f"  Team 2 Loss. New Pts: {standings[team2_id]['pts']}") # DEBUG
             elif winner_id is None and score1 is not None and score2 is not None and s1 == s2: # Explicitly check s1 == s2 for draw
                 standings[team2_id]['d'] += 1
                 standings[team2_id]['pts'] += points_draw
-                print(f"  Team 2 Draw. New Pts: {standings[team2_id]['pts']}") # DEBUG
-            else:
-                print(f"  Team 2: No points condition met (Winner ID: {winner_id}, S1: {score1}, S2: {score2})") # DEBUG
-        
-        # print(f"--- Standings after fixture {fixture['id']}: {standings}") # DEBUG (optional, can be very verbose)
+            elif debug:
+                log.debug("Team 2: No points condition met (Winner ID: %s, S1: %s, S2: %s)", winner_id, score1, score2)
 
 
     standings_list = []
@@ -82,9 +264,151 @@ def calculate_standings_data(teams, completed_fixtures, points_win=3, points_dra
         standings[team_id]['gd'] = standings[team_id]['gf'] - standings[team_id]['ga']
         standings_list.append(standings[team_id])
 
-    sorted_standings = sorted(
-        standings_list,
-        key=lambda x: (-x['pts'], -x['gd'], -x['gf'], x['name'])
-    )
-    print(f"--- Final Sorted Standings: {sorted_standings}") # DEBUG
-    return sorted_standings
\ No newline at end of file
+    sorted_standings = rank_standings(standings_list, tiebreakers, lambda: completed_fixtures,
+                                      points_win=points_win, points_draw=points_draw, points_loss=points_loss)
+    if debug:
+        log.debug("Final sorted standings: %s", sorted_standings)
+    return sorted_standings
+
+def standings_history(teams, completed_fixtures, points_win=3, points_draw=1, points_loss=0,
+                      tiebreakers=DEFAULT_TIEBREAKERS):
+    """
+    The table after each round, in one pass: [(round_number, standings), ...] for every
+    round with completed fixtures, each standings list ranked like calculate_standings_data
+    over the fixtures of that round and the ones before it.
+
+    Totals (and the head-to-head index, if the tiebreakers need one) are carried from
+    round to round, so the whole history costs one replay of the fixtures plus one
+    ranking per round, instead of a replay up to every round.
+    """
+    if not teams:
+        return []
+    totals = {
+        team['id']: {'id': team['id'], 'name': team['name'], 'mp': 0, 'w': 0, 'd': 0, 'l': 0,
+                     'gf': 0, 'ga': 0, 'gd': 0, 'pts': 0}
+        for team in teams
+    }
+    index = None
+    if FIXTURE_TIEBREAKERS.intersection(tiebreakers):
+        index = HeadToHeadIndex(points_win=points_win, points_draw=points_draw, points_loss=points_loss)
+
+    history = []
+    ordered = sorted(completed_fixtures, key=lambda fixture: fixture['round_number'] or 0)
+    for round_number, round_fixtures in itertools.groupby(ordered, key=lambda fixture: fixture['round_number'] or 0):
+        for fixture in round_fixtures:
+            delta = fixture_standings_delta(fixture, points_win, points_draw, points_loss)
+            for team_id, row in delta.items():
+                if team_id in totals:
+                    total = totals[team_id]
+                    for column, value in row.items():
+                        total[column] += value
+            if index is not None:
+                index.add(fixture, delta)
+        # Snapshot copies: the totals keep changing in later rounds
+        history.append((round_number, rank_standings(
+            [dict(row) for row in totals.values()], tiebreakers, None,
+            points_win=points_win, points_draw=points_draw, points_loss=points_loss, head_to_head=index)))
+    return history
+
+def fixture_standings_delta(fixture, points_win=3, points_draw=1, points_loss=0):
+    """
+    Returns the contribution of one completed fixture to the table, as
+    {team_id: {'mp', 'w', 'd', 'l', 'gf', 'ga', 'gd', 'pts'}}.
+    Uses exactly the same rules as calculate_standings_data, so summing the
+    deltas of all completed fixtures reproduces its numbers.
+    """
+    team1_id = fixture['team1_id']
+    team2_id = fixture['team2_id']
+    score1 = fixture['score1']
+    score2 = fixture['score2']
+    winner_id = fixture['winner_id']
+
+    s1 = int(score1) if score1 is not None else 0
+    s2 = int(score2) if score2 is not None else 0
+    is_draw = winner_id is None and score1 is not None and score2 is not None and s1 == s2
+
+    delta = {}
+    if team1_id is not None:
+        row = {'mp': 1, 'w': 0, 'd': 0, 'l': 0, 'gf': s1, 'ga': s2, 'gd': s1 - s2, 'pts': 0}
+        if team2_id is None or winner_id == team1_id: # Bye counts as a win
+            row['w'], row['pts'] = 1, points_win
+        elif winner_id == team2_id:
+            row['l'], row['pts'] = 1, points_loss
+        elif is_draw:
+            row['d'], row['pts'] = 1, points_draw
+        delta[team1_id] = row
+
+    if team2_id:
+        row = {'mp': 1, 'w': 0, 'd': 0, 'l': 0, 'gf': s2, 'ga': s1, 'gd': s2 - s1, 'pts': 0}
+        if winner_id == team2_id:
+            row['w'], row['pts'] = 1, points_win
+        elif winner_id == team1_id:
+            row['l'], row['pts'] = 1, points_loss
+        elif is_draw:
+            row['d'], row['pts'] = 1, points_draw
+        delta[team2_id] = row
+
+    return delta
+
+
+# Same table as calculate_standings_data, built by the database in one round trip:
+# each completed fixture is split into a home row and an away row (UNION ALL) and
+# aggregated per participant; rank_standings then applies the tiebreakers.
+# Participants are the driving table so teams without results still appear with zeros.
+SQL_STANDINGS = """
+    SELECT p.id, p.name,
+           COUNT(r.team_id) AS mp,
+           COALESCE(SUM(r.w), 0) AS w,
+           COALESCE(SUM(r.d), 0) AS d,
+           COALESCE(SUM(r.l), 0) AS l,
+           COALESCE(SUM(r.gf), 0) AS gf,
+           COALESCE(SUM(r.ga), 0) AS ga,
+           COALESCE(SUM(r.gf) - SUM(r.ga), 0) AS gd,
+           COALESCE(SUM(r.w) * %s + SUM(r.d) * %s + SUM(r.l) * %s, 0) AS pts
+    FROM participants p
+    LEFT JOIN (
+        SELECT team1_id AS team_id,
+               COALESCE(score1, 0) AS gf,
+               COALESCE(score2, 0) AS ga,
+               CASE WHEN team2_id IS NULL OR winner_id = team1_id THEN 1 ELSE 0 END AS w,
+               CASE WHEN team2_id IS NOT NULL AND winner_id = team2_id THEN 1 ELSE 0 END AS l,
+               CASE WHEN team2_id IS NOT NULL AND winner_id IS NULL AND score1 = score2 THEN 1 ELSE 0 END AS d
+        FROM fixtures
+        WHERE tournament_id = %s AND status = 'Completed'
+        UNION ALL
+        SELECT team2_id AS team_id,
+               COALESCE(score2, 0) AS gf,
+               COALESCE(score1, 0) AS ga,
+               CASE WHEN winner_id = team2_id THEN 1 ELSE 0 END AS w,
+               CASE WHEN winner_id = team1_id THEN 1 ELSE 0 END AS l,
+               CASE WHEN winner_id IS NULL AND score1 = score2 THEN 1 ELSE 0 END AS d
+        FROM fixtures
+        WHERE tournament_id = %s AND status = 'Completed' AND team2_id IS NOT NULL
+    ) r ON r.team_id = p.id
+    WHERE p.tournament_id = %s
+    GROUP BY p.id, p.name
+    ORDER BY pts DESC, gd DESC, gf DESC, p.name ASC
+"""
+
+
+def calculate_standings_sql(cursor, tournament_id, points_win=3, points_draw=1, points_loss=0,
+                            tiebreakers=DEFAULT_TIEBREAKERS):
+    """
+    SQL engine for the league table. Returns the same rows as
+    calculate_standings_data (which stays the reference implementation)
+    without shipping the completed fixtures to Python, unless a tie needs
+    fixture-based tiebreakers.
+    """
+    cursor.execute(SQL_STANDINGS, (points_win, points_draw, points_loss,
+                                   tournament_id, tournament_id, tournament_id))
+    standings = []
+    for row in cursor.fetchall():
+        # SUM() comes back as Decimal from MySQL; keep the Python engine's int columns
+        standings.append({
+            'id': row['id'],
+            'name': row['name'],
+            'mp': int(row['mp']), 'w': int(row['w']), 'd': int(row['d']), 'l': int(row['l']),
+            'gf': int(row['gf']), 'ga': int(row['ga']), 'gd': int(row['gd']), 'pts': int(row['pts'])
+        })
+    return rank_standings(standings, tiebreakers, lambda: db_utils.repository().completed_fixtures(cursor, tournament_id),
+                          points_win=points_win, points_draw=points_draw, points_loss=points_loss)
@@ -0,0 +1,213 @@
+import json
+import logging
+import queue
+import threading
+
+from flask import Response, request, jsonify
+
+from app import app
+from app import db_utils
+
+# Live score feed: Server-Sent Events per tournament.
+#
+# Write routes publish one event per change after they commit (see
+# routes.publish_live_changes); the broker fans it out to every subscribed
+# stream, so N spectators cost one notification instead of N polling requests.
+# Each stream waits on its own queue and holds no database connection, but it does
+# keep a server thread busy, so LIVE_MAX_STREAMS bounds how many one process serves.
+#
+# With LIVE_BACKEND = 'redis', events go through a Redis pub/sub channel and one
+# listener thread per worker process delivers them to that process' streams, so
+# an update committed in one worker reaches spectators connected to any worker.
+#
+# Event types (the SSE id is the tournament's data_version after the change):
+#   fixture    one fixture's teams, scores, status and winner
+#   standings  the full league table
+#   round      fixtures were added (new round / bracket); clients reload the page
+#   resync     the client missed events while disconnected; it reloads the page
+
+log = logging.getLogger(__name__)
+
+REDIS_CHANNEL = 'tosports:live'
+
+
+class Subscriber:
+    def __init__(self, tournament_id, max_queued):
+        self.tournament_id = tournament_id
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.dropped = False # Set when the client fell too far behind; its stream ends with a resync
+
+
+class LiveBroker:
+    """Per-process registry of live streams, keyed by tournament."""
+
+    def __init__(self, max_subscribers=500, max_queued=100):
+        self.max_subscribers = max_subscribers
+        self.max_queued = max_queued
+        self._subscribers = {} # tournament_id -> set of Subscriber
+        self._count = 0
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, tournament_id):
+        """Returns a Subscriber, or None if this process already serves max_subscribers streams."""
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(tournament_id, self.max_queued)
+            self._subscribers.setdefault(tournament_id, set()).add(subscriber)
+            self._count += 1
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.tournament_id)
+            if subscribers and subscriber in subscribers:
+                subscribers.discard(subscriber)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscriber.tournament_id]
+
+    def has_subscribers(self, tournament_id):
+        return bool(self._subscribers.get(tournament_id))
+
+    def deliver(self, tournament_id, message):
+        """Puts an encoded SSE message on every local stream of the tournament. Never blocks."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(tournament_id, ()))
+            self.published += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+                self.delivered += 1
+            except queue.Full:
+                # A stalled client must not hold events (or the publisher) back
+                subscriber.dropped = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'streams': self._count,
+                'tournaments': len(self._subscribers),
+                'max_streams': self.max_subscribers,
+                'events_published': self.published,
+                'events_delivered': self.delivered,
+            }
+
+
+broker = LiveBroker(max_subscribers=app.config['LIVE_MAX_STREAMS'], max_queued=app.config['LIVE_MAX_QUEUED_EVENTS'])
+
+
+def encode_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+# --- Redis fan-out between worker processes ---
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+
+def _redis():
+    global _redis_client
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                try:
+                    import redis
+                except ImportError as e:
+                    raise RuntimeError("LIVE_BACKEND = 'redis' requires the 'redis' package (pip install redis)") from e
+                client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+                threading.Thread(target=_redis_listener, args=(client,), name='live-redis-listener', daemon=True).start()
+                _redis_client = client
+    return _redis_client
+
+
+def _redis_listener(client):
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(REDIS_CHANNEL)
+    for item in pubsub.listen():
+        try:
+            payload = json.loads(item['data'])
+            broker.deliver(payload['tournament_id'], payload['message'])
+        except (ValueError, KeyError, TypeError):
+            log.warning("Ignoring malformed live event: %r", item.get('data'))
+
+
+def wants_events(tournament_id):
+    """False when nobody can be listening, so publishers can skip building events."""
+    if app.config['LIVE_BACKEND'] == 'redis':
+        return True # Subscribers may be connected to other workers
+    return broker.has_subscribers(tournament_id)
+
+
+def publish(tournament_id, event, data, event_id=None):
+    # Called after the write has committed, so a broken fan-out must not fail the request
+    message = encode_event(event, data, event_id)
+    if app.config['LIVE_BACKEND'] == 'redis':
+        try:
+            _redis().publish(REDIS_CHANNEL, json.dumps({'tournament_id': tournament_id, 'message': message}))
+        except Exception as e:
+            log.warning("Live event for tournament %s not published: %s", tournament_id, e)
+    else:
+        broker.deliver(tournament_id, message)
+
+
+def event_stream(subscriber, initial=()):
+    try:
+        for message in initial:
+            yield message
+        while not subscriber.dropped:
+            try:
+                yield subscriber.queue.get(timeout=app.config['LIVE_HEARTBEAT_SECONDS'])
+            except queue.Empty:
+                yield ': keepalive\n\n' # Keeps proxies from closing an idle stream
+        yield encode_event('resync', {})
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def stream_response(tournament_id, current_version):
+    """
+    The SSE response for a tournament. A client whose Last-Event-ID (or ?since=,
+    the version its page was rendered at) differs from current_version missed
+    events, so it is told to resync first.
+    """
+    if app.config['LIVE_BACKEND'] == 'redis':
+        _redis() # Make sure this process listens before the first event can be missed
+    subscriber = broker.subscribe(tournament_id)
+    if subscriber is None:
+        return Response("Too many live viewers; reload the page to see the latest scores.\n", status=503,
+                        mimetype='text/plain', headers={'Retry-After': '30'})
+
+    initial = [f"retry: {app.config['LIVE_RETRY_MS']}\n\n"]
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    if last_event_id is not None and last_event_id != str(current_version):
+        initial.append(encode_event('resync', {}, current_version))
+    return Response(event_stream(subscriber, initial), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/tournament/<int:tournament_id>/live')
+def live_feed(tournament_id):
+    # The version lookup uses the request's pooled connection, which is released in
+    # teardown as soon as the response starts; the stream itself needs none.
+    try:
+        with db_utils.get_request_connection().cursor() as cursor:
+            tournament = db_utils.repository().get_tournament(cursor, tournament_id)
+    except db_utils.DB_ERRORS as e:
+        return Response(f"Database error: {e}\n", status=503, mimetype='text/plain', headers={'Retry-After': '10'})
+    if tournament is None:
+        return Response("Tournament not found.\n", status=404, mimetype='text/plain')
+    return stream_response(tournament_id, tournament['data_version'])
+
+
+@app.route('/admin/live_stats')
+def live_stats():
+    return jsonify(broker.stats())
@@ -0,0 +1,118 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import time
+import uuid
+
+from flask import g, has_request_context, request, jsonify
+
+from app import app
+
+# Logging for the app package.
+#
+# - Every module logs through logging.getLogger(__name__), i.e. 'app.routes',
+#   'app.league_utils', ... so levels can be set per module.
+# - Messages use %-style arguments (log.debug("x=%s", x)); they are only formatted
+#   when a handler actually emits the record. Hot loops additionally check
+#   log.isEnabledFor(logging.DEBUG) once, so disabled debug output costs nothing.
+# - Records are handed to a queue and written by a single background thread, so
+#   request threads never block on (or serialize behind) stderr writes.
+# - Output is one JSON object per line (LOG_FORMAT = 'json') carrying the request id,
+#   which comes from the X-Request-ID header or is generated per request.
+# - Levels can be changed at runtime through /admin/log_levels (per worker process).
+
+# Attributes every LogRecord has; anything else was passed via extra={...} and is logged as a field
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = g.get('request_id', '-') if has_request_context() else '-'
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+JsonFormatter.converter = time.gmtime
+
+
+def configure_logging():
+    package_logger = logging.getLogger('app')
+    package_logger.propagate = False # Keep our records out of Flask/werkzeug's root handlers
+
+    if app.config['LOG_FORMAT'] == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+    output_handler = logging.StreamHandler()
+    output_handler.setFormatter(formatter)
+
+    # The request id is captured by a filter on the queue handler, i.e. still in the
+    # request thread; the listener thread only formats and writes.
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    package_logger.handlers = [queue_handler]
+
+    listener = logging.handlers.QueueListener(log_queue, output_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    for logger_name, level in app.config['LOG_LEVELS'].items():
+        logging.getLogger(logger_name).setLevel(level)
+
+
+@app.before_request
+def assign_request_id():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+
+@app.after_request
+def echo_request_id(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+@app.route('/admin/log_levels', methods=['GET', 'POST'])
+def log_levels():
+    """
+    GET lists the configured level of every 'app' logger. POST with a JSON object
+    such as {"app.league_utils": "DEBUG"} changes levels in this worker process.
+    """
+    if request.method == 'POST':
+        changes = request.get_json(silent=True) or {}
+        for logger_name, level in changes.items():
+            if logger_name != 'app' and not logger_name.startswith('app.'):
+                return jsonify({'error': f"Only 'app' loggers can be changed: {logger_name}"}), 400
+            if level is not None and not isinstance(logging.getLevelName(str(level).upper()), int):
+                return jsonify({'error': f"Unknown level: {level}"}), 400
+        for logger_name, level in changes.items():
+            # None resets a module to inherit its parent's level
+            logging.getLogger(logger_name).setLevel(str(level).upper() if level is not None else logging.NOTSET)
+
+    loggers = {'app': logging.getLevelName(logging.getLogger('app').level)}
+    for name, logger in sorted(logging.Logger.manager.loggerDict.items()):
+        if name.startswith('app.') and isinstance(logger, logging.Logger):
+            loggers[name] = logging.getLevelName(logger.getEffectiveLevel())
+    return jsonify(loggers)
+
+
+configure_logging()
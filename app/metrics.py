@@ -0,0 +1,229 @@
+import bisect
+import threading
+import time
+
+from flask import g, request, Response, before_render_template, template_rendered
+
+from app import app
+from app import cache
+from app import db_utils
+from app import live
+
+# Prometheus metrics, served as text exposition format on /metrics.
+#
+# Recording happens on every request, so it takes no locks: each thread owns a
+# MetricsShard and only that thread ever writes to it. A scrape copies every shard
+# and sums them. Shards of threads that have exited are folded into one retired
+# shard during a scrape, so thread-per-request servers don't grow the registry.
+#
+# Collected per Flask endpoint (label values are endpoint names, never raw paths):
+#   tosports_http_request_duration_seconds  histogram {endpoint, method}
+#   tosports_http_requests_total            counter   {endpoint, method, status}
+#   tosports_db_queries_total               counter   {endpoint}  (needs QUERY_PROFILING)
+#   tosports_db_query_duration_seconds_total counter  {endpoint}  (needs QUERY_PROFILING)
+#   tosports_template_render_duration_seconds histogram {template}
+# plus connection pool, page cache and live feed gauges/counters read at scrape time.
+
+
+class MetricsShard:
+    """One thread's counters and histograms. Only the owning thread writes to it."""
+
+    def __init__(self, thread=None):
+        self.thread = thread
+        self.counters = {}   # (name, labels) -> value
+        self.histograms = {} # (name, labels) -> [bucket counts..., +Inf count, sum]
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = [0] * (len(buckets) + 2)
+            self.histograms[key] = histogram
+        histogram[bisect.bisect_left(buckets, value)] += 1 # Buckets are upper bounds (le)
+        histogram[-1] += value
+
+    def snapshot(self):
+        # dict() copies in one step under the GIL, so a concurrent insert by the owner can't break it
+        counters = dict(self.counters)
+        histograms = {key: list(values) for key, values in dict(self.histograms).items()}
+        return counters, histograms
+
+    def merge(self, counters, histograms):
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, values in histograms.items():
+            existing = self.histograms.get(key)
+            if existing is None:
+                self.histograms[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    existing[i] += value
+
+
+class MetricsRegistry:
+    def __init__(self, latency_buckets, render_buckets):
+        self.latency_buckets = tuple(latency_buckets)
+        self.render_buckets = tuple(render_buckets)
+        self.buckets = {
+            'tosports_http_request_duration_seconds': self.latency_buckets,
+            'tosports_template_render_duration_seconds': self.render_buckets,
+        }
+        self._local = threading.local()
+        self._shards = []
+        self._retired = MetricsShard()
+        self._lock = threading.Lock() # Only taken when a thread registers its shard and on scrape
+
+    def shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = MetricsShard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def collect(self):
+        """Returns (counters, histograms) summed over every thread."""
+        total = MetricsShard()
+        with self._lock:
+            live = []
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    live.append(shard)
+                else:
+                    self._retired.merge(*shard.snapshot())
+            self._shards = live
+            total.merge(*self._retired.snapshot())
+            for shard in live:
+                total.merge(*shard.snapshot())
+        return total.counters, total.histograms
+
+
+registry = MetricsRegistry(app.config['METRICS_LATENCY_BUCKETS'], app.config['METRICS_RENDER_BUCKETS'])
+
+
+@app.before_request
+def start_request_timer():
+    g.metrics_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('metrics_start')
+    if start is None or not app.config['METRICS_ENABLED']:
+        return response
+    shard = registry.shard()
+    endpoint = request.endpoint or 'unmatched' # 404s share one label instead of one per path
+    shard.observe('tosports_http_request_duration_seconds', (('endpoint', endpoint), ('method', request.method)),
+                  time.perf_counter() - start, registry.latency_buckets)
+    shard.inc('tosports_http_requests_total',
+              (('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))))
+
+    profile = g.get('query_profile')
+    if profile is not None:
+        shard.inc('tosports_db_queries_total', (('endpoint', endpoint),), profile.statements)
+        shard.inc('tosports_db_query_duration_seconds_total', (('endpoint', endpoint),), profile.total_time)
+    return response
+
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault('metrics_render_starts', []).append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    starts = g.get('metrics_render_starts')
+    if not starts or not app.config['METRICS_ENABLED']:
+        return
+    registry.shard().observe('tosports_template_render_duration_seconds', (('template', template.name or 'string'),),
+                             time.perf_counter() - starts.pop(), registry.render_buckets)
+
+
+before_render_template.connect(_template_started, app)
+template_rendered.connect(_template_finished, app)
+
+
+HELP = {
+    'tosports_http_request_duration_seconds': ('histogram', 'Request latency by Flask endpoint.'),
+    'tosports_http_requests_total': ('counter', 'Responses by endpoint and status code.'),
+    'tosports_db_queries_total': ('counter', 'SQL statements executed while serving requests.'),
+    'tosports_db_query_duration_seconds_total': ('counter', 'Time spent in SQL statements while serving requests.'),
+    'tosports_template_render_duration_seconds': ('histogram', 'Jinja template render time.'),
+    'tosports_db_pool_connections': ('gauge', 'Open pooled connections by state.'),
+    'tosports_db_pool_max_connections': ('gauge', 'Configured pool size limit.'),
+    'tosports_db_pool_events_total': ('counter', 'Connection pool events.'),
+    'tosports_cache_requests_total': ('counter', 'Page cache lookups by result.'),
+    'tosports_live_streams': ('gauge', 'Open Server-Sent Events streams in this process.'),
+    'tosports_live_events_total': ('counter', 'Live events fanned out, and their deliveries to streams.'),
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    counters, histograms = registry.collect()
+
+    # Point-in-time values, read at scrape instead of being tracked per request
+    gauges = {}
+    pool = db_utils._pool # Don't open a pool just to report on it
+    if pool is not None:
+        stats = pool.stats()
+        gauges[('tosports_db_pool_connections', (('state', 'idle'),))] = stats['idle']
+        gauges[('tosports_db_pool_connections', (('state', 'in_use'),))] = stats['in_use']
+        gauges[('tosports_db_pool_max_connections', ())] = stats['max_size']
+        for event in ('checkouts', 'connections_created', 'connections_reused', 'closed_idle', 'closed_dead', 'waits', 'timeouts'):
+            counters[('tosports_db_pool_events_total', (('event', event),))] = stats[event]
+    if cache._tournament_cache is not None:
+        stats = cache._tournament_cache.stats()
+        counters[('tosports_cache_requests_total', (('result', 'hit'),))] = stats['hits']
+        counters[('tosports_cache_requests_total', (('result', 'miss'),))] = stats['misses']
+    stats = live.broker.stats()
+    gauges[('tosports_live_streams', ())] = stats['streams']
+    counters[('tosports_live_events_total', (('stage', 'published'),))] = stats['events_published']
+    counters[('tosports_live_events_total', (('stage', 'delivered'),))] = stats['events_delivered']
+
+    families = {}
+    for (name, labels), value in list(counters.items()) + list(gauges.items()):
+        families.setdefault(name, []).append((labels, value))
+    for (name, labels), values in histograms.items():
+        families.setdefault(name, []).append((labels, values))
+
+    lines = []
+    for name in sorted(families):
+        kind, help_text = HELP.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(families[name], key=lambda item: item[0]):
+            if kind != 'histogram':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            buckets = registry.buckets[name]
+            cumulative = 0
+            for bound, count in zip(buckets + (float('inf'),), value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", _number(float(bound))),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(float(value[-1]))}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,185 @@
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+import pymysql
+from flask import g, has_app_context, request, jsonify
+
+from app import app
+
+# Per-request SQL profiling.
+#
+# The pool hands out connections whose cursors are ProfilingDictCursor (when
+# QUERY_PROFILING is on). Every execute()/executemany() made while a request is
+# active is timed and recorded in g.query_profile, keyed by its SQL template
+# (the statement before parameters are bound), which is what N+1 patterns repeat.
+#
+# - Slow statements (QUERY_SLOW_THRESHOLD_MS) are logged to 'app.profiling.slow'
+#   as they happen, with the request id.
+# - Each response gets a Server-Timing header ("db;dur=12.3;desc=\"7 queries\"")
+#   plus X-DB-Queries, which browser dev tools show next to the request.
+# - Templates run QUERY_REPEAT_THRESHOLD or more times in one request are logged as
+#   likely N+1 patterns.
+# - /admin/query_profiles lists the last QUERY_PROFILE_HISTORY request profiles.
+
+log = logging.getLogger(__name__)
+slow_log = logging.getLogger(__name__ + '.slow')
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(query):
+    return _WHITESPACE.sub(' ', query).strip()
+
+
+class QueryProfile:
+    """Statements, time and repeated templates of one request."""
+
+    def __init__(self, slow_threshold_ms=None, keep_slowest=5):
+        self.statements = 0
+        self.total_time = 0.0
+        self.patterns = {} # normalized template -> [count, total seconds]
+        self.slow_threshold = slow_threshold_ms / 1000.0 if slow_threshold_ms else None
+        self.keep_slowest = keep_slowest
+        self._slowest = [] # min-heap of (seconds, sequence, template)
+
+    def record(self, query, elapsed):
+        template = normalize_sql(query)
+        self.statements += 1
+        self.total_time += elapsed
+        pattern = self.patterns.get(template)
+        if pattern is None:
+            self.patterns[template] = [1, elapsed]
+        else:
+            pattern[0] += 1
+            pattern[1] += elapsed
+
+        entry = (elapsed, self.statements, template)
+        if len(self._slowest) < self.keep_slowest:
+            heapq.heappush(self._slowest, entry)
+        elif elapsed > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            slow_log.warning("Slow query (%.1f ms): %s", elapsed * 1000, template,
+                             extra={'duration_ms': round(elapsed * 1000, 2)})
+
+    def slowest(self):
+        return [{'sql': template, 'ms': round(elapsed * 1000, 2)}
+                for elapsed, _, template in sorted(self._slowest, reverse=True)]
+
+    def repeated(self, threshold):
+        """Templates executed at least `threshold` times, most frequent first."""
+        repeats = [(count, seconds, template) for template, (count, seconds) in self.patterns.items() if count >= threshold]
+        repeats.sort(key=lambda item: (-item[0], -item[1]))
+        return [{'sql': template, 'count': count, 'total_ms': round(seconds * 1000, 2)}
+                for count, seconds, template in repeats]
+
+
+def current_profile():
+    return g.get('query_profile') if has_app_context() else None
+
+
+class ProfilingCursorMixin:
+    """
+    Mix into any PyMySQL (or sqlite_backend) cursor class to time its statements
+    into the current request's QueryProfile. Outside a request (CLI commands) it
+    does nothing.
+    """
+
+    _profiling = False
+
+    def execute(self, query, args=None):
+        return self._profiled(super().execute, query, args)
+
+    def executemany(self, query, args):
+        return self._profiled(super().executemany, query, args)
+
+    def _profiled(self, method, query, args):
+        profile = current_profile()
+        # executemany() calls execute() for each batch; only the outer call is recorded
+        if profile is None or self._profiling:
+            return method(query, args)
+        self._profiling = True
+        start = time.perf_counter()
+        try:
+            return method(query, args)
+        finally:
+            self._profiling = False
+            profile.record(query, time.perf_counter() - start)
+
+
+class ProfilingDictCursor(ProfilingCursorMixin, pymysql.cursors.DictCursor):
+    pass
+
+
+class ProfilingSSDictCursor(ProfilingCursorMixin, pymysql.cursors.SSDictCursor):
+    # Unbuffered: the recorded time covers sending the query, not reading the rows
+    pass
+
+
+def cursor_class():
+    """The cursor class pooled connections are created with."""
+    return ProfilingDictCursor if app.config['QUERY_PROFILING'] else pymysql.cursors.DictCursor
+
+
+def streaming_cursor_class():
+    """
+    Server-side (unbuffered) dict cursor, for connection.cursor(streaming_cursor_class()).
+    Rows are read from the socket as they are fetched; the connection cannot run
+    another statement until the result has been read to the end.
+    """
+    return ProfilingSSDictCursor if app.config['QUERY_PROFILING'] else pymysql.cursors.SSDictCursor
+
+
+_recent_profiles = deque(maxlen=app.config['QUERY_PROFILE_HISTORY'])
+_recent_profiles_lock = threading.Lock()
+
+
+@app.before_request
+def start_query_profile():
+    if app.config['QUERY_PROFILING']:
+        g.query_profile = QueryProfile(slow_threshold_ms=app.config['QUERY_SLOW_THRESHOLD_MS'])
+
+
+@app.after_request
+def finish_query_profile(response):
+    profile = g.get('query_profile')
+    if profile is None:
+        return response
+
+    db_ms = profile.total_time * 1000
+    response.headers['X-DB-Queries'] = str(profile.statements)
+    response.headers.add('Server-Timing', f'db;dur={db_ms:.1f};desc="{profile.statements} queries"')
+
+    repeated = profile.repeated(app.config['QUERY_REPEAT_THRESHOLD'])
+    for pattern in repeated:
+        log.warning("Possible N+1 on %s %s: %d executions (%.1f ms) of %s",
+                    request.method, request.path, pattern['count'], pattern['total_ms'], pattern['sql'],
+                    extra={'endpoint': request.endpoint, 'repeat_count': pattern['count']})
+
+    summary = {
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'request_id': g.get('request_id'),
+        'statements': profile.statements,
+        'db_time_ms': round(db_ms, 2),
+        'slowest': profile.slowest(),
+        'repeated': repeated,
+    }
+    with _recent_profiles_lock:
+        _recent_profiles.append(summary)
+    return response
+
+
+@app.route('/admin/query_profiles')
+def query_profiles():
+    with _recent_profiles_lock:
+        profiles = list(_recent_profiles)
+    profiles.reverse() # Newest first
+    return jsonify(profiles)
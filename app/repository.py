@@ -0,0 +1,364 @@
+import secrets
+
+# Data access for tournaments, teams and fixtures.
+#
+# The SQL the routes used to inline lives here, behind one repository class per
+# storage backend (DB_BACKEND, see db_utils.repository()). Methods take the
+# caller's cursor, like the *_store modules, so several calls compose into one
+# transaction that the caller commits.
+#
+# Most statements are plain SQL that MySQL and SQLite both run, and live on
+# MySQLRepository. SQLiteRepository only overrides the ones whose syntax differs:
+# upserts, locking reads, the multi-table bracket UPDATE and timestamp functions.
+
+
+def new_tournament_uid():
+    """
+    A random identity for a tournament row (tournaments.uid), given once on insert. The
+    page cache and ETags include it: an id can name another tournament after a delete
+    (a restore, or MySQL 5.7 resetting AUTO_INCREMENT on restart), and its data_version
+    then starts over.
+    """
+    return secrets.token_hex(8)
+
+
+class MySQLRepository:
+    backend = 'mysql'
+
+    # Appended to a SELECT that must read the latest committed rows (not the
+    # transaction's snapshot) and keep them from changing until commit
+    share_lock = " LOCK IN SHARE MODE"
+
+    # --- Tournaments ---
+
+    def create_tournament(self, cursor, name, sport, tournament_format):
+        cursor.execute("INSERT INTO tournaments (name, sport, format, uid) VALUES (%s, %s, %s, %s)",
+                       (name, sport, tournament_format, new_tournament_uid()))
+        tournament_id = cursor.lastrowid
+        self.bump_tournament_list_version(cursor)
+        return tournament_id
+
+    def get_tournament(self, cursor, tournament_id):
+        cursor.execute("""
+            SELECT id, name, sport, format, created_at, data_version
+            FROM tournaments WHERE id = %s
+        """, (tournament_id,))
+        return cursor.fetchone()
+
+    def lock_tournament(self, cursor, tournament_id):
+        """
+        get_tournament that also holds the tournament's row lock until commit, so
+        concurrent requests changing its fixture list run one after the other.
+        """
+        cursor.execute("SELECT id, name, format FROM tournaments WHERE id = %s FOR UPDATE", (tournament_id,))
+        return cursor.fetchone()
+
+    def delete_tournament(self, cursor, tournament_id):
+        # Participants, fixtures and standings go with it (ON DELETE CASCADE)
+        cursor.execute("DELETE FROM tournaments WHERE id = %s", (tournament_id,))
+        deleted = cursor.rowcount
+        if deleted:
+            self.bump_tournament_list_version(cursor)
+        return deleted
+
+    def tournament_marker(self, cursor, tournament_id):
+        """uid, data_version, updated_at and the database's clock (as Unix timestamps), for conditional GETs."""
+        cursor.execute("""
+            SELECT uid, data_version, UNIX_TIMESTAMP(updated_at) AS updated_ts, UNIX_TIMESTAMP() AS now_ts
+            FROM tournaments WHERE id = %s
+        """, (tournament_id,))
+        return cursor.fetchone()
+
+    def tournament_list_version(self, cursor):
+        """Moves whenever a tournament is created or deleted, for the cached dashboard counts."""
+        cursor.execute("SELECT version FROM list_versions WHERE name = 'tournaments'")
+        row = cursor.fetchone()
+        return row['version'] if row else 0
+
+    def bump_tournament_list_version(self, cursor):
+        # In the transaction that inserts or deletes tournaments, like touch_tournament
+        cursor.execute("""
+            INSERT INTO list_versions (name, version) VALUES ('tournaments', 1)
+            ON DUPLICATE KEY UPDATE version = version + 1
+        """)
+
+    def standings_rules(self, cursor, tournament_id):
+        """The tournament's points_win, points_draw, points_loss and tiebreakers, or None."""
+        cursor.execute("""
+            SELECT points_win, points_draw, points_loss, tiebreakers
+            FROM tournaments WHERE id = %s
+        """, (tournament_id,))
+        return cursor.fetchone()
+
+    def update_standings_rules(self, cursor, tournament_id, points_win, points_draw, points_loss, tiebreakers):
+        cursor.execute("""
+            UPDATE tournaments
+            SET points_win = %s, points_draw = %s, points_loss = %s, tiebreakers = %s
+            WHERE id = %s
+        """, (points_win, points_draw, points_loss, tiebreakers, tournament_id))
+        return cursor.rowcount
+
+    def league_tournament_ids(self, cursor):
+        cursor.execute("SELECT id FROM tournaments WHERE format = 'league' ORDER BY id")
+        return [row['id'] for row in cursor.fetchall()]
+
+    # --- Participants ---
+
+    def add_team(self, cursor, tournament_id, name):
+        cursor.execute("INSERT INTO participants (tournament_id, name) VALUES (%s, %s)", (tournament_id, name))
+        return cursor.lastrowid
+
+    def list_teams(self, cursor, tournament_id, order_by='name'):
+        """Teams by name, or by 'id' (registration order, which is the knockout seed order)."""
+        order = 'id' if order_by == 'id' else 'name ASC'
+        cursor.execute(f"SELECT id, name FROM participants WHERE tournament_id = %s ORDER BY {order}", (tournament_id,))
+        return cursor.fetchall()
+
+    # --- Fixtures ---
+
+    def count_fixtures(self, cursor, tournament_id):
+        cursor.execute("SELECT COUNT(*) AS count FROM fixtures WHERE tournament_id = %s", (tournament_id,))
+        return cursor.fetchone()['count']
+
+    def tournament_with_fixtures(self, cursor, tournament_id):
+        """
+        The tournament row and all of its fixtures with team names, in one round trip.
+        LEFT JOIN on fixtures so a tournament without fixtures still returns one row
+        (with NULL fixture columns); no rows means no such tournament.
+        """
+        cursor.execute("""
+            SELECT
+                t.id as tournament_id, t.name as tournament_name, t.format, t.data_version,
+                f.id, f.round_number, f.match_number_in_round, f.status,
+                f.team1_id, f.team2_id, f.score1, f.score2, f.winner_id, f.next_fixture_id, f.version,
+                p1.name as team1_name,
+                p2.name as team2_name,
+                winner.name as winner_name
+            FROM tournaments t
+            LEFT JOIN fixtures f ON f.tournament_id = t.id
+            LEFT JOIN participants p1 ON f.team1_id = p1.id -- LEFT JOIN for bracket slots still waiting for a team
+            LEFT JOIN participants p2 ON f.team2_id = p2.id
+            LEFT JOIN participants winner ON f.winner_id = winner.id
+            WHERE t.id = %s
+            ORDER BY f.round_number, f.match_number_in_round
+        """, (tournament_id,))
+        return cursor.fetchall()
+
+    def fixtures_with_names(self, cursor, tournament_id):
+        """A tournament's fixtures in playing order, with team and winner names."""
+        cursor.execute("""
+            SELECT
+                f.id, f.round_number, f.match_number_in_round, f.status,
+                f.team1_id, f.team2_id, f.score1, f.score2, f.winner_id, f.version,
+                p1.name as team1_name,
+                p2.name as team2_name,
+                winner.name as winner_name
+            FROM fixtures f
+            LEFT JOIN participants p1 ON f.team1_id = p1.id -- LEFT JOIN for bracket slots still waiting for a team
+            LEFT JOIN participants p2 ON f.team2_id = p2.id  -- LEFT JOIN for byes
+            LEFT JOIN participants winner ON f.winner_id = winner.id -- LEFT JOIN for no winner yet
+            WHERE f.tournament_id = %s
+            ORDER BY f.round_number, f.match_number_in_round
+        """, (tournament_id,))
+        return cursor.fetchall()
+
+    def live_fixtures(self, cursor, tournament_id, fixture_ids):
+        """Some fixtures with what the live pages show, and the tournament's format and data_version."""
+        cursor.execute(f"""
+            SELECT
+                f.id, f.round_number, f.match_number_in_round, f.status, f.score1, f.score2,
+                p1.name as team1_name, p2.name as team2_name, winner.name as winner_name,
+                t.format, t.data_version
+            FROM fixtures f
+            JOIN tournaments t ON f.tournament_id = t.id
+            LEFT JOIN participants p1 ON f.team1_id = p1.id
+            LEFT JOIN participants p2 ON f.team2_id = p2.id
+            LEFT JOIN participants winner ON f.winner_id = winner.id
+            WHERE f.tournament_id = %s AND f.id IN ({', '.join(['%s'] * len(fixture_ids))})
+            ORDER BY f.round_number, f.match_number_in_round
+        """, [tournament_id] + list(fixture_ids))
+        return cursor.fetchall()
+
+    def fixture_details(self, cursor, fixture_id):
+        """One fixture with its tournament's name and the team names, for the match page."""
+        cursor.execute("""
+            SELECT
+                f.*,
+                t.name as tournament_name,
+                p1.name as team1_name,
+                p2.name as team2_name,
+                winner.name as winner_name
+            FROM fixtures f
+            JOIN tournaments t ON f.tournament_id = t.id
+            LEFT JOIN participants p1 ON f.team1_id = p1.id
+            LEFT JOIN participants p2 ON f.team2_id = p2.id
+            LEFT JOIN participants winner ON f.winner_id = winner.id
+            WHERE f.id = %s
+        """, (fixture_id,))
+        return cursor.fetchone()
+
+    def completed_fixtures(self, cursor, tournament_id):
+        """What the standings are computed from."""
+        cursor.execute("""
+            SELECT team1_id, team2_id, score1, score2, winner_id
+            FROM fixtures
+            WHERE tournament_id = %s AND status = 'Completed'
+        """, (tournament_id,))
+        return cursor.fetchall()
+
+    def completed_fixtures_by_round(self, cursor, tournament_id):
+        """completed_fixtures with their round_number, in playing order."""
+        cursor.execute("""
+            SELECT round_number, team1_id, team2_id, score1, score2, winner_id
+            FROM fixtures
+            WHERE tournament_id = %s AND status = 'Completed'
+            ORDER BY round_number, match_number_in_round
+        """, (tournament_id,))
+        return cursor.fetchall()
+
+    def remaining_fixtures(self, cursor, tournament_id):
+        """Fixtures without a result yet, for the season simulator."""
+        cursor.execute("""
+            SELECT team1_id, team2_id
+            FROM fixtures
+            WHERE tournament_id = %s AND status <> 'Completed'
+            ORDER BY round_number, match_number_in_round
+        """, (tournament_id,))
+        return cursor.fetchall()
+
+    def link_bracket(self, cursor, tournament_id):
+        """
+        Points every bracket fixture at the slot its winner moves into: match m of
+        round r feeds slot 1 (m odd) or slot 2 (m even) of match (m + 1) DIV 2 in
+        round r + 1. One self-join UPDATE after the bracket rows are inserted, so it
+        does not depend on the AUTO_INCREMENT ids a multi-row INSERT hands out.
+        (%% is the modulo operator escaped for PyMySQL's parameter formatting.)
+        """
+        cursor.execute("""
+            UPDATE fixtures child
+            JOIN fixtures parent
+                ON parent.tournament_id = child.tournament_id
+                AND parent.round_number = child.round_number + 1
+                AND parent.match_number_in_round = (child.match_number_in_round + 1) DIV 2
+            SET child.next_fixture_id = parent.id,
+                child.next_slot = 2 - (child.match_number_in_round %% 2)
+            WHERE child.tournament_id = %s
+        """, (tournament_id,))
+        return cursor.rowcount
+
+    # --- Several tournaments at once (batch standings) ---
+
+    def standings_rules_for(self, cursor, tournament_ids):
+        cursor.execute(f"""
+            SELECT id, points_win, points_draw, points_loss, tiebreakers
+            FROM tournaments WHERE id IN ({', '.join(['%s'] * len(tournament_ids))})
+        """, list(tournament_ids))
+        return cursor.fetchall()
+
+    def teams_for(self, cursor, tournament_ids):
+        """Teams of several tournaments, each tournament's by name (as list_teams)."""
+        cursor.execute(f"""
+            SELECT tournament_id, id, name FROM participants
+            WHERE tournament_id IN ({', '.join(['%s'] * len(tournament_ids))})
+            ORDER BY tournament_id, name, id
+        """, list(tournament_ids))
+        return cursor.fetchall()
+
+    def completed_fixtures_for(self, cursor, tournament_ids):
+        cursor.execute(f"""
+            SELECT tournament_id, team1_id, team2_id, score1, score2, winner_id
+            FROM fixtures
+            WHERE tournament_id IN ({', '.join(['%s'] * len(tournament_ids))}) AND status = 'Completed'
+        """, list(tournament_ids))
+        return cursor.fetchall()
+
+    # --- Standings and imports ---
+
+    def upsert_standings_deltas(self, cursor, rows):
+        """Adds (tournament_id, participant_id, mp, w, d, l, gf, ga, gd, pts) deltas to the stored table."""
+        cursor.executemany("""
+            INSERT INTO standings (tournament_id, participant_id, mp, w, d, l, gf, ga, gd, pts)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                mp = mp + VALUES(mp), w = w + VALUES(w), d = d + VALUES(d), l = l + VALUES(l),
+                gf = gf + VALUES(gf), ga = ga + VALUES(ga), gd = gd + VALUES(gd), pts = pts + VALUES(pts)
+        """, rows)
+
+    def load_import_checkpoint(self, cursor, import_key):
+        """Records committed by earlier runs of import_key (0 if it never committed)."""
+        cursor.execute("SELECT records_committed FROM import_checkpoints WHERE import_key = %s", (import_key,))
+        row = cursor.fetchone()
+        return row['records_committed'] if row else 0
+
+    def delete_import_checkpoint(self, cursor, import_key):
+        cursor.execute("DELETE FROM import_checkpoints WHERE import_key = %s", (import_key,))
+
+    def save_import_checkpoint(self, cursor, import_key, kind, records_committed):
+        cursor.execute("""
+            INSERT INTO import_checkpoints (import_key, kind, records_committed)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE records_committed = VALUES(records_committed)
+        """, (import_key, kind, records_committed))
+
+
+class SQLiteRepository(MySQLRepository):
+    backend = 'sqlite'
+
+    # SQLite has one writer at a time and reads always see the latest commit
+    share_lock = ""
+
+    def lock_tournament(self, cursor, tournament_id):
+        # No row locks: take the database write lock up front instead (BEGIN IMMEDIATE)
+        cursor.connection.begin_immediate()
+        cursor.execute("SELECT id, name, format FROM tournaments WHERE id = %s", (tournament_id,))
+        return cursor.fetchone()
+
+    def tournament_marker(self, cursor, tournament_id):
+        cursor.execute("""
+            SELECT uid, data_version, CAST(strftime('%%s', updated_at) AS INTEGER) AS updated_ts,
+                   CAST(strftime('%%s', 'now') AS INTEGER) AS now_ts
+            FROM tournaments WHERE id = %s
+        """, (tournament_id,))
+        return cursor.fetchone()
+
+    def bump_tournament_list_version(self, cursor):
+        cursor.execute("""
+            INSERT INTO list_versions (name, version) VALUES ('tournaments', 1)
+            ON CONFLICT (name) DO UPDATE SET version = version + 1
+        """)
+
+    def link_bracket(self, cursor, tournament_id):
+        # UPDATE ... FROM (SQLite 3.33+) instead of MySQL's multi-table UPDATE; integer '/' is DIV
+        cursor.execute("""
+            UPDATE fixtures AS child
+            SET next_fixture_id = parent.id,
+                next_slot = 2 - (child.match_number_in_round %% 2)
+            FROM fixtures AS parent
+            WHERE child.tournament_id = %s
+                AND parent.tournament_id = child.tournament_id
+                AND parent.round_number = child.round_number + 1
+                AND parent.match_number_in_round = (child.match_number_in_round + 1) / 2
+        """, (tournament_id,))
+        return cursor.rowcount
+
+    def upsert_standings_deltas(self, cursor, rows):
+        cursor.executemany("""
+            INSERT INTO standings (tournament_id, participant_id, mp, w, d, l, gf, ga, gd, pts)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (tournament_id, participant_id) DO UPDATE SET
+                mp = mp + excluded.mp, w = w + excluded.w, d = d + excluded.d, l = l + excluded.l,
+                gf = gf + excluded.gf, ga = ga + excluded.ga, gd = gd + excluded.gd, pts = pts + excluded.pts
+        """, rows)
+
+    def save_import_checkpoint(self, cursor, import_key, kind, records_committed):
+        cursor.execute("""
+            INSERT INTO import_checkpoints (import_key, kind, records_committed)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (import_key) DO UPDATE SET records_committed = excluded.records_committed
+        """, (import_key, kind, records_committed))
+
+
+REPOSITORIES = {
+    'mysql': MySQLRepository,
+    'sqlite': SQLiteRepository,
+}
@@ -0,0 +1,257 @@
+from app import db_utils
+from app import fixture_store
+from app import standings_store
+
+# Result entry for one or many fixtures of a tournament.
+#
+# apply_results() does the whole job in the caller's transaction with a fixed
+# number of statements, however many results are entered:
+#   1 SELECT for every fixture's teams, current result and row version,
+#   1 SELECT of the next-round matches whose slots a changed knockout winner moves,
+#   1 CASE-based UPDATE per UPDATE_BATCH_SIZE changed fixtures,
+#   1 batched standings upsert (league) or 1 bracket UPDATE (full knockout bracket),
+#   1 data_version bump.
+# Winners are decided in memory. Rows are validated first and nothing is written
+# if any row is invalid, so a scorer can fix the reported rows and resubmit.
+#
+# Concurrent scorers are handled optimistically: no row locks are taken while
+# reading. Every write bumps fixtures.version, and the result UPDATE only touches
+# a row whose version is still the one that was read (compare-and-swap), so a
+# result entered from a stale page or read just before someone else's commit is
+# reported as a conflict instead of silently overwriting it. The standings delta
+# is computed from the row as read, which the version check guarantees is still
+# the stored one.
+
+UPDATE_BATCH_SIZE = 200 # Fixtures per CASE-based UPDATE statement
+
+RESULT_COLUMNS = ('score1', 'score2', 'winner_id', 'status')
+
+
+class ResultBatch:
+    """Outcome of apply_results."""
+
+    def __init__(self):
+        self.tournament_id = None
+        self.updated = []   # fixture ids whose result changed
+        self.unchanged = [] # fixture ids submitted with their current result
+        self.advanced = []  # bracket fixture ids that received a winner from updated fixtures
+        self.errors = {}    # fixture id -> message; nothing was written if non-empty
+        self.conflicts = {} # fixture id -> its current row, changed by someone else; caller rolls back
+        self.blocked = {}   # fixture id -> next match already decided, so its winner cannot change (also in conflicts)
+        self.data_version = None # The tournament's version after this batch's write (its live events' id)
+
+
+def parse_score(raw):
+    """Form value to score: blank is None, otherwise a non-negative integer (ValueError if not)."""
+    if raw is None or str(raw).strip() == '':
+        return None
+    try:
+        score = int(str(raw).strip())
+    except ValueError:
+        raise ValueError("Scores must be numbers.")
+    if score < 0:
+        raise ValueError("Scores cannot be negative.")
+    return score
+
+
+def decide_result(fixture, score1, score2):
+    """Returns (winner_id, status) for new scores on a fixture with team1_id / team2_id."""
+    winner_id = None
+    if fixture['team2_id'] is None: # Bye match
+        # Scores might be conventionally set for a bye, e.g., 1-0 or remain None.
+        # For simplicity, we'll just mark winner if it's a bye. Scores remain as entered or None.
+        winner_id = fixture['team1_id']
+    elif score1 is not None and score2 is not None:
+        if score1 > score2:
+            winner_id = fixture['team1_id']
+        elif score2 > score1:
+            winner_id = fixture['team2_id']
+        # If score1 == score2, winner_id remains None (draw)
+    status = 'Completed' if (score1 is not None or score2 is not None) else 'Scheduled' # If any score entered, mark completed
+    return winner_id, status
+
+
+def fetch_fixtures(cursor, fixture_ids):
+    """
+    Returns {fixture_id: row} with teams, current result, version, bracket link and
+    format. Takes no locks: update_results checks the versions instead.
+    """
+    cursor.execute(f"""
+        SELECT f.id, f.tournament_id, f.team1_id, f.team2_id, f.status, f.version,
+               f.score1, f.score2, f.winner_id, f.next_fixture_id, f.next_slot, t.format
+        FROM fixtures f
+        JOIN tournaments t ON f.tournament_id = t.id
+        WHERE f.id IN ({', '.join(['%s'] * len(fixture_ids))})
+    """, list(fixture_ids))
+    return {row['id']: row for row in cursor.fetchall()}
+
+
+def fetch_decided(cursor, fixture_ids):
+    """
+    Which of fixture_ids are past the point where a slot can still change (not
+    Pending or Scheduled, the same rule as fixture_store.advance_winners)? A locking
+    read, like find_conflicts: it sees the latest commit, and on MySQL nobody can
+    decide those matches until this transaction ends.
+    """
+    if not fixture_ids:
+        return set()
+    cursor.execute(f"""
+        SELECT id FROM fixtures
+        WHERE id IN ({', '.join(['%s'] * len(fixture_ids))}) AND status NOT IN ('Pending', 'Scheduled')
+        {db_utils.repository().share_lock}
+    """, list(fixture_ids))
+    return {row['id'] for row in cursor.fetchall()}
+
+
+def find_conflicts(cursor, fixture_ids, results, versions):
+    """
+    After a short compare-and-swap UPDATE: which of fixture_ids did someone else
+    change first? Reads the latest committed rows (a locking read, so not this
+    transaction's snapshot); ours are the ones now at versions[id] + 1 with our result.
+    """
+    cursor.execute(f"""
+        SELECT id, version, {', '.join(RESULT_COLUMNS)}
+        FROM fixtures
+        WHERE id IN ({', '.join(['%s'] * len(fixture_ids))}){db_utils.repository().share_lock}
+    """, list(fixture_ids))
+    latest = {row['id']: row for row in cursor.fetchall()}
+    conflicts = {}
+    for fixture_id in fixture_ids:
+        row = latest.get(fixture_id)
+        ours = row is not None and row['version'] == versions[fixture_id] + 1 and \
+            all(row[column] == results[fixture_id][column] for column in RESULT_COLUMNS)
+        if not ours:
+            conflicts[fixture_id] = row
+    # A concurrent writer that stored exactly our result is indistinguishable; blame the batch
+    return conflicts or {fixture_id: latest.get(fixture_id) for fixture_id in fixture_ids}
+
+
+def update_results(cursor, results, versions):
+    """
+    Writes {fixture_id: {score1, score2, winner_id, status}} with CASE-based
+    multi-row UPDATEs, each row only while its version is still versions[id], and
+    bumps the version of every row written. Returns {fixture_id: current row} for
+    the rows someone else changed first (empty if all were written); the caller
+    must then roll back, as earlier batches were written.
+    """
+    fixture_ids = list(results)
+    for start in range(0, len(fixture_ids), UPDATE_BATCH_SIZE):
+        batch = fixture_ids[start:start + UPDATE_BATCH_SIZE]
+        assignments, params = [], []
+        for column in RESULT_COLUMNS:
+            assignments.append(f"{column} = CASE id {' '.join(['WHEN %s THEN %s'] * len(batch))} END")
+            for fixture_id in batch:
+                params.extend([fixture_id, results[fixture_id][column]])
+        version_params = []
+        for fixture_id in batch:
+            version_params.extend([fixture_id, versions[fixture_id]])
+        cursor.execute(f"""
+            UPDATE fixtures
+            SET {', '.join(assignments)}, version = version + 1
+            WHERE id IN ({', '.join(['%s'] * len(batch))})
+              AND version = CASE id {' '.join(['WHEN %s THEN %s'] * len(batch))} END
+        """, params + batch + version_params)
+        # The version always changes, so affected rows equal matched rows
+        if cursor.rowcount != len(batch):
+            return find_conflicts(cursor, batch, results, versions)
+    return {}
+
+
+def check_results(cursor, entries, tournament_id=None, versions=None):
+    """Validates {fixture_id: (score1, score2)} like apply_results, without writing anything."""
+    return apply_results(cursor, entries, tournament_id=tournament_id, dry_run=True, versions=versions)
+
+
+def apply_results(cursor, entries, tournament_id=None, dry_run=False, versions=None):
+    """
+    Applies {fixture_id: (score1, score2)} in the caller's transaction; the
+    caller commits (and publishes live changes) when batch.updated is
+    non-empty, and rolls back when batch.errors or batch.conflicts is.
+    All fixtures must belong to one tournament (tournament_id, if given, or that
+    of the first fixture found).
+
+    versions maps fixture ids to the version the scorer's page showed (the form's
+    hidden field); a changed result for a fixture whose version moved on since is
+    a conflict. Fixtures without one are checked against the version read here.
+    """
+    batch = ResultBatch()
+    batch.tournament_id = tournament_id
+    versions = versions or {}
+    if not entries:
+        return batch
+
+    current = fetch_fixtures(cursor, list(entries))
+    changes = {}
+    for fixture_id, (score1, score2) in entries.items():
+        fixture = current.get(fixture_id)
+        if fixture is None:
+            batch.errors[fixture_id] = f"Match with ID {fixture_id} not found."
+            continue
+        if batch.tournament_id is None:
+            batch.tournament_id = fixture['tournament_id']
+        if fixture['tournament_id'] != batch.tournament_id:
+            batch.errors[fixture_id] = f"Match {fixture_id} belongs to another tournament."
+            continue
+        if fixture['status'] == 'Pending':
+            batch.errors[fixture_id] = "This match is still waiting for the winners of earlier matches."
+            continue
+
+        winner_id, status = decide_result(fixture, score1, score2)
+        new_result = {'score1': score1, 'score2': score2, 'winner_id': winner_id, 'status': status}
+        if all(fixture[column] == new_result[column] for column in RESULT_COLUMNS):
+            batch.unchanged.append(fixture_id) # Even if stale: resubmitting the stored result is harmless
+        elif versions.get(fixture_id) is not None and versions[fixture_id] != fixture['version']:
+            batch.conflicts[fixture_id] = fixture
+        else:
+            changes[fixture_id] = new_result
+
+    # A new winner moves into the next match's slot; once that match has a result the
+    # bracket would disagree with it, so the change is refused until it is cleared
+    moving = {fixture_id: current[fixture_id]['next_fixture_id'] for fixture_id, new_result in changes.items()
+              if current[fixture_id]['format'] != 'league' and current[fixture_id]['next_fixture_id'] is not None
+              and current[fixture_id]['winner_id'] != new_result['winner_id']}
+    decided = fetch_decided(cursor, set(moving.values())) if moving else set()
+    # What this batch writes counts: a next match cleared in it is open again, and one
+    # that gets its result in it would be decided before its slot is filled (enter the
+    # earlier round first)
+    decided = {fixture_id for fixture_id in decided if fixture_id not in changes} | \
+        {fixture_id for fixture_id, new_result in changes.items() if new_result['status'] not in ('Pending', 'Scheduled')}
+    for fixture_id, next_fixture_id in moving.items():
+        if next_fixture_id in decided:
+            batch.blocked[fixture_id] = next_fixture_id
+            batch.conflicts[fixture_id] = current[fixture_id]
+            del changes[fixture_id]
+
+    if batch.errors or batch.conflicts or not changes or dry_run:
+        return batch
+
+    batch.conflicts = update_results(cursor, changes, {fixture_id: current[fixture_id]['version'] for fixture_id in changes})
+    if batch.conflicts:
+        return batch
+
+    league_changes, moves = [], []
+    for fixture_id, new_result in changes.items():
+        fixture = current[fixture_id]
+        if fixture['format'] == 'league':
+            league_changes.append((fixture, dict(fixture, **new_result)))
+        elif fixture['next_fixture_id'] is not None and fixture['winner_id'] != new_result['winner_id']:
+            # Full knockout bracket: the winner drops straight into the next match
+            moves.append((fixture['next_fixture_id'], fixture['next_slot'], new_result['winner_id']))
+    if league_changes:
+        standings_store.apply_fixture_changes(cursor, batch.tournament_id, league_changes)
+    if moves:
+        batch.advanced = sorted({next_fixture_id for next_fixture_id, _, _ in moves})
+        if fixture_store.advance_winners(cursor, moves) != len(batch.advanced):
+            # A next match was decided after the check above (only possible without the
+            # share lock, e.g. another connection's write between them): a conflict too
+            decided = fetch_decided(cursor, batch.advanced)
+            for fixture_id, next_fixture_id in moving.items():
+                if next_fixture_id in decided:
+                    batch.blocked[fixture_id] = next_fixture_id
+                    batch.conflicts[fixture_id] = current[fixture_id]
+            batch.conflicts = batch.conflicts or {fixture_id: current[fixture_id] for fixture_id in moving}
+            return batch
+    batch.data_version = db_utils.touch_tournament(cursor, batch.tournament_id)
+
+    batch.updated = list(changes)
+    return batch
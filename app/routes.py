@@ -1,121 +1,125 @@
-from flask import render_template, request, redirect, url_for, flash
+import logging
+from flask import render_template, request, redirect, url_for, flash, jsonify
 from app import app
-import pymysql # For database operations
 from datetime import datetime # For formatting dates
 from app import fixture_logic # Import fixture generation functions
-
-# Helper function to get DB connection (consider moving to a db_utils.py later if more complex)
+from app import db_utils
+from app import fixture_store
+from app import bracket_utils
+from app import cache
+from app import http_cache
+from app import tournament_list
+from app import results
+from app import live
+
+log = logging.getLogger(__name__)
+
+# Returns the pooled connection bound to this request (see db_utils.py).
+# It is released back to the pool in teardown, so routes must not close it.
 def get_db_connection():
     try:
-        connection = pymysql.connect(
-            host=app.config['MYSQL_HOST'],
-            user=app.config['MYSQL_USER'],
-            password=app.config['MYSQL_PASSWORD'],
-            database=app.config['MYSQL_DB'],
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        return connection
-    except pymysql.MySQLError as e:
-        # Log the error e
+        return db_utils.get_request_connection()
+    except db_utils.DB_ERRORS as e:
+        log.error("Database connection error: %s", e)
         flash(f"Database connection error: {e}", "danger")
         return None
 
+# Score pair as the pages show it, '-' for a missing score
+def format_score(score1, score2):
+    return f"{score1 if score1 is not None else '-'} : {score2 if score2 is not None else '-'}"
+
+# Cached pages need no invalidation: they are keyed on the tournament's data_version,
+# which db_utils.touch_tournament moves in the write transaction itself (see cache.py).
+
+# Call after committing a write to push the change to live viewers (see live.py):
+# one 'fixture' event per changed fixture plus the new table for leagues, or a 'round'
+# event when fixtures were added. standings=True sends just the table (the ranking
+# rules changed). version is the data_version the write's touch_tournament returned,
+# not one read after the commit: that could already be a later write's, and a client
+# reconnecting with it would never be told to resync for that write's events.
+# Costs nothing while nobody is watching.
+def publish_live_changes(tournament_id, version, fixture_ids=(), new_round=False, standings=False):
+    if not live.wants_events(tournament_id) or not (fixture_ids or new_round or standings) or version is None:
+        return
+    if new_round:
+        live.publish(tournament_id, 'round', {}, version)
+        return
+    try:
+        connection = db_utils.get_request_connection()
+        with connection.cursor() as cursor:
+            if fixture_ids:
+                rows = db_utils.repository().live_fixtures(cursor, tournament_id, sorted(set(fixture_ids)))
+                marker = rows[0] if rows else None
+            else:
+                rows = []
+                marker = db_utils.repository().get_tournament(cursor, tournament_id)
+        if not marker:
+            return
+        tournament_format = marker['format']
+        for row in rows:
+            live.publish(tournament_id, 'fixture', {k: v for k, v in row.items() if k not in ('format', 'data_version')}, version)
+        if tournament_format == 'league':
+            # Also warms the standings cache for viewers who reload
+            page = cache.get_tournament_cache().get_or_compute(
+                'standings', tournament_id, lambda: load_standings_page(tournament_id))
+            if page:
+                live.publish(tournament_id, 'standings', {'standings': page['standings']}, version)
+    except db_utils.DB_ERRORS as e:
+        # The change itself is committed; viewers just see it on their next reload
+        log.warning("Live update for tournament %s not sent: %s", tournament_id, e)
+
 # --- Helper Functions for Knockout Progression ---
-def get_max_round(cursor, tournament_id):
-    cursor.execute("SELECT MAX(round_number) as max_round FROM fixtures WHERE tournament_id = %s", (tournament_id,))
-    result = cursor.fetchone()
-    return result['max_round'] if result and result['max_round'] is not None else 0
-
-def is_round_complete(cursor, tournament_id, round_number):
-    if round_number == 0: # No rounds generated yet
-        return False
-    # Count total matches in the round
-    cursor.execute("SELECT COUNT(*) as total_matches FROM fixtures WHERE tournament_id = %s AND round_number = %s", (tournament_id, round_number))
-    total_matches = cursor.fetchone()['total_matches']
-    
-    # Count completed matches in the round
-    cursor.execute("SELECT COUNT(*) as completed_matches FROM fixtures WHERE tournament_id = %s AND round_number = %s AND status = 'Completed'", (tournament_id, round_number))
-    completed_matches = cursor.fetchone()['completed_matches']
-    
-    return total_matches > 0 and total_matches == completed_matches
-
-def get_round_winners(cursor, tournament_id, round_number):
-    # Fetches participants who are winners in the specified round
-    sql = """
-        SELECT p.id, p.name 
-        FROM fixtures f
-        JOIN participants p ON f.winner_id = p.id
-        WHERE f.tournament_id = %s AND f.round_number = %s AND f.winner_id IS NOT NULL
-        ORDER BY p.id
-    """
-    # Also handle byes where team2_id is NULL and status is 'Completed' (team1 is auto-winner)
-    # This might require more complex logic if byes aren't automatically marked with winner_id
-    # For now, assuming winner_id is populated correctly for byes upon completion.
-    # If not, we'd need to adjust the query or logic here.
-    # A simpler approach for now: just get winner_id's.
-    # The calling function will need to construct participant-like dicts if needed by fixture_logic
-    
-    sql_winners = """
-        SELECT DISTINCT winner_id as id 
-        FROM fixtures 
-        WHERE tournament_id = %s AND round_number = %s AND winner_id IS NOT NULL
-    """
-    cursor.execute(sql_winners, (tournament_id, round_number))
-    winners_data = cursor.fetchall() # List of dicts like [{'id': winner_id1}, {'id': winner_id2}]
-    
-    # To pass to generate_knockout_fixtures, we might need their names too,
-    # or ensure generate_knockout_fixtures can work just with IDs if we pass participant-like objects.
-    # For simplicity, let's assume generate_knockout_fixtures can take {'id': value}
-    # and the calling function (advance_knockout_round) will fetch names if needed for messages.
-    
-    # Re-fetch with names for convenience, though it's a bit redundant if generate_knockout_fixtures only needs IDs
-    # This makes the list of winners more directly usable by generate_knockout_fixtures if it expects {'id': X, 'name': Y}
-    detailed_winners = []
-    if winners_data:
-        winner_ids = [w['id'] for w in winners_data]
-        if winner_ids: # Ensure winner_ids is not empty before using in IN clause
-            # Create a placeholder string for IN clause: %s, %s, %s
-            placeholders = ', '.join(['%s'] * len(winner_ids))
-            sql_winner_details = f"SELECT id, name FROM participants WHERE id IN ({placeholders})"
-            cursor.execute(sql_winner_details, tuple(winner_ids))
-            detailed_winners = cursor.fetchall()
-            
-    return detailed_winners
+def fetch_tournament_fixtures(cursor, tournament_id):
+    # Returns (tournament, fixtures) from one query; tournament is None if it does not exist
+    rows = db_utils.repository().tournament_with_fixtures(cursor, tournament_id)
+    if not rows:
+        return None, []
+    tournament = {'id': rows[0]['tournament_id'], 'name': rows[0]['tournament_name'], 'format': rows[0]['format'],
+                  'data_version': rows[0]['data_version']}
+    fixtures = [row for row in rows if row['id'] is not None]
+    return tournament, fixtures
 
 
 @app.route('/')
 @app.route('/index')
 def index():
     tournaments = []
+    tournament_count = None
+    next_cursor = None
+    sport = request.args.get('sport', '').strip()
+    tournament_format = request.args.get('format', '').strip()
+    if tournament_format not in ('', 'league', 'knockout'):
+        tournament_format = ''
+    after = request.args.get('after') or None
+
     connection = get_db_connection()
     if connection:
         try:
             with connection.cursor() as cursor:
-                # Fetch raw created_at, format in Python
-                sql = "SELECT id, name, sport, format, created_at FROM tournaments ORDER BY created_at DESC"
-                cursor.execute(sql)
-                fetched_tournaments = cursor.fetchall()
-                processed_tournaments = []
-                for t_data in fetched_tournaments:
+                # One page via keyset pagination; see tournament_list.py
+                rows, next_cursor = tournament_list.list_tournaments(
+                    cursor, sport=sport, tournament_format=tournament_format, after=after,
+                    limit=app.config['DASHBOARD_PAGE_SIZE'])
+                for t_data in rows:
                     created_at_formatted = t_data['created_at'].strftime('%Y-%m-%d %H:%M') if isinstance(t_data['created_at'], datetime) else str(t_data['created_at'])
-                    processed_tournaments.append({
+                    tournaments.append({
                         'id': t_data['id'],
                         'name': t_data['name'],
                         'sport': t_data['sport'],
                         'format': t_data['format'],
                         'created_at_formatted': created_at_formatted
                     })
-                tournaments = processed_tournaments
-        except pymysql.MySQLError as e:
+                tournament_count = tournament_list.count_tournaments(cursor, sport=sport, tournament_format=tournament_format)
+        except tournament_list.InvalidCursor:
+            flash("That page link is no longer valid; showing the newest tournaments.", "warning")
+            return redirect(url_for('index', sport=sport or None, format=tournament_format or None))
+        except db_utils.DB_ERRORS as e:
             flash(f"Error fetching tournaments: {e}", "danger")
-            # Log error e
-        finally:
-            if connection.open:
-                connection.close()
+            log.error("Error fetching tournaments: %s", e)
     
-    tournament_count = len(tournaments)
-    return render_template('index.html', tournaments=tournaments, tournament_count=tournament_count)
+    return render_template('index.html', tournaments=tournaments, tournament_count=tournament_count,
+                           next_cursor=next_cursor, is_first_page=after is None,
+                           sport=sport, tournament_format=tournament_format)
 
 @app.route('/create_tournament', methods=['GET', 'POST'])
 def create_tournament():
@@ -128,23 +132,18 @@ def create_tournament():
             flash('All fields are required!', 'danger')
             return render_template('create_tournament.html')
 
-        # ** DATABASE INTERACTION - Placeholder until connection is resolved **
-        print(f"Attempting to create tournament: {name}, {sport}, {tournament_format}")
+        log.info("Creating tournament %r (%s, %s)", name, sport, tournament_format)
         connection = get_db_connection()
         if connection:
             try:
                 with connection.cursor() as cursor:
-                    sql = "INSERT INTO `tournaments` (`name`, `sport`, `format`) VALUES (%s, %s, %s)"
-                    cursor.execute(sql, (name, sport, tournament_format))
+                    db_utils.repository().create_tournament(cursor, name, sport, tournament_format)
                 connection.commit()
                 flash(f"Tournament '{name}' created successfully!", 'success')
                 return redirect(url_for('index')) # Or a page showing all tournaments
-            except pymysql.MySQLError as e:
+            except db_utils.DB_ERRORS as e:
                 flash(f"Error creating tournament: {e}", 'danger')
-                # Log error e
-            finally:
-                if connection.open:
-                    connection.close()
+                log.error("Error creating tournament %r: %s", name, e)
         else:
             # Flash message about DB connection error is handled by get_db_connection
             pass # Stay on the same page or redirect to an error page
@@ -156,77 +155,127 @@ def create_tournament():
 
     return render_template('create_tournament.html')
 
+# --- Cached page loaders ---
+# Each loader fetches what one page shows and returns it as a dict (None if the tournament
+# does not exist). Routes call them through the tournament cache, so a cache hit costs no
+# connection checkout at all; database errors propagate to the route.
+
+def load_tournament_page(tournament_id):
+    connection = db_utils.get_request_connection()
+    repo = db_utils.repository()
+    with connection.cursor() as cursor:
+        tournament_data = repo.get_tournament(cursor, tournament_id)
+        if not tournament_data:
+            return None
+
+        if isinstance(tournament_data['created_at'], datetime):
+            created_at_formatted = tournament_data['created_at'].strftime('%Y-%m-%d %H:%M')
+        else:
+            created_at_formatted = str(tournament_data['created_at'])
+        tournament_details = {
+            'id': tournament_data['id'],
+            'name': tournament_data['name'],
+            'sport': tournament_data['sport'],
+            'format': tournament_data['format'],
+            'created_at_formatted': created_at_formatted,
+            'data_version': tournament_data['data_version'] # Where the page's live stream starts
+        }
+
+        teams = repo.list_teams(cursor, tournament_id)
+        # Team names come joined in, for display
+        fixtures = repo.fixtures_with_names(cursor, tournament_id)
+
+    return {'tournament': tournament_details, 'teams': teams, 'fixtures': fixtures}
+
+def load_standings_page(tournament_id):
+    connection = db_utils.get_request_connection()
+    with connection.cursor() as cursor:
+        tournament = db_utils.repository().get_tournament(cursor, tournament_id)
+        if not tournament:
+            return None
+        tournament_details = {key: tournament[key] for key in ('id', 'name', 'format', 'data_version')}
+        standings = []
+        rules = standings_store.load_rules(cursor, tournament_id)
+        if tournament_details['format'] == 'league':
+            standings = build_standings(cursor, tournament_id, rules=rules)
+    return {'tournament': tournament_details, 'standings': standings, 'rules': rules.as_dict()}
+
+def load_standings_history_page(tournament_id):
+    # The table after every round and each team's position per round, from one pass
+    # over the completed fixtures (league_utils.standings_history)
+    connection = db_utils.get_request_connection()
+    repo = db_utils.repository()
+    with connection.cursor() as cursor:
+        tournament = repo.get_tournament(cursor, tournament_id)
+        if not tournament:
+            return None
+        tournament_details = {key: tournament[key] for key in ('id', 'name', 'format', 'data_version')}
+        history = []
+        if tournament_details['format'] == 'league':
+            rules = standings_store.load_rules(cursor, tournament_id)
+            history = league_utils.standings_history(
+                repo.list_teams(cursor, tournament_id), repo.completed_fixtures_by_round(cursor, tournament_id),
+                tiebreakers=rules.tiebreakers, **rules.points)
+    positions = {}
+    for _, standings in history:
+        for position, row in enumerate(standings, start=1):
+            positions.setdefault(row['id'], []).append(position)
+    return {
+        'tournament': tournament_details,
+        'rounds': [round_number for round_number, _ in history],
+        'tables': [standings for _, standings in history],
+        'positions': positions, # team_id -> position after each of 'rounds'
+    }
+
+def load_season_odds_page(tournament_id):
+    # Title / relegation odds from the remaining fixtures (season_simulator). Cached like
+    # every page, so the simulation runs once per tournament version, not per view.
+    connection = db_utils.get_request_connection()
+    with connection.cursor() as cursor:
+        tournament = db_utils.repository().get_tournament(cursor, tournament_id)
+        if not tournament:
+            return None
+        tournament_details = {key: tournament[key] for key in ('id', 'name', 'format', 'data_version')}
+        odds = None
+        if tournament_details['format'] == 'league':
+            odds = season_simulator.load_season_odds(cursor, tournament_id)
+    return {'tournament': tournament_details, 'odds': odds}
+
+def load_bracket_page(tournament_id):
+    connection = db_utils.get_request_connection()
+    with connection.cursor() as cursor:
+        # The whole page is one query: everything else is derived from the fixture list
+        tournament_details, all_fixtures = fetch_tournament_fixtures(cursor, tournament_id)
+    if not tournament_details:
+        return None
+    return {'tournament': tournament_details, 'bracket_state': bracket_utils.compute_bracket_state(all_fixtures)}
+
 @app.route('/tournament/<int:tournament_id>')
+@http_cache.conditional_tournament_get
 def view_tournament(tournament_id):
     tournament_name = f"Tournament ID {tournament_id}" # Default/placeholder name
-    tournament_details = None 
-    teams = [] 
-    fixtures = []
-    fixtures_generated_yet = False
+    page = None
 
-    connection = get_db_connection()
-    if connection:
-        try:
-            with connection.cursor() as cursor:
-                # Fetch tournament details
-                sql_select_tournament = "SELECT id, name, sport, format, created_at FROM tournaments WHERE id = %s"
-                cursor.execute(sql_select_tournament, (tournament_id,))
-                tournament_data = cursor.fetchone() 
-                
-                if tournament_data:
-                    if isinstance(tournament_data['created_at'], datetime):
-                        created_at_formatted = tournament_data['created_at'].strftime('%Y-%m-%d %H:%M')
-                    else:
-                        created_at_formatted = str(tournament_data['created_at'])
-                    tournament_details = {
-                        'id': tournament_data['id'],
-                        'name': tournament_data['name'],
-                        'sport': tournament_data['sport'],
-                        'format': tournament_data['format'],
-                        'created_at_formatted': created_at_formatted
-                    }
-                    tournament_name = tournament_details['name']
-
-                    # Fetch teams for this tournament
-                    sql_select_teams = "SELECT id, name FROM participants WHERE tournament_id = %s ORDER BY name ASC"
-                    cursor.execute(sql_select_teams, (tournament_id,))
-                    teams = cursor.fetchall()
-
-                    # Fetch fixtures for this tournament & check if generated
-                    # We need team names for display, so a JOIN is useful here
-                    sql_select_fixtures = """
-                        SELECT 
-                            f.id, f.round_number, f.match_number_in_round, f.status,
-                            f.score1, f.score2,
-                            p1.name as team1_name, 
-                            p2.name as team2_name,
-                            winner.name as winner_name
-                        FROM fixtures f
-                        JOIN participants p1 ON f.team1_id = p1.id
-                        LEFT JOIN participants p2 ON f.team2_id = p2.id  -- LEFT JOIN for byes
-                        LEFT JOIN participants winner ON f.winner_id = winner.id -- LEFT JOIN for no winner yet
-                        WHERE f.tournament_id = %s
-                        ORDER BY f.round_number, f.match_number_in_round;
-                    """
-                    cursor.execute(sql_select_fixtures, (tournament_id,))
-                    fixtures = cursor.fetchall()
-                    if fixtures: # or check count before fetching all if performance is a concern
-                        fixtures_generated_yet = True
-                else:
-                    flash(f"Tournament with ID {tournament_id} not found.", "warning")
-        except pymysql.MySQLError as e:
-            flash(f"Error fetching tournament data: {e}", "danger")
-        finally:
-            if connection.open:
-                connection.close()
+    try:
+        page = cache.get_tournament_cache().get_or_compute(
+            'tournament', tournament_id, lambda: load_tournament_page(tournament_id))
+        if page is None:
+            flash(f"Tournament with ID {tournament_id} not found.", "warning")
+    except db_utils.DB_ERRORS as e:
+        flash(f"Error fetching tournament data: {e}", "danger")
+
+    if page is None:
+        page = {'tournament': None, 'teams': [], 'fixtures': []}
+    else:
+        tournament_name = page['tournament']['name']
     
     return render_template('view_tournament.html', 
                            tournament_name=tournament_name, 
                            tournament_id=tournament_id,
-                           tournament=tournament_details,
-                           teams=teams,
-                           fixtures=fixtures, # Pass fixtures to template
-                           fixtures_generated_yet=fixtures_generated_yet) # Pass flag to template
+                           tournament=page['tournament'],
+                           teams=page['teams'],
+                           fixtures=page['fixtures'], # Pass fixtures to template
+                           fixtures_generated_yet=bool(page['fixtures'])) # Pass flag to template
 
 @app.route('/tournament/<int:tournament_id>/add_team', methods=['POST'])
 def add_team(tournament_id):
@@ -239,20 +288,20 @@ def add_team(tournament_id):
     if connection:
         try:
             with connection.cursor() as cursor:
-                sql = "INSERT INTO `participants` (`tournament_id`, `name`) VALUES (%s, %s)"
-                cursor.execute(sql, (tournament_id, team_name))
+                db_utils.repository().add_team(cursor, tournament_id, team_name)
+                db_utils.touch_tournament(cursor, tournament_id)
             connection.commit()
             flash(f"Team '{team_name}' added successfully.", 'success')
-        except pymysql.MySQLError as e:
+        except db_utils.DB_ERRORS as e:
             flash(f"Error adding team: {e}", 'danger')
-        finally:
-            if connection.open:
-                connection.close()
     # If get_db_connection() returned None, it would have already flashed an error.
     # We still need to redirect. This redirect is correctly placed outside the 'if connection' block.
     return redirect(url_for('view_tournament', tournament_id=tournament_id))
     
 from app import league_utils # Import the new league utilities
+from app import standings_store
+from app import standings_batch
+from app import season_simulator
 
 
 # Placeholder for standings calculation logic (to be moved to a new file later)
@@ -266,146 +315,136 @@ from app import league_utils # Import the new league utilities
 # sorted_standings = sorted(standings_data.values(), key=lambda x: x['pts'], reverse=True)
 # return sorted_standings
 
+def build_standings(cursor, tournament_id, engine=None, rules=None):
+    # Picks the standings engine configured in STANDINGS_ENGINE (see app/__init__.py).
+    # Every engine ranks with the tournament's points rules and tiebreakers.
+    engine = engine or app.config['STANDINGS_ENGINE']
+    rules = rules or standings_store.load_rules(cursor, tournament_id)
+    if engine == 'materialized':
+        # Read the stored table (maintained by match_details on every score change)
+        return standings_store.load_standings(cursor, tournament_id, rules)
+    if engine == 'sql':
+        return league_utils.calculate_standings_sql(cursor, tournament_id, tiebreakers=rules.tiebreakers, **rules.points)
+    if engine == 'python':
+        repo = db_utils.repository()
+        teams = repo.list_teams(cursor, tournament_id)
+        if not teams: # No teams, so standings will be empty by default
+            return []
+        return league_utils.calculate_standings_data(teams, repo.completed_fixtures(cursor, tournament_id),
+                                                     tiebreakers=rules.tiebreakers, **rules.points)
+    raise ValueError(f"Unknown STANDINGS_ENGINE: {engine}")
+
 @app.route('/tournament/<int:tournament_id>/standings')
+@http_cache.conditional_tournament_get
 def league_standings(tournament_id):
-    connection = get_db_connection()
-    if not connection:
+    try:
+        page = cache.get_tournament_cache().get_or_compute(
+            'standings', tournament_id, lambda: load_standings_page(tournament_id))
+    except db_utils.DB_ERRORS as e:
+        flash(f"Database error: {e}", "danger")
+        return redirect(url_for('view_tournament', tournament_id=tournament_id))
+
+    if not page:
+        flash('Tournament not found.', 'danger')
         return redirect(url_for('index'))
+    
+    if page['tournament']['format'] != 'league':
+        flash('Standings are only available for league tournaments.', 'warning')
+        return redirect(url_for('view_tournament', tournament_id=tournament_id))
 
-    tournament_details = None
-    teams = []
-    standings = []
+    return render_template('league_standings.html', 
+                           tournament=page['tournament'], 
+                           standings=page['standings'],
+                           rules=page['rules'],
+                           tiebreaker_choices=league_utils.TIEBREAKERS)
+
+@app.route('/tournament/<int:tournament_id>/standings_rules', methods=['POST'])
+def update_standings_rules(tournament_id):
+    # Points for a win / draw / loss and the tiebreakers, as comma-separated names in order
+    try:
+        points = [int(request.form.get(field, '').strip()) for field in ('points_win', 'points_draw', 'points_loss')]
+    except ValueError:
+        flash('Points must be whole numbers.', 'danger')
+        return redirect(url_for('league_standings', tournament_id=tournament_id))
+    try:
+        tiebreakers = league_utils.parse_tiebreakers(request.form.get('tiebreakers'))
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('league_standings', tournament_id=tournament_id))
 
+    connection = get_db_connection()
+    if not connection:
+        return redirect(url_for('league_standings', tournament_id=tournament_id))
     try:
         with connection.cursor() as cursor:
-            # Fetch tournament details
-            cursor.execute("SELECT id, name, format FROM tournaments WHERE id = %s", (tournament_id,))
-            tournament_details = cursor.fetchone()
-
-            if not tournament_details:
-                flash('Tournament not found.', 'danger')
-                return redirect(url_for('index'))
-            
-            if tournament_details['format'] != 'league':
-                flash('Standings are only available for league tournaments.', 'warning')
+            repo = db_utils.repository()
+            tournament = repo.lock_tournament(cursor, tournament_id)
+            if not tournament or tournament['format'] != 'league':
+                connection.rollback()
+                flash('Standings rules only apply to league tournaments.', 'warning')
                 return redirect(url_for('view_tournament', tournament_id=tournament_id))
+            repo.update_standings_rules(cursor, tournament_id, *points, ','.join(tiebreakers))
+            # The stored table holds points, so it is recomputed with the new values
+            standings_store.rebuild_standings(cursor, tournament_id)
+            version = db_utils.touch_tournament(cursor, tournament_id)
+        connection.commit()
+        publish_live_changes(tournament_id, version, standings=True)
+        flash('Standings rules updated.', 'success')
+    except db_utils.DB_ERRORS as e:
+        flash(f"Error updating standings rules: {e}", 'danger')
+    return redirect(url_for('league_standings', tournament_id=tournament_id))
+
+@app.route('/tournament/<int:tournament_id>/odds')
+@http_cache.conditional_tournament_get
+def season_odds(tournament_id):
+    if not standings_batch.available():
+        flash("Season odds need the 'numpy' package (pip install numpy).", 'warning')
+        return redirect(url_for('league_standings', tournament_id=tournament_id))
+    try:
+        page = cache.get_tournament_cache().get_or_compute(
+            'season_odds', tournament_id, lambda: load_season_odds_page(tournament_id))
+    except db_utils.DB_ERRORS as e:
+        flash(f"Database error: {e}", "danger")
+        return redirect(url_for('view_tournament', tournament_id=tournament_id))
 
-            # Fetch teams (participants)
-            cursor.execute("SELECT id, name FROM participants WHERE tournament_id = %s", (tournament_id,))
-            teams = cursor.fetchall()
-
-            # Fetch completed fixtures
-            sql_fixtures = """
-                SELECT f.*, p1.name as team1_name, p2.name as team2_name 
-                FROM fixtures f
-                JOIN participants p1 ON f.team1_id = p1.id
-                LEFT JOIN participants p2 ON f.team2_id = p2.id 
-                WHERE f.tournament_id = %s AND f.status = 'Completed'
-            """
-            cursor.execute(sql_fixtures, (tournament_id,))
-            completed_fixtures = cursor.fetchall()
-            
-            # Call calculation logic from league_utils
-            if teams: # Only calculate if there are teams
-                standings = league_utils.calculate_standings_data(teams, completed_fixtures) 
-            else: # No teams, so standings will be empty by default
-                standings = []
-
+    if not page:
+        flash('Tournament not found.', 'danger')
+        return redirect(url_for('index'))
 
-    except pymysql.MySQLError as e:
-        flash(f"Database error: {e}", "danger")
+    if page['tournament']['format'] != 'league':
+        flash('Season odds are only available for league tournaments.', 'warning')
         return redirect(url_for('view_tournament', tournament_id=tournament_id))
-    finally:
-        if connection.open:
-            connection.close()
 
-    return render_template('league_standings.html', 
-                           tournament=tournament_details, 
-                           standings=standings)
+    return render_template('season_odds.html', tournament=page['tournament'], odds=page['odds'])
 
 @app.route('/tournament/<int:tournament_id>/bracket')
+@http_cache.conditional_tournament_get
 def knockout_bracket(tournament_id):
-    connection = get_db_connection()
-    if not connection:
-        flash("Database connection failed.", "danger") # Flash here if get_db_connection itself fails
-        return redirect(url_for('index'))
-
-    tournament_details = None
-    rounds_data = {}
-    current_max_round = 0
-    max_round_is_complete = False
-    can_advance_round = False
-
     try:
-        with connection.cursor() as cursor: # Single cursor context for all DB ops in this route
-            # Fetch tournament details
-            cursor.execute("SELECT id, name, format FROM tournaments WHERE id = %s", (tournament_id,))
-            tournament_details = cursor.fetchone()
-
-            if not tournament_details:
-                flash('Tournament not found.', 'danger')
-                # No 'finally' here yet, connection will be closed by outer finally
-                return redirect(url_for('index')) 
-            
-            if tournament_details['format'] != 'knockout':
-                flash('Bracket view is only available for knockout tournaments.', 'warning')
-                return redirect(url_for('view_tournament', tournament_id=tournament_id))
-
-            # Fetch all fixtures for this tournament, including team names
-            sql_fixtures = """
-                SELECT 
-                    f.id, f.round_number, f.match_number_in_round, f.status,
-                    f.score1, f.score2,
-                    p1.name as team1_name, 
-                    p2.name as team2_name,
-                    winner.name as winner_name
-                FROM fixtures f
-                JOIN participants p1 ON f.team1_id = p1.id
-                LEFT JOIN participants p2 ON f.team2_id = p2.id
-                LEFT JOIN participants winner ON f.winner_id = winner.id
-                WHERE f.tournament_id = %s
-                ORDER BY f.round_number, f.match_number_in_round;
-            """
-            cursor.execute(sql_fixtures, (tournament_id,))
-            all_fixtures = cursor.fetchall()
-
-            for fixture in all_fixtures:
-                round_num = fixture['round_number']
-                if round_num not in rounds_data:
-                    rounds_data[round_num] = []
-                rounds_data[round_num].append(fixture)
-            
-            # Logic for "Advance Round" button display, using the SAME cursor
-            if rounds_data: 
-                print("DEBUG: About to call get_max_round")
-                current_max_round = get_max_round(cursor, tournament_id)
-                print(f"DEBUG: get_max_round returned: {current_max_round}")
-                if current_max_round > 0:
-                    print("DEBUG: About to call is_round_complete")
-                    max_round_is_complete = is_round_complete(cursor, tournament_id, current_max_round)
-                    print(f"DEBUG: is_round_complete returned: {max_round_is_complete}")
-                    if max_round_is_complete:
-                        print("DEBUG: About to call get_round_winners")
-                        winners_of_max_round = get_round_winners(cursor, tournament_id, current_max_round)
-                        print(f"DEBUG: get_round_winners returned: {winners_of_max_round}")
-                        if len(winners_of_max_round) > 1:
-                            can_advance_round = True
-                        elif len(winners_of_max_round) == 1 and current_max_round > 0:
-                            flash(f"Tournament finished! Winner: {winners_of_max_round[0]['name']}", "success")
-
-    except pymysql.MySQLError as e:
+        page = cache.get_tournament_cache().get_or_compute(
+            'bracket', tournament_id, lambda: load_bracket_page(tournament_id))
+    except db_utils.DB_ERRORS as e:
         flash(f"Database error in knockout_bracket: {e}", "danger")
         # It's safer to redirect to index if a major DB error occurs during data fetching
         return redirect(url_for('index')) 
-    finally:
-        if connection and connection.open: # Check if connection was successfully made before trying to close
-            connection.close()
+
+    if not page:
+        flash('Tournament not found.', 'danger')
+        return redirect(url_for('index')) 
+    
+    if page['tournament']['format'] != 'knockout':
+        flash('Bracket view is only available for knockout tournaments.', 'warning')
+        return redirect(url_for('view_tournament', tournament_id=tournament_id))
+
+    bracket_state = page['bracket_state']
+    if bracket_state['champion']:
+        flash(f"Tournament finished! Winner: {bracket_state['champion']['name']}", "success")
             
     return render_template('knockout_bracket.html', 
-                           tournament=tournament_details, 
-                           rounds_data=rounds_data,
-                           can_advance_round=can_advance_round,
-                           current_max_round=current_max_round)
+                           tournament=page['tournament'], 
+                           rounds_data=bracket_state['rounds'],
+                           can_advance_round=bracket_state['can_advance'],
+                           current_max_round=bracket_state['current_round'])
 
 
 @app.route('/tournament/<int:tournament_id>/advance_round', methods=['POST'])
@@ -416,40 +455,36 @@ def advance_knockout_round(tournament_id):
 
     try:
         with connection.cursor() as cursor:
-            # Verify tournament is knockout
-            cursor.execute("SELECT format, name FROM tournaments WHERE id = %s", (tournament_id,))
-            tournament = cursor.fetchone()
+            # Lock the tournament row first: a second click on "advance" waits here, and its
+            # fixture read below then sees the round this request is about to insert.
+            tournament = db_utils.repository().lock_tournament(cursor, tournament_id)
             if not tournament or tournament['format'] != 'knockout':
                 flash("This action is only for knockout tournaments.", "warning")
                 return redirect(url_for('view_tournament', tournament_id=tournament_id))
 
-            current_max_round = get_max_round(cursor, tournament_id)
-            if not is_round_complete(cursor, tournament_id, current_max_round):
+            _, all_fixtures = fetch_tournament_fixtures(cursor, tournament_id)
+            bracket_state = bracket_utils.compute_bracket_state(all_fixtures)
+
+            if bracket_state['is_full_bracket']:
+                flash("This bracket advances automatically as results are entered.", "info")
+                return redirect(url_for('knockout_bracket', tournament_id=tournament_id))
+
+            current_max_round = bracket_state['current_round']
+            if not bracket_state['current_round_complete']:
                 flash(f"Round {current_max_round} is not yet complete.", "warning")
                 return redirect(url_for('knockout_bracket', tournament_id=tournament_id))
 
-            winners_list = get_round_winners(cursor, tournament_id, current_max_round)
+            winners_list = bracket_state['winners']
 
             if not winners_list:
                  flash(f"No winners found for round {current_max_round} to advance. Ensure matches are completed and winners determined.", "warning")
                  return redirect(url_for('knockout_bracket', tournament_id=tournament_id))
             
-            if len(winners_list) == 1 and current_max_round > 0: # Tournament ended in previous round check
-                flash(f"Tournament already finished! Winner: {winners_list[0]['name']}", "info")
-                return redirect(url_for('knockout_bracket', tournament_id=tournament_id))
-            
-            if len(winners_list) < 2 : # Not enough winners to make new pairings (e.g. only 1 winner and it's not final)
-                flash(f"Not enough winners ({len(winners_list)}) from round {current_max_round} to generate the next round.", "warning")
+            if bracket_state['champion']: # Tournament ended in previous round check
+                flash(f"Tournament already finished! Winner: {bracket_state['champion']['name']}", "info")
                 return redirect(url_for('knockout_bracket', tournament_id=tournament_id))
 
-
             next_round_number = current_max_round + 1
-            
-            # Check if next round already has fixtures (e.g., if button was clicked twice quickly)
-            cursor.execute("SELECT COUNT(*) as count FROM fixtures WHERE tournament_id = %s AND round_number = %s", (tournament_id, next_round_number))
-            if cursor.fetchone()['count'] > 0:
-                flash(f"Round {next_round_number} fixtures already exist.", "info")
-                return redirect(url_for('knockout_bracket', tournament_id=tournament_id))
 
             # Generate fixtures for the next round using the winners
             # generate_knockout_fixtures expects a list of dicts with 'id' (and optionally 'name')
@@ -461,28 +496,16 @@ def advance_knockout_round(tournament_id):
                 # The len(winners_list) == 1 check above should ideally catch the tournament end.
                 return redirect(url_for('knockout_bracket', tournament_id=tournament_id))
 
-            match_in_round_counter = 1
-            for match_pair in next_round_matches:
-                team1_id = match_pair[0]
-                team2_id = match_pair[1] # None for a bye
-
-                sql_insert_fixture = """
-                INSERT INTO fixtures 
-                (tournament_id, round_number, match_number_in_round, team1_id, team2_id, status) 
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(sql_insert_fixture, 
-                               (tournament_id, next_round_number, match_in_round_counter, team1_id, team2_id, 'Scheduled'))
-                match_in_round_counter += 1
-            
+            report = fixture_store.write_fixtures(
+                connection, fixture_store.rows_from_rounds(tournament_id, [(next_round_number, next_round_matches)]),
+                commit=False)
+            version = db_utils.touch_tournament(cursor, tournament_id)
             connection.commit()
-            flash(f"Round {next_round_number} fixtures generated successfully!", 'success')
+            publish_live_changes(tournament_id, version, new_round=True)
+            flash(f"Round {next_round_number} fixtures generated successfully! ({report.rows} matches written in {report.elapsed * 1000:.0f} ms)", 'success')
 
-    except pymysql.MySQLError as e:
+    except db_utils.DB_ERRORS as e:
         flash(f"Database error during next round generation: {e}", "danger")
-    finally:
-        if connection.open:
-            connection.close()
             
     return redirect(url_for('knockout_bracket', tournament_id=tournament_id))
 
@@ -497,91 +520,57 @@ def match_details(match_id):
         flash("Database connection failed.", "danger")
         return redirect(url_for('index'))
 
+    status_code = 200
     if request.method == 'POST':
         try:
-            score1_str = request.form.get('score1')
-            score2_str = request.form.get('score2')
+            score1 = results.parse_score(request.form.get('score1'))
+            score2 = results.parse_score(request.form.get('score2'))
+        except ValueError as e:
+            flash(str(e), "danger")
+            return redirect(url_for('match_details', match_id=match_id))
 
-            # Validate scores - must be integers if provided
-            score1 = int(score1_str) if score1_str and score1_str.strip() != '' else None
-            score2 = int(score2_str) if score2_str and score2_str.strip() != '' else None
-            
-            if (score1 is not None and score1 < 0) or \
-               (score2 is not None and score2 < 0):
-                flash("Scores cannot be negative.", "danger")
+        try:
+            # Same path as bulk entry: decides the winner and moves the standings / bracket
+            # along in this transaction, provided nobody changed the match since the form
+            # was loaded (its version is a hidden field, see results.py)
+            with connection.cursor() as cursor:
+                batch = results.apply_results(cursor, {match_id: (score1, score2)},
+                                              versions={match_id: request.form.get('version', type=int)})
+            if batch.tournament_id is None:
+                flash(f"Match with ID {match_id} not found.", 'warning')
+                return redirect(url_for('index'))
+            if batch.errors:
+                connection.rollback()
+                flash(batch.errors[match_id], "warning")
                 return redirect(url_for('match_details', match_id=match_id))
-
-            winner_id = None
-            # Fetch current team IDs for winner determination
-            with connection.cursor() as cursor_fetch_teams:
-                cursor_fetch_teams.execute("SELECT team1_id, team2_id FROM fixtures WHERE id = %s", (match_id,))
-                current_match_teams = cursor_fetch_teams.fetchone()
-            
-            if current_match_teams and current_match_teams['team2_id'] is None: # Bye match
-                winner_id = current_match_teams['team1_id']
-                # Scores might be conventionally set for a bye, e.g., 1-0 or remain None
-                # For simplicity, we'll just mark winner if it's a bye. Scores remain as entered or None.
-            elif score1 is not None and score2 is not None:
-                if score1 > score2:
-                    winner_id = current_match_teams['team1_id']
-                elif score2 > score1:
-                    winner_id = current_match_teams['team2_id']
-                # If score1 == score2, winner_id remains None (draw)
-            
-            status = 'Completed' if (score1 is not None or score2 is not None) else 'Scheduled' # If any score entered, mark completed
-
-            with connection.cursor() as cursor_update:
-                sql_update = """
-                    UPDATE fixtures 
-                    SET score1 = %s, score2 = %s, winner_id = %s, status = %s 
-                    WHERE id = %s
-                """
-                cursor_update.execute(sql_update, (score1, score2, winner_id, status, match_id))
-            connection.commit()
-            flash("Match scores updated successfully!", "success")
-
-        except ValueError:
-            flash("Invalid score format. Scores must be numbers.", "danger")
-        except pymysql.MySQLError as e:
+            if batch.blocked:
+                connection.rollback()
+                flash(f"Match {batch.blocked[match_id]} in the next round already has a result, so this match's "
+                      f"winner cannot change. Clear that result first.", "warning")
+                status_code = 409
+            elif batch.conflicts:
+                # Show the stored result with a fresh version instead of overwriting it
+                connection.rollback()
+                flash(f"Someone else updated this match while you were editing it; your score "
+                      f"({format_score(score1, score2)}) was not saved. Check the result below and submit again if needed.", "warning")
+                status_code = 409
+            else:
+                connection.commit() # Fixture row, standings delta and data version commit together
+                if batch.updated:
+                    publish_live_changes(batch.tournament_id, batch.data_version, batch.updated + batch.advanced)
+                flash("Match scores updated successfully!", "success")
+                return redirect(url_for('match_details', match_id=match_id))
+        except db_utils.DB_ERRORS as e:
             flash(f"Database error updating scores: {e}", "danger")
-        finally:
-            if connection.open: # Connection might have been closed if get_db_connection failed initially
-                connection.close()
-        return redirect(url_for('match_details', match_id=match_id))
+            return redirect(url_for('match_details', match_id=match_id))
 
-    # --- GET Request Logic ---
+    # --- GET Request Logic (also re-displays the match after a conflicting POST) ---
     match_data = None
     tournament_name = "Unknown Tournament" # Default
-    # Re-establish connection if it was closed by POST, or if it's the first GET
-    # Note: get_db_connection() is called again here. This is acceptable for simplicity.
-    # In a larger app, you might manage connection per request context.
-    if not connection or not connection.open: # Ensure connection is (re)opened for GET
-        connection = get_db_connection()
-        if not connection:
-            return redirect(url_for('index'))
-
-    connection = get_db_connection()
-    if not connection:
-        return redirect(url_for('index')) # Or a more specific error page
 
     try:
         with connection.cursor() as cursor:
-            sql = """
-                SELECT 
-                    f.*, 
-                    t.name as tournament_name,
-                    p1.name as team1_name,
-                    p2.name as team2_name,
-                    winner.name as winner_name
-                FROM fixtures f
-                JOIN tournaments t ON f.tournament_id = t.id
-                JOIN participants p1 ON f.team1_id = p1.id
-                LEFT JOIN participants p2 ON f.team2_id = p2.id
-                LEFT JOIN participants winner ON f.winner_id = winner.id
-                WHERE f.id = %s
-            """
-            cursor.execute(sql, (match_id,))
-            match_data = cursor.fetchone()
+            match_data = db_utils.repository().fixture_details(cursor, match_id)
 
             if not match_data:
                 flash(f"Match with ID {match_id} not found.", 'warning')
@@ -591,16 +580,141 @@ def match_details(match_id):
             
             tournament_name = match_data['tournament_name']
 
-    except pymysql.MySQLError as e:
+    except db_utils.DB_ERRORS as e:
         flash(f"Error fetching match details: {e}", 'danger')
         return redirect(url_for('index')) # Redirect on error
-    finally:
-        if connection.open:
-            connection.close()
             
     return render_template('match_details.html', 
                            match=match_data, 
-                           tournament_name=tournament_name)
+                           tournament_name=tournament_name), status_code
+
+@app.route('/tournament/<int:tournament_id>/results', methods=['GET', 'POST'])
+def enter_results(tournament_id):
+    """
+    Score entry for a whole round at once. The form posts score1_<fixture id>,
+    score2_<fixture id> and version_<fixture id> fields; JSON clients post
+    {"results": [{"fixture_id", "score1", "score2", "version" (optional)}]} and get
+    {"updated", "unchanged", "errors"} back, or 409 with {"conflicts"} when fixtures
+    changed since the given versions. Either way all rows are applied in one
+    transaction, or none if any row is invalid or conflicting.
+    """
+    wants_json = request.is_json
+    connection = get_db_connection()
+    if not connection:
+        if wants_json:
+            return jsonify({'error': 'Database connection failed.'}), 503
+        return redirect(url_for('view_tournament', tournament_id=tournament_id))
+
+    submitted = {}
+    errors = {}
+    conflicts = {}
+    if request.method == 'POST':
+        versions = {}
+        if wants_json:
+            payload = request.get_json(silent=True)
+            items = payload.get('results') if isinstance(payload, dict) else None
+            if not isinstance(items, list):
+                return jsonify({'error': 'Send a JSON object with a "results" list.'}), 400
+            raw_scores = {}
+            for item in items:
+                if not isinstance(item, dict):
+                    return jsonify({'error': 'Each result must be a JSON object.'}), 400
+                try:
+                    raw_scores[int(item['fixture_id'])] = (item.get('score1'), item.get('score2'))
+                    if item.get('version') is not None:
+                        versions[int(item['fixture_id'])] = int(item['version'])
+                except (KeyError, TypeError, ValueError):
+                    return jsonify({'error': 'Each result needs an integer fixture_id (and an integer version, if given).'}), 400
+        else:
+            raw_scores = {}
+            for field, value in request.form.items():
+                if field.startswith(('score1_', 'score2_')) and field[7:].isdigit():
+                    scores = raw_scores.setdefault(int(field[7:]), [None, None])
+                    scores[0 if field.startswith('score1_') else 1] = value
+                elif field.startswith('version_') and field[8:].isdigit() and value.isdigit():
+                    versions[int(field[8:])] = int(value)
+
+        entries = {}
+        for fixture_id, (raw1, raw2) in raw_scores.items():
+            submitted[fixture_id] = (raw1, raw2)
+            try:
+                entries[fixture_id] = (results.parse_score(raw1), results.parse_score(raw2))
+            except ValueError as e:
+                errors[fixture_id] = str(e)
+
+        try:
+            # Still checked against the database when some rows failed to parse, so every
+            # problem is reported at once; apply_results writes nothing if it finds errors.
+            with connection.cursor() as cursor:
+                batch = results.apply_results(cursor, entries, tournament_id=tournament_id, versions=versions) if not errors \
+                    else results.check_results(cursor, entries, tournament_id=tournament_id, versions=versions)
+            if errors or batch.errors or batch.conflicts:
+                connection.rollback()
+                errors = {**batch.errors, **errors}
+                conflicts = batch.conflicts
+            else:
+                connection.commit()
+                if batch.updated:
+                    publish_live_changes(tournament_id, batch.data_version, batch.updated + batch.advanced)
+        except db_utils.DB_ERRORS as e:
+            if wants_json:
+                return jsonify({'error': f"Database error updating scores: {e}"}), 503
+            flash(f"Database error updating scores: {e}", "danger")
+            return redirect(url_for('enter_results', tournament_id=tournament_id, round=request.args.get('round')))
+
+        if wants_json:
+            body = {'errors': {str(fixture_id): message for fixture_id, message in errors.items()}}
+            if conflicts:
+                # The stored result and version of each conflicting fixture (null if it was deleted)
+                body['conflicts'] = {str(fixture_id): row and {column: row[column] for column in ('score1', 'score2', 'status', 'version')}
+                                     for fixture_id, row in conflicts.items()}
+                # Conflicts whose winner cannot change because the next match is decided
+                body['blocked'] = {str(fixture_id): next_fixture_id for fixture_id, next_fixture_id in batch.blocked.items()}
+            if not errors and not conflicts:
+                body.update(updated=batch.updated, unchanged=batch.unchanged)
+            return jsonify(body), 422 if errors else (409 if conflicts else 200)
+        if not errors and not conflicts:
+            flash(f"{len(batch.updated)} result(s) saved, {len(batch.unchanged)} unchanged.", "success")
+            return redirect(url_for('enter_results', tournament_id=tournament_id, round=request.args.get('round')))
+        for fixture_id in conflicts:
+            # Re-display the stored result (and its new version) rather than the stale entry
+            typed = submitted.pop(fixture_id, (None, None))
+            if fixture_id in batch.blocked:
+                errors[fixture_id] = (f"Match {batch.blocked[fixture_id]} in the next round already has a result, so this "
+                                      f"winner cannot change; your entry ({format_score(*typed)}) was not saved.")
+                continue
+            errors[fixture_id] = f"Changed by someone else since you loaded the page; your entry ({format_score(*typed)}) was not saved."
+        if conflicts and len(conflicts) == len(errors):
+            flash(f"{len(conflicts)} result(s) conflict with results saved since (by someone else, or in the next "
+                  f"round); nothing was saved. Check them and save again.", "warning")
+        else:
+            flash(f"{len(errors)} result(s) need fixing; nothing was saved.", "danger")
+
+    # --- GET (or re-display with errors) ---
+    try:
+        with connection.cursor() as cursor:
+            tournament, fixtures = fetch_tournament_fixtures(cursor, tournament_id)
+    except db_utils.DB_ERRORS as e:
+        flash(f"Error fetching fixtures: {e}", "danger")
+        return redirect(url_for('view_tournament', tournament_id=tournament_id))
+    if not tournament:
+        flash('Tournament not found.', 'danger')
+        return redirect(url_for('index'))
+
+    rounds = sorted({fixture['round_number'] for fixture in fixtures})
+    selected_round = request.args.get('round', type=int)
+    if selected_round not in rounds:
+        # Default to the first round that still has matches to play
+        open_rounds = [fixture['round_number'] for fixture in fixtures if fixture['status'] == 'Scheduled']
+        selected_round = min(open_rounds) if open_rounds else (rounds[-1] if rounds else None)
+
+    return render_template('enter_results.html',
+                           tournament=tournament,
+                           rounds=rounds,
+                           selected_round=selected_round,
+                           fixtures=[fixture for fixture in fixtures if fixture['round_number'] == selected_round],
+                           submitted=submitted,
+                           errors=errors), (409 if conflicts and len(conflicts) == len(errors) else 400) if errors else 200
 
 @app.route('/tournament/<int:tournament_id>/remove', methods=['POST'])
 def remove_tournament(tournament_id):
@@ -613,21 +727,14 @@ def remove_tournament(tournament_id):
         with connection.cursor() as cursor:
             # Due to ON DELETE CASCADE in participants and fixtures tables,
             # deleting from tournaments will also delete related records.
-            # First, ensure the tournament exists to give a more specific error if not.
-            cursor.execute("SELECT id FROM tournaments WHERE id = %s", (tournament_id,))
-            tournament = cursor.fetchone()
-            if not tournament:
+            # No row deleted means there was no such tournament.
+            if not db_utils.repository().delete_tournament(cursor, tournament_id):
                 flash(f"Tournament with ID {tournament_id} not found for removal.", 'warning')
                 return redirect(url_for('index'))
-
-            cursor.execute("DELETE FROM tournaments WHERE id = %s", (tournament_id,))
         connection.commit()
         flash(f"Tournament (ID: {tournament_id}) and all its data removed successfully.", 'success')
-    except pymysql.MySQLError as e:
+    except db_utils.DB_ERRORS as e:
         flash(f"Error removing tournament: {e}", 'danger')
-    finally:
-        if connection.open:
-            connection.close()
             
     return redirect(url_for('index'))
 
@@ -643,66 +750,77 @@ def generate_fixtures_route(tournament_id): # Renamed to avoid conflict with url
 
     try:
         with connection.cursor() as cursor:
+            repo = db_utils.repository()
             # Check if fixtures already exist
-            cursor.execute("SELECT COUNT(*) as count FROM fixtures WHERE tournament_id = %s", (tournament_id,))
-            if cursor.fetchone()['count'] > 0:
+            if repo.count_fixtures(cursor, tournament_id) > 0:
                 flash('Fixtures have already been generated for this tournament.', 'info')
                 return redirect(url_for('view_tournament', tournament_id=tournament_id))
 
             # Fetch tournament format
-            cursor.execute("SELECT format FROM tournaments WHERE id = %s", (tournament_id,))
-            tournament_data = cursor.fetchone()
+            tournament_data = repo.get_tournament(cursor, tournament_id)
             if not tournament_data:
                 flash('Tournament not found.', 'danger')
                 return redirect(url_for('index'))
             tournament_format = tournament_data['format']
 
-            # Fetch teams (participants)
-            cursor.execute("SELECT id, name FROM participants WHERE tournament_id = %s", (tournament_id,))
-            teams = cursor.fetchall()
+            # Fetch teams (participants) in registration order, which is the knockout seed order
+            teams = repo.list_teams(cursor, tournament_id, order_by='id')
 
             if not teams or len(teams) < 2:
                 flash('Not enough teams to generate fixtures (minimum 2 required).', 'warning')
                 return redirect(url_for('view_tournament', tournament_id=tournament_id))
 
-            generated_matches = []
+            if tournament_format == 'knockout' and app.config['KNOCKOUT_FULL_BRACKET']:
+                # Every slot of every round is created now; results move winners up by themselves
+                bracket_rounds = fixture_logic.generate_knockout_bracket(
+                    teams, shuffle=app.config['KNOCKOUT_SEEDING'] == 'random')
+                report = fixture_store.write_fixtures(connection, fixture_store.rows_from_bracket(tournament_id, bracket_rounds),
+                                                      columns=fixture_store.BRACKET_COLUMNS, commit=False)
+                fixture_store.link_bracket(cursor, tournament_id)
+                version = db_utils.touch_tournament(cursor, tournament_id)
+                connection.commit() # Slots and their links land together
+                publish_live_changes(tournament_id, version, new_round=True)
+                flash(f"Bracket generated successfully! ({report.rows} matches across {len(bracket_rounds)} rounds written in {report.elapsed * 1000:.0f} ms)", 'success')
+                return redirect(url_for('view_tournament', tournament_id=tournament_id))
+
+            # Both generators produce (round_number, [(team1_id, team2_id), ...]) per round
             if tournament_format == 'league':
-                generated_matches = fixture_logic.generate_league_fixtures(teams)
+                # Circle-method schedule, yielded lazily one round at a time
+                double_round_robin = request.form.get('double_round_robin') == 'on'
+                generated_rounds = fixture_logic.generate_round_robin_rounds(teams, double_round_robin=double_round_robin)
             elif tournament_format == 'knockout':
-                generated_matches = fixture_logic.generate_knockout_fixtures(teams)
+                # For knockout, these are round 1 matches (team2 may be None for a bye)
+                generated_rounds = [(1, fixture_logic.generate_knockout_fixtures(teams))]
             else:
                 flash(f"Unsupported tournament format: {tournament_format}", 'danger')
                 return redirect(url_for('view_tournament', tournament_id=tournament_id))
 
-            if not generated_matches:
+            # Chunked multi-row inserts (FIXTURE_INSERT_BATCH_SIZE rows each), one commit.
+            # The rounds are consumed lazily, so memory stays flat for large leagues.
+            report = fixture_store.write_fixtures(connection, fixture_store.rows_from_rounds(tournament_id, generated_rounds),
+                                                  commit=False)
+
+            if not report.rows:
                 flash('No matches were generated. This might be due to an issue with the number of teams or format.', 'warning')
                 return redirect(url_for('view_tournament', tournament_id=tournament_id))
 
-            # Insert generated matches into the fixtures table
-            # For league, all matches are typically round 1 unless a more complex round system is implemented
-            # For knockout, these are round 1 matches.
-            round_number = 1 
-            match_in_round_counter = 1
-            for match_pair in generated_matches:
-                team1_id = match_pair[0]
-                team2_id = match_pair[1] # This could be None for a bye in knockout
-
-                sql_insert_fixture = """
-                INSERT INTO fixtures 
-                (tournament_id, round_number, match_number_in_round, team1_id, team2_id, status) 
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(sql_insert_fixture, 
-                               (tournament_id, round_number, match_in_round_counter, team1_id, team2_id, 'Scheduled'))
-                match_in_round_counter +=1
-            
+            version = db_utils.touch_tournament(cursor, tournament_id)
             connection.commit()
-            flash('Fixtures generated successfully!', 'success')
+            publish_live_changes(tournament_id, version, new_round=True)
 
-    except pymysql.MySQLError as e:
+            flash(f"Fixtures generated successfully! ({report.rows} matches written in {report.elapsed * 1000:.0f} ms)", 'success')
+
+    except db_utils.DB_ERRORS as e:
         flash(f"Database error during fixture generation: {e}", 'danger')
-    finally:
-        if connection.open:
-            connection.close()
             
     return redirect(url_for('view_tournament', tournament_id=tournament_id))
+
+@app.route('/admin/pool_stats')
+def pool_stats():
+    # Connection pool counters for this worker process (size, idle, in_use, waits, timeouts, ...)
+    return jsonify(db_utils.get_pool().stats())
+
+@app.route('/admin/cache_stats')
+def cache_stats():
+    # Tournament cache counters (entries, hits, misses, evictions, expirations)
+    return jsonify(cache.get_tournament_cache().stats())
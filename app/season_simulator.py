@@ -0,0 +1,232 @@
+import concurrent.futures
+
+from app import app
+from app import db_utils
+from app import league_utils
+from app import standings_batch
+from app import standings_store
+
+# Monte Carlo season outcomes: how likely each team is to finish in each position,
+# given the table so far and the fixtures still to play.
+#
+# Every remaining fixture is played SIMULATION_SEASONS times with Poisson-distributed
+# scores. Each side's expected goals come from the results so far: the league's home and
+# away scoring rates, scaled by the team's attack and the opponent's defence (goals
+# scored / conceded per match relative to the league average, blended with
+# SIMULATION_PRIOR_MATCHES average matches so that a team with few results is not
+# judged on one scoreline).
+#
+# Seasons are sampled SIMULATION_BATCH_SEASONS at a time as (seasons x fixtures) score
+# arrays. Each season's table is the current table plus the sampled results, summed
+# per team with one matrix product per column. Every season is ranked at once with
+# np.lexsort on points, the tournament's tiebreakers, then name and id, as in
+# league_utils.rank_standings. Head-to-head tiebreakers are skipped in the simulation:
+# they depend on which teams are level in each season, which does not vectorize. The
+# tiebreakers after them still apply.
+#
+# Each batch has its own random stream, spawned from SIMULATION_SEED, so the odds
+# depend only on the seed and the data. They are the same with or without
+# SIMULATION_WORKERS processes sharing the batches; only the simulate-season command
+# starts those, pages always simulate in the web worker's own process. Pages cache the
+# result per tournament data_version, so only the first view after a new result runs
+# the simulation (once per worker process, or once in all with CACHE_BACKEND='redis').
+#
+# Needs numpy (requirements.txt), like app/standings_batch.py.
+
+DEFAULT_HOME_GOALS = 1.5 # Scoring rates used before any result has been entered
+DEFAULT_AWAY_GOALS = 1.2
+
+
+def build_model(teams, completed_fixtures, remaining_fixtures, rules=None, prior_matches=None):
+    """
+    Everything a simulation needs, as plain lists (cheap to send to worker processes):
+    the current table in ranking order, the remaining fixtures as team positions with
+    each side's expected goals, the points rules and the tiebreaker columns.
+    """
+    rules = rules or league_utils.StandingsRules()
+    prior_matches = app.config['SIMULATION_PRIOR_MATCHES'] if prior_matches is None else prior_matches
+    table = league_utils.calculate_standings_data(teams, completed_fixtures, tiebreakers=rules.tiebreakers, **rules.points)
+    position = {row['id']: i for i, row in enumerate(table)}
+    away_gf = [0] * len(table)
+
+    # League scoring rates and each team's goals for / against, over results with two teams
+    home_goals = away_goals = played = 0
+    scored = [0] * len(table)
+    conceded = [0] * len(table)
+    matches = [0] * len(table)
+    for fixture in completed_fixtures:
+        if fixture['team1_id'] is None or fixture['team2_id'] is None:
+            continue # Byes say nothing about scoring
+        i, j = position.get(fixture['team1_id']), position.get(fixture['team2_id'])
+        s1, s2 = int(fixture['score1'] or 0), int(fixture['score2'] or 0)
+        home_goals += s1
+        away_goals += s2
+        played += 1
+        if j is not None:
+            away_gf[j] += s2 # Counted like league_utils.HeadToHeadIndex.away_gf
+        for team, gf, ga in ((i, s1, s2), (j, s2, s1)):
+            if team is not None:
+                scored[team] += gf
+                conceded[team] += ga
+                matches[team] += 1
+    home_rate = home_goals / played if played else DEFAULT_HOME_GOALS
+    away_rate = away_goals / played if played else DEFAULT_AWAY_GOALS
+    average = (home_rate + away_rate) / 2
+    attack, defence = [], []
+    for i in range(len(table)):
+        weight = (matches[i] + prior_matches) * average
+        attack.append((scored[i] + prior_matches * average) / weight if weight else 1.0)
+        defence.append((conceded[i] + prior_matches * average) / weight if weight else 1.0)
+
+    base = {column: [row[column] for row in table] for column in ('pts', 'w', 'gf', 'ga')}
+    base['away_gf'] = away_gf
+    home, away, home_expected, away_expected = [], [], [], []
+    for fixture in remaining_fixtures:
+        i, j = position.get(fixture['team1_id']), position.get(fixture['team2_id'])
+        if i is None:
+            continue # Not one of the tournament's teams (or an empty slot)
+        if fixture['team2_id'] is None:
+            base['pts'][i] += rules.points_win # A bye is a win, as in calculate_standings_data
+            base['w'][i] += 1
+            continue
+        if j is None:
+            continue
+        home.append(i)
+        away.append(j)
+        home_expected.append(home_rate * attack[i] * defence[j])
+        away_expected.append(away_rate * attack[j] * defence[i])
+
+    # Still level after the tiebreakers: by name, then id
+    name_order = sorted(range(len(table)), key=lambda i: (table[i]['name'], table[i]['id']))
+    name_rank = [0] * len(table)
+    for rank, i in enumerate(name_order):
+        name_rank[i] = rank
+    return {
+        'table': table,
+        'base': base,
+        'home': home,
+        'away': away,
+        'home_expected': home_expected,
+        'away_expected': away_expected,
+        'points': rules.points,
+        'tiebreakers': [name for name in rules.tiebreakers if name not in league_utils.HEAD_TO_HEAD_TIEBREAKERS],
+        'name_rank': name_rank,
+    }
+
+
+def simulate_batch(model, seed, seasons):
+    """
+    Plays the remaining fixtures `seasons` times with the random stream `seed` (an
+    np.random.SeedSequence). Returns (counts, points): counts[team][position] is how
+    often each team (in model['table'] order) finished in each position, points the
+    sum of its final points over the batch.
+    """
+    np = standings_batch._numpy()
+    rng = np.random.default_rng(seed)
+    team_count = len(model['table'])
+    fixture_count = len(model['home'])
+
+    # One-hot (fixtures x teams) matrices: a (seasons x fixtures) column times one of
+    # them sums each team's home or away values per season
+    home_matrix = np.zeros((fixture_count, team_count))
+    away_matrix = np.zeros((fixture_count, team_count))
+    home_matrix[np.arange(fixture_count), model['home']] = 1
+    away_matrix[np.arange(fixture_count), model['away']] = 1
+
+    score1 = rng.poisson(np.array(model['home_expected']), size=(seasons, fixture_count))
+    score2 = rng.poisson(np.array(model['away_expected']), size=(seasons, fixture_count))
+    home_win = score1 > score2
+    away_win = score2 > score1
+    draw = ~home_win & ~away_win
+    points = model['points']
+
+    def total(column, home_values, away_values):
+        # Integer sums, exact in float64
+        values = home_values @ home_matrix + away_values @ away_matrix
+        return np.array(model['base'][column], dtype=np.int64) + values.astype(np.int64)
+
+    totals = {
+        'pts': total('pts',
+                     home_win * points['points_win'] + draw * points['points_draw'] + away_win * points['points_loss'],
+                     away_win * points['points_win'] + draw * points['points_draw'] + home_win * points['points_loss']),
+    }
+    needed = set(model['tiebreakers'])
+    if needed & {'gf', 'gd'}:
+        totals['gf'] = total('gf', score1, score2)
+    if 'gd' in needed:
+        totals['gd'] = totals['gf'] - total('ga', score2, score1)
+    if 'w' in needed:
+        totals['w'] = total('w', home_win, away_win)
+    if 'away_gf' in needed:
+        totals['away_gf'] = total('away_gf', np.zeros_like(score1), score2)
+
+    # np.lexsort sorts by the last key first; row s is season s's table, best first
+    keys = [np.broadcast_to(np.array(model['name_rank']), (seasons, team_count))]
+    keys.extend(-totals[name] for name in reversed(model['tiebreakers']))
+    keys.append(-totals['pts'])
+    order = np.lexsort(keys, axis=-1)
+
+    finishing = order.ravel() * team_count + np.tile(np.arange(team_count), seasons)
+    counts = np.bincount(finishing, minlength=team_count * team_count).reshape(team_count, team_count)
+    return counts, totals['pts'].sum(axis=0)
+
+
+def _run_batch(task):
+    return simulate_batch(*task)
+
+
+def simulate_season(model, seasons=None, seed=None, workers=0, batch_seasons=None):
+    """
+    Runs `seasons` simulated seasons in batches of batch_seasons, across `workers`
+    processes if more than one (the CLI passes SIMULATION_WORKERS; a web request must
+    not start a process pool). Returns {'seasons', 'seed', 'remaining_fixtures',
+    'relegation_places', 'teams'}, teams in the current table's order, each with
+    'positions' (the probability of finishing 1st, 2nd, ...), 'title', 'relegation'
+    and 'expected_pts'.
+    """
+    np = standings_batch._numpy()
+    seasons = seasons or app.config['SIMULATION_SEASONS']
+    seed = app.config['SIMULATION_SEED'] if seed is None else seed
+    batch_seasons = batch_seasons or app.config['SIMULATION_BATCH_SEASONS']
+    team_count = len(model['table'])
+    relegation_places = max(0, min(app.config['SIMULATION_RELEGATION_PLACES'], team_count - 1))
+
+    # The batches (and their random streams) depend only on seasons and batch_seasons,
+    # never on the worker count
+    sizes = [min(batch_seasons, seasons - start) for start in range(0, seasons, batch_seasons)]
+    tasks = [(model, stream, size) for stream, size in zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes)]
+    if workers > 1 and len(tasks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_run_batch, tasks))
+    else:
+        results = [_run_batch(task) for task in tasks]
+
+    counts = sum(result[0] for result in results)
+    points = sum(result[1] for result in results)
+    teams = []
+    for i, row in enumerate(model['table']):
+        positions = (counts[i] / seasons).tolist()
+        teams.append({
+            'id': row['id'],
+            'name': row['name'],
+            'pts': row['pts'],
+            'expected_pts': float(points[i]) / seasons,
+            'positions': positions,
+            'title': positions[0],
+            'relegation': sum(positions[team_count - relegation_places:]),
+        })
+    return {
+        'seasons': seasons,
+        'seed': seed,
+        'remaining_fixtures': len(model['home']),
+        'relegation_places': relegation_places,
+        'teams': teams,
+    }
+
+
+def load_season_odds(cursor, tournament_id, **options):
+    """Reads a league tournament's teams, results and remaining fixtures and runs simulate_season(**options)."""
+    repo = db_utils.repository()
+    model = build_model(repo.list_teams(cursor, tournament_id), repo.completed_fixtures(cursor, tournament_id), repo.remaining_fixtures(cursor, tournament_id),
+                        standings_store.load_rules(cursor, tournament_id))
+    return simulate_season(model, **options)
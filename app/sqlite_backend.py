@@ -0,0 +1,322 @@
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+from app import app
+from app import profiling
+
+# Embedded SQLite storage (DB_BACKEND = 'sqlite'), for single-box installs and for
+# running the app and its benchmarks without a MySQL server.
+#
+# SQLiteConnection wraps sqlite3 in the small part of the PyMySQL interface the
+# app uses (cursor() as a context manager returning dict rows, commit, rollback,
+# ping), so the pool, the *_store modules and the portable SQL in repository.py
+# run unchanged. Statements written for PyMySQL's '%s' placeholders are rewritten
+# to sqlite3's '?' once per distinct statement, and sqlite3 keeps the compiled
+# statements of the last SQLITE_CACHED_STATEMENTS texts, so hot queries are
+# prepared once per connection and reused.
+#
+# Every connection is opened with:
+#   journal_mode = WAL     readers never block the writer (or each other)
+#   synchronous = NORMAL   fsync at checkpoints only; safe with WAL, loses at most
+#                          the last transactions on power loss, never corrupts
+#   foreign_keys = ON      the ON DELETE CASCADE / SET NULL rules of the schema
+#   busy_timeout           writers queue for the write lock instead of failing
+#   cache_size, mmap_size, temp_store = MEMORY   keep the working set in memory
+#
+# The schema below is the SQLite equivalent of db_setup.py's migrations and is
+# created on first connect; PRAGMA user_version records which version it matches,
+# and UPGRADES brings older files up to date.
+#
+# Ids are AUTOINCREMENT, like MySQL's AUTO_INCREMENT: a plain INTEGER PRIMARY KEY hands
+# the highest id out again after that row is deleted, and the page cache and ETags
+# assume a tournament id always names the same tournament.
+
+SCHEMA_VERSION = 12 # Keep in step with db_setup.MIGRATIONS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tournaments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    sport VARCHAR(100) NOT NULL,
+    format VARCHAR(50) NOT NULL,
+    uid CHAR(16) NOT NULL DEFAULT '',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    data_version INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    points_win INT NOT NULL DEFAULT 3,
+    points_draw INT NOT NULL DEFAULT 1,
+    points_loss INT NOT NULL DEFAULT 0,
+    tiebreakers VARCHAR(255) NOT NULL DEFAULT 'gd,gf'
+);
+CREATE TABLE IF NOT EXISTS participants (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INT REFERENCES tournaments(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fixtures (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INT REFERENCES tournaments(id) ON DELETE CASCADE,
+    round_number INT,
+    match_number_in_round INT,
+    team1_id INT REFERENCES participants(id) ON DELETE SET NULL,
+    team2_id INT NULL REFERENCES participants(id) ON DELETE SET NULL,
+    status VARCHAR(50) DEFAULT 'Scheduled',
+    score1 INT NULL,
+    score2 INT NULL,
+    winner_id INT NULL REFERENCES participants(id) ON DELETE SET NULL,
+    next_fixture_id INT NULL,
+    next_slot TINYINT NULL,
+    version INT NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS standings (
+    tournament_id INT NOT NULL REFERENCES tournaments(id) ON DELETE CASCADE,
+    participant_id INT NOT NULL REFERENCES participants(id) ON DELETE CASCADE,
+    mp INT NOT NULL DEFAULT 0,
+    w INT NOT NULL DEFAULT 0,
+    d INT NOT NULL DEFAULT 0,
+    l INT NOT NULL DEFAULT 0,
+    gf INT NOT NULL DEFAULT 0,
+    ga INT NOT NULL DEFAULT 0,
+    gd INT NOT NULL DEFAULT 0,
+    pts INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (tournament_id, participant_id)
+);
+CREATE TABLE IF NOT EXISTS list_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    import_key VARCHAR(255) PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    records_committed BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_fixtures_round_status ON fixtures (tournament_id, round_number, status, winner_id);
+CREATE INDEX IF NOT EXISTS idx_fixtures_round_order ON fixtures (tournament_id, round_number, match_number_in_round);
+CREATE INDEX IF NOT EXISTS idx_fixtures_completed ON fixtures (tournament_id, status, team1_id, team2_id, score1, score2, winner_id);
+CREATE INDEX IF NOT EXISTS idx_participants_tournament_name ON participants (tournament_id, name);
+CREATE INDEX IF NOT EXISTS idx_tournaments_created ON tournaments (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tournaments_sport_created ON tournaments (sport, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tournaments_format_created ON tournaments (format, created_at, id);
+"""
+
+
+def _rebuild_tables(*tables):
+    """
+    Upgrade step recreating tables from their latest SCHEMA definition, for changes
+    ALTER TABLE cannot make (rows are copied column by column; SCHEMA's indexes are
+    recreated after the upgrade).
+    """
+    def rebuild(db):
+        for table in tables:
+            definition = re.search(rf"CREATE TABLE IF NOT EXISTS {table} \(.*?\n\);", SCHEMA, re.S).group()
+            db.execute(definition.replace(f"IF NOT EXISTS {table} (", f"{table}_rebuilt ("))
+            columns = ', '.join(row['name'] for row in db.execute(f"PRAGMA table_info({table})").fetchall())
+            db.execute(f"INSERT INTO {table}_rebuilt ({columns}) SELECT {columns} FROM {table}")
+            db.execute(f"DROP TABLE {table}")
+            db.execute(f"ALTER TABLE {table}_rebuilt RENAME TO {table}")
+    return rebuild
+
+
+def _add_column_if_missing(table, column, definition):
+    # For columns a table rebuilt by an earlier step already has
+    def add(db):
+        if not any(row['name'] == column for row in db.execute(f"PRAGMA table_info({table})").fetchall()):
+            db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return add
+
+
+# Brings a database created at an older SCHEMA_VERSION up to date: {version: steps},
+# each an SQL statement or a function of the sqlite3 connection. They run in one
+# transaction with foreign keys off. SCHEMA itself always describes the latest version.
+UPGRADES = {
+    9: [
+        "ALTER TABLE tournaments ADD COLUMN points_win INT NOT NULL DEFAULT 3",
+        "ALTER TABLE tournaments ADD COLUMN points_draw INT NOT NULL DEFAULT 1",
+        "ALTER TABLE tournaments ADD COLUMN points_loss INT NOT NULL DEFAULT 0",
+        "ALTER TABLE tournaments ADD COLUMN tiebreakers VARCHAR(255) NOT NULL DEFAULT 'gd,gf'",
+    ],
+    # AUTOINCREMENT ids (only a new table can get it); the counters start after the highest id left
+    10: [_rebuild_tables('tournaments', 'participants', 'fixtures')],
+    11: [
+        _add_column_if_missing('tournaments', 'uid', "CHAR(16) NOT NULL DEFAULT ''"),
+        "UPDATE tournaments SET uid = lower(hex(randomblob(8))) WHERE uid = ''",
+    ],
+    12: ["CREATE TABLE IF NOT EXISTS list_versions (name VARCHAR(50) PRIMARY KEY, version BIGINT NOT NULL DEFAULT 0)"],
+}
+
+_PLACEHOLDERS = re.compile(r'%[s%]')
+
+
+@lru_cache(maxsize=1024)
+def translate(query):
+    """PyMySQL 'format' parameters ('%s', and '%%' for a literal '%') to sqlite3's '?'."""
+    return _PLACEHOLDERS.sub(lambda match: '?' if match.group() == '%s' else '%', query)
+
+
+# TIMESTAMP columns travel as 'YYYY-MM-DD HH:MM:SS' text, like MySQL's, and come back as datetime
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=' '))
+sqlite3.register_converter('TIMESTAMP', lambda raw: datetime.fromisoformat(raw.decode()))
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    """The PyMySQL DictCursor surface (execute with %s, fetch* as dicts, rowcount, lastrowid)."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._db.cursor()
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, query, args=None):
+        # Like PyMySQL, a query without args is sent as written ('%%' included)
+        if args is None:
+            self._cursor.execute(query)
+        else:
+            self._cursor.execute(translate(query), tuple(args))
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+        return self.rowcount
+
+    def executemany(self, query, args):
+        self._cursor.executemany(translate(query), (tuple(row) for row in args))
+        self.rowcount = self._cursor.rowcount
+        return self.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ProfilingSQLiteCursor(profiling.ProfilingCursorMixin, SQLiteCursor):
+    pass
+
+
+class SQLiteConnection:
+    """A sqlite3 connection with the PyMySQL connection methods the app and the pool call."""
+
+    def __init__(self, path, cursorclass=SQLiteCursor, busy_timeout_ms=5000, cached_statements=256,
+                 cache_size_kb=65536, mmap_size=268435456):
+        # check_same_thread=False: the pool hands a connection to one thread at a time,
+        # but not always the thread that opened it
+        self._db = sqlite3.connect(path, timeout=busy_timeout_ms / 1000, detect_types=sqlite3.PARSE_DECLTYPES,
+                                   check_same_thread=False, cached_statements=cached_statements)
+        self._db.row_factory = _dict_row
+        self.cursorclass = cursorclass
+        self.path = path
+        for pragma in ('journal_mode = WAL', 'synchronous = NORMAL', 'foreign_keys = ON',
+                       f'busy_timeout = {int(busy_timeout_ms)}', f'cache_size = -{int(cache_size_kb)}',
+                       f'mmap_size = {int(mmap_size)}', 'temp_store = MEMORY'):
+            self._db.execute(f"PRAGMA {pragma}")
+
+    @property
+    def open(self):
+        try:
+            self._db.total_changes
+            return True
+        except sqlite3.ProgrammingError: # Closed
+            return False
+
+    @property
+    def in_transaction(self):
+        return self._db.in_transaction
+
+    def cursor(self, cursorclass=None):
+        # PyMySQL cursor classes passed by callers (e.g. the exporter's unbuffered one) are
+        # ignored: sqlite3 already steps through results as they are fetched
+        return self.cursorclass(self)
+
+    def begin_immediate(self):
+        """Takes the database write lock now, as SELECT ... FOR UPDATE would on MySQL."""
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self, reconnect=False):
+        self._db.execute("SELECT 1").fetchone()
+
+    def close(self):
+        self._db.close()
+
+
+_schema_lock = threading.Lock()
+_schema_ready = set() # Database paths whose schema this process has checked
+
+
+def ensure_schema(connection):
+    with _schema_lock:
+        if connection.path in _schema_ready:
+            return
+        db = connection._db
+        user_version = db.execute("PRAGMA user_version").fetchone()['user_version']
+        if user_version == 0: # New database
+            db.executescript(SCHEMA)
+        elif user_version < SCHEMA_VERSION:
+            # Off outside the transaction (the pragma is ignored inside one): dropping a
+            # rebuilt table must not cascade to the rows that reference it
+            db.execute("PRAGMA foreign_keys = OFF")
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                for version in range(user_version + 1, SCHEMA_VERSION + 1):
+                    for step in UPGRADES.get(version, ()):
+                        if callable(step):
+                            step(db)
+                        else:
+                            db.execute(step)
+                for statement in SCHEMA.split(';'): # Every CREATE is IF NOT EXISTS
+                    if statement.strip():
+                        db.execute(statement)
+                db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+            finally:
+                db.execute("PRAGMA foreign_keys = ON")
+        if user_version == 0:
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            db.commit()
+        _schema_ready.add(connection.path)
+
+
+def connect(database):
+    """Pool connect function for DB_BACKEND = 'sqlite'; database is the file path."""
+    connection = SQLiteConnection(
+        database,
+        cursorclass=ProfilingSQLiteCursor if app.config['QUERY_PROFILING'] else SQLiteCursor,
+        busy_timeout_ms=app.config['SQLITE_BUSY_TIMEOUT_MS'],
+        cached_statements=app.config['SQLITE_CACHED_STATEMENTS'],
+        cache_size_kb=app.config['SQLITE_CACHE_SIZE_KB'],
+        mmap_size=app.config['SQLITE_MMAP_SIZE'],
+    )
+    ensure_schema(connection)
+    return connection
@@ -0,0 +1,206 @@
+from operator import itemgetter
+
+from app import app
+from app import db_utils
+from app import league_utils
+
+# Vectorized league tables for many tournaments at once, for batch jobs (rebuilding
+# or checking every stored table, reporting, recomputing after a rules change).
+#
+# Fixtures are loaded as columns (team ids, scores, winner, tournament) and every
+# standings column is summed per team with np.bincount over the home and away side
+# of all fixtures together, so a batch of thousands of tournaments costs a few array
+# passes instead of one dict-mutation loop per fixture. Tables are then ordered with
+# one np.lexsort over (tournament, points, tiebreakers, name, id).
+#
+# The result is identical to league_utils.calculate_standings_data for each
+# tournament. Tournaments with head-to-head tiebreakers are vectorized up to the
+# totals; their ranking goes through league_utils.rank_standings, which needs the
+# pairwise index.
+#
+# Needs numpy (requirements.txt). It is imported on first use, so the rest of the
+# app still runs on an install without it.
+
+_np = None
+
+
+def _numpy():
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError as e:
+            raise RuntimeError("The batch standings engine requires the 'numpy' package (pip install numpy)") from e
+        _np = numpy
+    return _np
+
+
+def available():
+    try:
+        _numpy()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _column(np, rows, key, null=-1):
+    """
+    One field of every row as an int64 array, and a mask of the rows where it is
+    None (stored as null: -1 for ids, which is never a participant id).
+    """
+    values = list(map(itemgetter(key), rows))
+    try:
+        return np.array(values, dtype=np.int64), np.zeros(len(values), dtype=bool)
+    except TypeError: # Some are None
+        missing = np.array([value is None for value in values], dtype=bool)
+        return np.array([null if value is None else value for value in values], dtype=np.int64), missing
+
+
+def calculate_standings_batch(teams, completed_fixtures, rules=None):
+    """
+    League tables for many tournaments in one call.
+
+    teams: rows with tournament_id, id and name; completed_fixtures: rows with
+    tournament_id, team1_id, team2_id, score1, score2 and winner_id; rules:
+    {tournament_id: league_utils.StandingsRules} (the defaults where missing).
+    Returns {tournament_id: standings}, each list equal to what
+    calculate_standings_data returns for that tournament's teams and fixtures.
+    """
+    np = _numpy()
+    rules = rules or {}
+    teams = list(teams)
+    completed_fixtures = list(completed_fixtures)
+    if not teams:
+        return {}
+
+    # --- Teams, indexed 0..n-1 in input order ---
+    team_ids, _ = _column(np, teams, 'id')
+    team_tournaments, _ = _column(np, teams, 'tournament_id')
+    tournament_ids, team_tournament_index = np.unique(team_tournaments, return_inverse=True)
+    team_count = len(team_ids)
+    id_order = np.argsort(team_ids, kind='stable')
+    sorted_ids = team_ids[id_order]
+
+    def team_index(ids, tournaments):
+        # Position of each id among the teams, or -1 when the id is not one of the
+        # fixture's tournament's teams (calculate_standings_data ignores those)
+        positions = np.searchsorted(sorted_ids, ids)
+        positions = np.minimum(positions, team_count - 1)
+        index = id_order[positions]
+        known = (sorted_ids[positions] == ids) & (team_tournaments[index] == tournaments)
+        return np.where(known, index, -1)
+
+    # --- Points rules per tournament ---
+    tournament_rules = [rules.get(int(tournament_id)) or league_utils.StandingsRules() for tournament_id in tournament_ids]
+    points = {
+        name: np.array([getattr(rule, name) for rule in tournament_rules], dtype=np.int64)
+        for name in ('points_win', 'points_draw', 'points_loss')
+    }
+
+    # --- Fixtures as columns ---
+    fixture_tournaments, _ = _column(np, completed_fixtures, 'tournament_id')
+    team1, _ = _column(np, completed_fixtures, 'team1_id')
+    team2, _ = _column(np, completed_fixtures, 'team2_id')
+    winner, _ = _column(np, completed_fixtures, 'winner_id')
+    score1, score1_missing = _column(np, completed_fixtures, 'score1', null=0) # Missing scores count as 0 goals
+    score2, score2_missing = _column(np, completed_fixtures, 'score2', null=0)
+
+    # Fixtures of tournaments without teams count for nobody
+    fixture_rules = np.searchsorted(tournament_ids, fixture_tournaments)
+    fixture_rules = np.minimum(fixture_rules, len(tournament_ids) - 1)
+    index1 = team_index(team1, fixture_tournaments)
+    index2 = team_index(team2, fixture_tournaments)
+    bye = team2 == -1
+    draw = (winner == -1) & ~score1_missing & ~score2_missing & (score1 == score2)
+
+    # Same branch order as calculate_standings_data, one side at a time
+    win1 = bye | (winner == team1)
+    loss1 = ~win1 & (winner == team2)
+    draw1 = ~win1 & ~loss1 & draw
+    win2 = ~bye & (winner == team2)
+    loss2 = ~bye & ~win2 & (winner == team1)
+    draw2 = ~bye & ~win2 & ~loss2 & draw
+
+    home = index1 >= 0
+    away = (index2 >= 0) & (team2 > 0)
+    side_team = np.concatenate((index1[home], index2[away]))
+    side_rules = np.concatenate((fixture_rules[home], fixture_rules[away]))
+    columns = {
+        'gf': np.concatenate((score1[home], score2[away])),
+        'ga': np.concatenate((score2[home], score1[away])),
+        'w': np.concatenate((win1[home], win2[away])).astype(np.int64),
+        'd': np.concatenate((draw1[home], draw2[away])).astype(np.int64),
+        'l': np.concatenate((loss1[home], loss2[away])).astype(np.int64),
+    }
+    columns['pts'] = (columns['w'] * points['points_win'][side_rules] + columns['d'] * points['points_draw'][side_rules]
+                      + columns['l'] * points['points_loss'][side_rules])
+    # Away goals as league_utils.HeadToHeadIndex counts them: only against an opponent
+    columns['away_gf'] = np.concatenate((np.zeros(int(home.sum()), dtype=np.int64), (score2 * (team1 != -1))[away]))
+
+    totals = {'mp': np.bincount(side_team, minlength=team_count).astype(np.int64)}
+    for name, values in columns.items():
+        # Integer weights sum exactly in float64 far beyond any real goal count
+        totals[name] = np.bincount(side_team, weights=values, minlength=team_count).astype(np.int64)
+    totals['gd'] = totals['gf'] - totals['ga']
+
+    # --- Ranking: tournament, -pts, tiebreakers, name, id ---
+    _, name_rank = np.unique(np.array([team['name'] for team in teams], dtype=object), return_inverse=True)
+    tournament_list = tournament_ids.tolist()
+    team_tournament_list = team_tournaments.tolist()
+    head_to_head = {tournament_list[position]: rule for position, rule in enumerate(tournament_rules)
+                    if league_utils.HEAD_TO_HEAD_TIEBREAKERS.intersection(rule.tiebreakers)}
+
+    standings = {tournament_id: [] for tournament_id in tournament_list}
+    # Tournaments sharing a tiebreaker list are ranked together in one lexsort
+    by_tiebreakers = {}
+    for position, rule in enumerate(tournament_rules):
+        if tournament_list[position] not in head_to_head:
+            by_tiebreakers.setdefault(rule.tiebreakers, []).append(position)
+
+    rows = [
+        {'id': team['id'], 'name': team['name'], 'mp': mp, 'w': w, 'd': d, 'l': l, 'gf': gf, 'ga': ga, 'gd': gd, 'pts': pts}
+        for team, mp, w, d, l, gf, ga, gd, pts in zip(
+            teams, *(totals[name].tolist() for name in ('mp', 'w', 'd', 'l', 'gf', 'ga', 'gd', 'pts')))
+    ]
+    for tiebreakers, positions in by_tiebreakers.items():
+        selected = np.flatnonzero(np.isin(team_tournament_index, positions))
+        # np.lexsort sorts by the last key first
+        keys = [team_ids[selected], name_rank[selected]]
+        keys.extend(-totals[name][selected] for name in reversed(tiebreakers))
+        keys.append(-totals['pts'][selected])
+        keys.append(team_tournament_index[selected])
+        for i in selected[np.lexsort(keys)].tolist():
+            standings[team_tournament_list[i]].append(rows[i])
+
+    if head_to_head:
+        fixtures_by_tournament = {}
+        for fixture in completed_fixtures:
+            if fixture['tournament_id'] in head_to_head:
+                fixtures_by_tournament.setdefault(fixture['tournament_id'], []).append(fixture)
+        for i, tournament_id in enumerate(team_tournament_list):
+            if tournament_id in head_to_head:
+                standings[tournament_id].append(rows[i])
+        for tournament_id, rule in head_to_head.items():
+            fixtures = fixtures_by_tournament.get(tournament_id, [])
+            standings[tournament_id] = league_utils.rank_standings(
+                standings[tournament_id], rule.tiebreakers, lambda fixtures=fixtures: fixtures, **rule.points)
+    return standings
+
+
+def load_standings_batch(cursor, tournament_ids):
+    """Reads the teams, completed fixtures and rules of tournament_ids and returns calculate_standings_batch's result."""
+    repo = db_utils.repository()
+    rules = {row['id']: league_utils.StandingsRules.from_row(row) for row in repo.standings_rules_for(cursor, tournament_ids)}
+    standings = calculate_standings_batch(repo.teams_for(cursor, tournament_ids),
+                                          repo.completed_fixtures_for(cursor, tournament_ids), rules)
+    for tournament_id in tournament_ids:
+        standings.setdefault(tournament_id, []) # No teams
+    return standings
+
+
+def iter_standings_batches(cursor, tournament_ids, batch_size=None):
+    """Yields load_standings_batch results for STANDINGS_BATCH_TOURNAMENTS tournaments at a time."""
+    batch_size = batch_size or app.config['STANDINGS_BATCH_TOURNAMENTS']
+    tournament_ids = list(tournament_ids)
+    for start in range(0, len(tournament_ids), batch_size):
+        yield load_standings_batch(cursor, tournament_ids[start:start + batch_size])
@@ -0,0 +1,127 @@
+from app import db_utils
+from app import league_utils
+
+# Persisted league table, one row per (tournament, participant).
+# Kept up to date by delta whenever a fixture result changes, so viewing the
+# table is a single indexed read instead of a replay of every completed fixture.
+
+STANDINGS_COLUMNS = ('mp', 'w', 'd', 'l', 'gf', 'ga', 'gd', 'pts')
+
+SQL_INSERT_ROW = """
+    INSERT INTO standings (tournament_id, participant_id, mp, w, d, l, gf, ga, gd, pts)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def load_rules(cursor, tournament_id):
+    """The tournament's league_utils.StandingsRules (the defaults if it does not exist)."""
+    return league_utils.StandingsRules.from_row(db_utils.repository().standings_rules(cursor, tournament_id))
+
+
+def load_standings(cursor, tournament_id, rules=None):
+    """
+    Reads the table for a tournament in one query and ranks it with the
+    tournament's tiebreakers (which may read its completed fixtures, on ties).
+    Teams without a standings row yet (no completed matches) show up with zeros.
+    """
+    rules = rules or load_rules(cursor, tournament_id)
+    cursor.execute("""
+        SELECT p.id, p.name,
+               COALESCE(s.mp, 0) AS mp, COALESCE(s.w, 0) AS w, COALESCE(s.d, 0) AS d,
+               COALESCE(s.l, 0) AS l, COALESCE(s.gf, 0) AS gf, COALESCE(s.ga, 0) AS ga,
+               COALESCE(s.gd, 0) AS gd, COALESCE(s.pts, 0) AS pts
+        FROM participants p
+        LEFT JOIN standings s ON s.tournament_id = p.tournament_id AND s.participant_id = p.id
+        WHERE p.tournament_id = %s
+    """, (tournament_id,))
+    return league_utils.rank_standings(
+        cursor.fetchall(), rules.tiebreakers,
+        lambda: db_utils.repository().completed_fixtures(cursor, tournament_id), **rules.points)
+
+
+def apply_fixture_change(cursor, tournament_id, old_fixture, new_fixture):
+    """
+    Moves one fixture's contribution in the standings table: undoes what
+    old_fixture counted for (if it was Completed) and adds what new_fixture
+    counts for (if it is Completed). Both are dicts with team1_id, team2_id,
+    score1, score2, winner_id and status. Runs in the caller's transaction;
+    the caller commits together with the fixture UPDATE.
+    """
+    return apply_fixture_changes(cursor, tournament_id, [(old_fixture, new_fixture)])
+
+
+def apply_fixture_changes(cursor, tournament_id, changes):
+    """
+    apply_fixture_change for many (old_fixture, new_fixture) pairs at once: the
+    deltas are summed per team first, so a whole round costs one batched upsert
+    with at most one row per team.
+    """
+    totals = {}
+    points = None # The tournament's points rules, read once the first completed fixture needs them
+
+    def accumulate(fixture, sign):
+        nonlocal points
+        if not fixture or fixture['status'] != 'Completed':
+            return
+        if points is None:
+            points = load_rules(cursor, tournament_id).points
+        for team_id, delta in league_utils.fixture_standings_delta(fixture, **points).items():
+            row = totals.setdefault(team_id, dict.fromkeys(STANDINGS_COLUMNS, 0))
+            for column in STANDINGS_COLUMNS:
+                row[column] += sign * delta[column]
+
+    for old_fixture, new_fixture in changes:
+        accumulate(old_fixture, -1)
+        accumulate(new_fixture, +1)
+
+    rows = [
+        (tournament_id, team_id) + tuple(row[column] for column in STANDINGS_COLUMNS)
+        for team_id, row in totals.items()
+        if any(row.values()) # Re-saving an unchanged result is a no-op
+    ]
+    if rows:
+        db_utils.repository().upsert_standings_deltas(cursor, rows) # Add-on-conflict upsert
+    return len(rows)
+
+
+def rebuild_standings(cursor, tournament_id):
+    """
+    Recomputes a tournament's table from scratch with
+    league_utils.calculate_standings_data and replaces the stored rows.
+    Used to repair drift, to backfill tournaments created before the table
+    existed and after the tournament's points rules change. The caller commits.
+    """
+    repo = db_utils.repository()
+    rules = load_rules(cursor, tournament_id)
+    teams = repo.list_teams(cursor, tournament_id)
+    completed_fixtures = repo.completed_fixtures(cursor, tournament_id)
+
+    cursor.execute("DELETE FROM standings WHERE tournament_id = %s", (tournament_id,))
+    standings = league_utils.calculate_standings_data(teams, completed_fixtures, **rules.points) if teams else []
+    rows = [
+        (tournament_id, team['id']) + tuple(team[column] for column in STANDINGS_COLUMNS)
+        for team in standings
+    ]
+    if rows:
+        cursor.executemany(SQL_INSERT_ROW, rows)
+    return len(rows)
+
+
+def replace_standings(cursor, standings):
+    """
+    Stores precomputed tables, {tournament_id: standings rows} (as returned by
+    standings_batch), in place of the tournaments' current rows. The caller commits.
+    """
+    if not standings:
+        return 0
+    tournament_ids = list(standings)
+    cursor.execute(f"DELETE FROM standings WHERE tournament_id IN ({', '.join(['%s'] * len(tournament_ids))})",
+                   tournament_ids)
+    rows = [
+        (tournament_id, team['id']) + tuple(team[column] for column in STANDINGS_COLUMNS)
+        for tournament_id, table in standings.items()
+        for team in table
+    ]
+    if rows:
+        cursor.executemany(SQL_INSERT_ROW, rows)
+    return len(rows)
@@ -0,0 +1,107 @@
+// Live score feed client (see app/live.py).
+// Pages opt in with <body data-live-url="...">. Fixture rows / bracket matches carry
+// data-fixture-id, and the cells to patch carry data-live="<field>".
+(function () {
+    var url = document.body && document.body.getAttribute('data-live-url');
+    if (!url || !window.EventSource) {
+        return;
+    }
+
+    function orDash(value) {
+        return value === null || value === undefined ? '-' : String(value);
+    }
+
+    function team2Label(fixture) {
+        return fixture.team2_name || (fixture.status === 'Pending' ? 'TBD' : 'BYE');
+    }
+
+    function setText(container, field, text) {
+        var cell = container.querySelector('[data-live="' + field + '"]');
+        if (cell) {
+            cell.textContent = text;
+        }
+    }
+
+    // Same wording as the match line in knockout_bracket.html
+    function renderResult(cell, fixture) {
+        cell.textContent = '';
+        if (fixture.status !== 'Completed') {
+            cell.appendChild(document.createTextNode('(Status: ' + fixture.status + ')'));
+            return;
+        }
+        cell.appendChild(document.createTextNode(
+            '(Score: ' + orDash(fixture.score1) + ' - ' + orDash(fixture.score2) + ') - Winner: '));
+        var winner = fixture.winner_name || (!fixture.team2_name ? fixture.team1_name : null);
+        if (!winner) {
+            cell.appendChild(document.createTextNode('Draw/TBD'));
+            return;
+        }
+        var strong = document.createElement('strong');
+        strong.textContent = winner;
+        cell.appendChild(strong);
+        if (!fixture.winner_name) {
+            cell.appendChild(document.createTextNode(' (Bye)'));
+        }
+    }
+
+    function patchFixture(fixture) {
+        var nodes = document.querySelectorAll('[data-fixture-id="' + fixture.id + '"]');
+        for (var i = 0; i < nodes.length; i++) {
+            var node = nodes[i];
+            setText(node, 'team1', fixture.team1_name || 'TBD');
+            setText(node, 'team2', team2Label(fixture));
+            setText(node, 'score', orDash(fixture.score1) + ' : ' + orDash(fixture.score2));
+            setText(node, 'status', fixture.status);
+            setText(node, 'winner', fixture.winner_name || '-');
+            var result = node.querySelector('[data-live="result"]');
+            if (result) {
+                renderResult(result, fixture);
+            }
+        }
+    }
+
+    var STANDINGS_COLUMNS = ['name', 'mp', 'w', 'd', 'l', 'gf', 'ga', 'gd', 'pts'];
+
+    function patchStandings(standings) {
+        var body = document.querySelector('[data-live="standings"]');
+        if (!body) {
+            if (standings.length && document.querySelector('[data-live="standings-empty"]')) {
+                reload(); // The page showed "no standings" until now
+            }
+            return;
+        }
+        body.textContent = '';
+        standings.forEach(function (row, index) {
+            var tr = document.createElement('tr');
+            var cells = [index + 1].concat(STANDINGS_COLUMNS.map(function (column) { return row[column]; }));
+            cells.forEach(function (value, position) {
+                var td = document.createElement('td');
+                if (position === cells.length - 1) {
+                    var strong = document.createElement('strong');
+                    strong.textContent = orDash(value);
+                    td.appendChild(strong);
+                } else {
+                    td.textContent = orDash(value);
+                }
+                tr.appendChild(td);
+            });
+            body.appendChild(tr);
+        });
+    }
+
+    function reload() {
+        source.close();
+        window.location.reload();
+    }
+
+    var source = new EventSource(url);
+    source.addEventListener('fixture', function (event) {
+        patchFixture(JSON.parse(event.data)); // No-op on pages that don't show the fixture
+    });
+    source.addEventListener('standings', function (event) {
+        patchStandings(JSON.parse(event.data).standings);
+    });
+    // New fixtures, or events were missed while disconnected: the page is out of date
+    source.addEventListener('round', reload);
+    source.addEventListener('resync', reload);
+})();
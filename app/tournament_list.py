@@ -0,0 +1,86 @@
+import base64
+from datetime import datetime
+
+from app import cache
+
+# Keyset pagination for the tournament list (dashboard and /api/v1/tournaments).
+#
+# Pages are ordered newest first by (created_at, id) and the next page starts
+# strictly after the last row shown, so every page is one index range scan of
+# LIMIT + 1 rows no matter how deep it is (no OFFSET). The sport and format
+# filters have their own (sport|format, created_at, id) indexes (migration 6).
+#
+# The position is passed around as an opaque cursor token: urlsafe base64 of
+# "<created_at ISO>|<id>".
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row):
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Returns (created_at, id) or raises InvalidCursor."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        created_at, tournament_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(tournament_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid page cursor: {token!r}") from e
+
+
+def _filter_sql(sport=None, tournament_format=None):
+    conditions, params = [], []
+    if sport:
+        conditions.append("sport = %s")
+        params.append(sport)
+    if tournament_format:
+        conditions.append("format = %s")
+        params.append(tournament_format)
+    return conditions, params
+
+
+def list_tournaments(cursor, sport=None, tournament_format=None, after=None, limit=25):
+    """
+    Returns (rows, next_cursor) for one page, newest first. `after` is a cursor
+    token from a previous page; next_cursor is None on the last page.
+    """
+    conditions, params = _filter_sql(sport, tournament_format)
+    if after:
+        created_at, tournament_id = decode_cursor(after)
+        # Spelled out rather than (created_at, id) < (%s, %s): MySQL only uses the index range for this form
+        conditions.append("(created_at < %s OR (created_at = %s AND id < %s))")
+        params.extend([created_at, created_at, tournament_id])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor.execute(f"""
+        SELECT id, name, sport, format, created_at
+        FROM tournaments
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+    """, params + [limit + 1])
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
+
+
+def count_tournaments(cursor, sport=None, tournament_format=None):
+    """
+    Number of tournaments matching the filters. Cached until a tournament is created
+    or deleted (see TournamentCache.list_version).
+    """
+    def compute():
+        conditions, params = _filter_sql(sport, tournament_format)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor.execute(f"SELECT COUNT(*) AS total FROM tournaments {where}", params)
+        return cursor.fetchone()['total']
+    return cache.get_tournament_cache().get_or_compute_list('count', (sport or '', tournament_format or ''), compute, cursor)
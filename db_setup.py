@@ -28,7 +28,229 @@ def create_database():
         if 'connection' in locals() and connection.open:
             connection.close()
 
-def create_tables():
+# --- Schema migrations ---
+# Each migration is (version, description, function(cursor)). They run in order and
+# every step is idempotent (IF NOT EXISTS / information_schema checks), because MySQL
+# DDL commits implicitly: a run interrupted between a DDL statement and the
+# schema_version insert must be safe to repeat. Never edit a released migration;
+# append a new one instead.
+
+def index_exists(cursor, table, index_name):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, index_name))
+    return cursor.fetchone() is not None
+
+def column_exists(cursor, table, column_name):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        LIMIT 1
+    """, (table, column_name))
+    return cursor.fetchone() is not None
+
+def create_index_if_missing(cursor, table, index_name, columns_sql):
+    if index_exists(cursor, table, index_name):
+        print(f"  Index '{index_name}' on '{table}' already exists.")
+        return
+    cursor.execute(f"CREATE INDEX `{index_name}` ON `{table}` ({columns_sql})")
+    print(f"  Index '{index_name}' on '{table}' created.")
+
+def add_column_if_missing(cursor, table, column_name, column_sql):
+    if column_exists(cursor, table, column_name):
+        print(f"  Column '{table}.{column_name}' already exists.")
+        return
+    cursor.execute(f"ALTER TABLE `{table}` ADD COLUMN `{column_name}` {column_sql}")
+    print(f"  Column '{table}.{column_name}' added.")
+
+def migration_001_base_tables(cursor):
+    # SQL to create tournaments table
+    create_table_sql = """
+    CREATE TABLE IF NOT EXISTS `tournaments` (
+        `id` INT AUTO_INCREMENT PRIMARY KEY,
+        `name` VARCHAR(255) NOT NULL,
+        `sport` VARCHAR(100) NOT NULL,
+        `format` VARCHAR(50) NOT NULL COMMENT 'e.g., league, knockout',
+        `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """
+    cursor.execute(create_table_sql)
+    print("  Table 'tournaments' created or already exists.")
+
+    # SQL to create participants table
+    create_participants_table_sql = """
+    CREATE TABLE IF NOT EXISTS `participants` (
+        `id` INT AUTO_INCREMENT PRIMARY KEY,
+        `tournament_id` INT,
+        `name` VARCHAR(255) NOT NULL,
+        FOREIGN KEY (`tournament_id`) REFERENCES `tournaments`(`id`) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """
+    cursor.execute(create_participants_table_sql)
+    print("  Table 'participants' created or already exists.")
+
+    # SQL to create fixtures table
+    create_fixtures_table_sql = """
+    CREATE TABLE IF NOT EXISTS `fixtures` (
+        `id` INT AUTO_INCREMENT PRIMARY KEY,
+        `tournament_id` INT,
+        `round_number` INT,
+        `match_number_in_round` INT,
+        `team1_id` INT,
+        `team2_id` INT NULL, 
+        `status` VARCHAR(50) DEFAULT 'Scheduled',
+        `score1` INT NULL,
+        `score2` INT NULL,
+        `winner_id` INT NULL,
+        FOREIGN KEY (`tournament_id`) REFERENCES `tournaments`(`id`) ON DELETE CASCADE,
+        FOREIGN KEY (`team1_id`) REFERENCES `participants`(`id`) ON DELETE SET NULL,
+        FOREIGN KEY (`team2_id`) REFERENCES `participants`(`id`) ON DELETE SET NULL,
+        FOREIGN KEY (`winner_id`) REFERENCES `participants`(`id`) ON DELETE SET NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """
+    cursor.execute(create_fixtures_table_sql)
+    print("  Table 'fixtures' created or already exists.")
+
+def migration_002_standings_table(cursor):
+    # SQL to create the materialized league table (maintained by delta on score entry)
+    create_standings_table_sql = """
+    CREATE TABLE IF NOT EXISTS `standings` (
+        `tournament_id` INT NOT NULL,
+        `participant_id` INT NOT NULL,
+        `mp` INT NOT NULL DEFAULT 0,
+        `w` INT NOT NULL DEFAULT 0,
+        `d` INT NOT NULL DEFAULT 0,
+        `l` INT NOT NULL DEFAULT 0,
+        `gf` INT NOT NULL DEFAULT 0,
+        `ga` INT NOT NULL DEFAULT 0,
+        `gd` INT NOT NULL DEFAULT 0,
+        `pts` INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (`tournament_id`, `participant_id`),
+        FOREIGN KEY (`tournament_id`) REFERENCES `tournaments`(`id`) ON DELETE CASCADE,
+        FOREIGN KEY (`participant_id`) REFERENCES `participants`(`id`) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """
+    cursor.execute(create_standings_table_sql)
+    print("  Table 'standings' created or already exists.")
+    print("  Run 'flask --app run rebuild-standings' to backfill existing league tournaments.")
+
+def migration_003_hot_path_indexes(cursor):
+    # Round scans: MAX(round_number), per-round COUNTs by status and the winners of a round
+    create_index_if_missing(cursor, 'fixtures', 'idx_fixtures_round_status',
+                            '`tournament_id`, `round_number`, `status`, `winner_id`')
+    # Fixture lists ordered by (round_number, match_number_in_round) without a filesort
+    create_index_if_missing(cursor, 'fixtures', 'idx_fixtures_round_order',
+                            '`tournament_id`, `round_number`, `match_number_in_round`')
+    # Completed fixtures for the standings engines, covering every column they read
+    create_index_if_missing(cursor, 'fixtures', 'idx_fixtures_completed',
+                            '`tournament_id`, `status`, `team1_id`, `team2_id`, `score1`, `score2`, `winner_id`')
+    # Team lists sorted by name (the primary key rides along, so id + name is covered)
+    create_index_if_missing(cursor, 'participants', 'idx_participants_tournament_name',
+                            '`tournament_id`, `name`')
+    # Dashboard sorted by creation time
+    create_index_if_missing(cursor, 'tournaments', 'idx_tournaments_created',
+                            '`created_at`, `id`')
+
+def migration_004_bracket_links(cursor):
+    # Full knockout brackets: each fixture points at the match (and slot 1/2) its winner moves into
+    add_column_if_missing(cursor, 'fixtures', 'next_fixture_id', 'INT NULL')
+    add_column_if_missing(cursor, 'fixtures', 'next_slot', 'TINYINT NULL')
+
+def migration_005_tournament_data_version(cursor):
+    # Bumped in the same transaction as every write to a tournament's teams or fixtures;
+    # the tournament pages derive their ETag / Last-Modified headers from it.
+    add_column_if_missing(cursor, 'tournaments', 'data_version', 'INT NOT NULL DEFAULT 0')
+    add_column_if_missing(cursor, 'tournaments', 'updated_at', 'TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP')
+
+def migration_006_tournament_list_filters(cursor):
+    # Keyset pages of the dashboard / API filtered by sport or format, newest first
+    create_index_if_missing(cursor, 'tournaments', 'idx_tournaments_sport_created',
+                            '`sport`, `created_at`, `id`')
+    create_index_if_missing(cursor, 'tournaments', 'idx_tournaments_format_created',
+                            '`format`, `created_at`, `id`')
+
+def migration_007_import_checkpoints(cursor):
+    # Bulk import progress (app/importer.py), committed in the same transaction as the
+    # imported rows so a resumed import neither skips nor repeats records
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS `import_checkpoints` (
+        `import_key` VARCHAR(255) PRIMARY KEY,
+        `kind` VARCHAR(50) NOT NULL,
+        `records_committed` BIGINT NOT NULL DEFAULT 0,
+        `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """)
+    print("  Table 'import_checkpoints' created or already exists.")
+
+def migration_008_fixture_row_version(cursor):
+    # Optimistic concurrency for score entry (app/results.py): every write bumps the
+    # version and result updates only apply while it is the version the scorer saw
+    add_column_if_missing(cursor, 'fixtures', 'version', 'INT NOT NULL DEFAULT 0')
+
+def migration_009_standings_rules(cursor):
+    # Per-tournament points and ordered tiebreakers (see app/league_utils.py)
+    add_column_if_missing(cursor, 'tournaments', 'points_win', 'INT NOT NULL DEFAULT 3')
+    add_column_if_missing(cursor, 'tournaments', 'points_draw', 'INT NOT NULL DEFAULT 1')
+    add_column_if_missing(cursor, 'tournaments', 'points_loss', 'INT NOT NULL DEFAULT 0')
+    add_column_if_missing(cursor, 'tournaments', 'tiebreakers', "VARCHAR(255) NOT NULL DEFAULT 'gd,gf'")
+
+def migration_010_no_id_reuse(cursor):
+    # Nothing to change on MySQL: AUTO_INCREMENT does not hand out the id of a deleted
+    # row again. The SQLite schema needed AUTOINCREMENT for the same guarantee
+    # (app/sqlite_backend.py rebuilds its tables at this version).
+    pass
+
+def migration_011_tournament_uid(cursor):
+    # Random per-row identity, set on insert (repository.new_tournament_uid). Page cache
+    # keys and ETags include it, so a tournament that reuses a deleted one's id (after a
+    # restore, or AUTO_INCREMENT reset by a MySQL 5.7 restart) never matches its entries.
+    add_column_if_missing(cursor, 'tournaments', 'uid', "CHAR(16) NOT NULL DEFAULT ''")
+    cursor.execute("UPDATE tournaments SET uid = SUBSTRING(MD5(CONCAT(id, RAND())), 1, 16) WHERE uid = ''")
+
+def migration_012_list_versions(cursor):
+    # Version counters for cached values derived from a whole table (the dashboard's
+    # tournament counts): bumped in the transaction that creates or deletes a tournament
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS `list_versions` (
+        `name` VARCHAR(50) PRIMARY KEY,
+        `version` BIGINT NOT NULL DEFAULT 0
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """)
+    print("  Table 'list_versions' created or already exists.")
+
+# MySQL only. With DB_BACKEND = 'sqlite' the app creates the equivalent schema itself on
+# first connect (app/sqlite_backend.py); bump its SCHEMA_VERSION along with new migrations.
+MIGRATIONS = [
+    (1, "Base tables: tournaments, participants, fixtures", migration_001_base_tables),
+    (2, "Materialized standings table", migration_002_standings_table),
+    (3, "Composite indexes for fixture, participant and dashboard queries", migration_003_hot_path_indexes),
+    (4, "Knockout bracket links on fixtures", migration_004_bracket_links),
+    (5, "Tournament data version and last-modified marker", migration_005_tournament_data_version),
+    (6, "Indexes for tournament list filters", migration_006_tournament_list_filters),
+    (7, "Bulk import checkpoints", migration_007_import_checkpoints),
+    (8, "Fixture row version for optimistic concurrency", migration_008_fixture_row_version),
+    (9, "Per-tournament points rules and tiebreakers", migration_009_standings_rules),
+    (10, "Ids are never reused after a delete", migration_010_no_id_reuse),
+    (11, "Tournament row identity for cache keys and ETags", migration_011_tournament_uid),
+    (12, "List version counters for cached counts", migration_012_list_versions),
+]
+
+def get_schema_version(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS `schema_version` (
+        `version` INT PRIMARY KEY,
+        `description` VARCHAR(255) NOT NULL,
+        `applied_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """)
+    cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+    row = cursor.fetchone()
+    return row['version'] if row and row['version'] is not None else 0
+
+def migrate(target_version=None):
+    """Applies every pending migration up to target_version (default: latest)."""
     try:
         # Connect specifically to the tournament_db for table creation
         connection = pymysql.connect(
@@ -37,68 +259,38 @@ def create_tables():
             password=DB_PASSWORD,
             database=DB_NAME, # Connect to our specific database
             charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor # Optional, but good for consistency
+            cursorclass=pymysql.cursors.DictCursor
         )
         
         with connection.cursor() as cursor:
-            # SQL to create tournaments table
-            create_table_sql = """
-            CREATE TABLE IF NOT EXISTS `tournaments` (
-                `id` INT AUTO_INCREMENT PRIMARY KEY,
-                `name` VARCHAR(255) NOT NULL,
-                `sport` VARCHAR(100) NOT NULL,
-                `format` VARCHAR(50) NOT NULL COMMENT 'e.g., league, knockout',
-                `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
-            """
-            cursor.execute(create_table_sql)
-            print("Table 'tournaments' created or already exists.")
-
-            # SQL to create participants table
-            create_participants_table_sql = """
-            CREATE TABLE IF NOT EXISTS `participants` (
-                `id` INT AUTO_INCREMENT PRIMARY KEY,
-                `tournament_id` INT,
-                `name` VARCHAR(255) NOT NULL,
-                FOREIGN KEY (`tournament_id`) REFERENCES `tournaments`(`id`) ON DELETE CASCADE
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
-            """
-            cursor.execute(create_participants_table_sql)
-            print("Table 'participants' created or already exists.")
-
-            # SQL to create fixtures table
-            create_fixtures_table_sql = """
-            CREATE TABLE IF NOT EXISTS `fixtures` (
-                `id` INT AUTO_INCREMENT PRIMARY KEY,
-                `tournament_id` INT,
-                `round_number` INT,
-                `match_number_in_round` INT,
-                `team1_id` INT,
-                `team2_id` INT NULL, 
-                `status` VARCHAR(50) DEFAULT 'Scheduled',
-                `score1` INT NULL,
-                `score2` INT NULL,
-                `winner_id` INT NULL,
-                FOREIGN KEY (`tournament_id`) REFERENCES `tournaments`(`id`) ON DELETE CASCADE,
-                FOREIGN KEY (`team1_id`) REFERENCES `participants`(`id`) ON DELETE SET NULL,
-                FOREIGN KEY (`team2_id`) REFERENCES `participants`(`id`) ON DELETE SET NULL,
-                FOREIGN KEY (`winner_id`) REFERENCES `participants`(`id`) ON DELETE SET NULL
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
-            """
-            cursor.execute(create_fixtures_table_sql)
-            print("Table 'fixtures' created or already exists.")
-            
-        connection.commit() # Commit changes for table creation
+            current_version = get_schema_version(cursor)
+            print(f"Current schema version: {current_version}")
+            for version, description, apply_migration in MIGRATIONS:
+                if version <= current_version:
+                    continue
+                if target_version is not None and version > target_version:
+                    break
+                print(f"Applying migration {version}: {description}")
+                apply_migration(cursor)
+                cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                               (version, description))
+                connection.commit() # Record each step as soon as it is applied
+                current_version = version
+            print(f"Schema is at version {current_version}.")
             
     except pymysql.MySQLError as e:
-        print(f"Error connecting to DB '{DB_NAME}' or creating tables: {e}")
-        # Depending on desired behavior, you might want to exit or handle this
+        print(f"Error connecting to DB '{DB_NAME}' or applying migrations: {e}")
+        exit(1)
     finally:
         if 'connection' in locals() and connection.open:
             connection.close()
 
 if __name__ == '__main__':
-    create_database() # Ensure database exists
-    create_tables()   # Create tables within the database
-    print(f"Database '{DB_NAME}' and table 'tournaments' setup process complete.")
+    import argparse
+    parser = argparse.ArgumentParser(description="Create the database and apply schema migrations.")
+    parser.add_argument('--target', type=int, default=None, help="Stop after this schema version")
+    args = parser.parse_args()
 
+    create_database() # Ensure database exists
+    migrate(args.target) # Bring the schema up to date
+    print(f"Database '{DB_NAME}' setup process complete.")
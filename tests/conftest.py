@@ -0,0 +1,54 @@
+import pytest
+
+from app import app as flask_app
+from app import cache
+from app import db_utils
+
+# Tests run against the embedded SQLite backend (DB_BACKEND = 'sqlite'): every test
+# gets a fresh database file, connection pool and page cache. No MySQL server needed.
+
+
+@pytest.fixture
+def app(tmp_path):
+    flask_app.config.update(TESTING=True, DB_BACKEND='sqlite', SQLITE_PATH=str(tmp_path / 'tournament.db'))
+    db_utils._pool = None
+    cache._tournament_cache = None
+    yield flask_app
+    if db_utils._pool is not None:
+        db_utils._pool.close_all()
+    db_utils._pool = None
+    cache._tournament_cache = None
+
+
+@pytest.fixture
+def cursor(app):
+    with app.app_context():
+        connection = db_utils.get_request_connection()
+        with connection.cursor() as cursor:
+            yield cursor
+        connection.commit()
+
+
+def add_league(cursor, team_names, tiebreakers=None, name='League'):
+    """Creates a league tournament with teams; returns (tournament_id, [team ids])."""
+    repo = db_utils.repository()
+    tournament_id = repo.create_tournament(cursor, name, 'Football', 'league')
+    if tiebreakers is not None:
+        repo.update_standings_rules(cursor, tournament_id, 3, 1, 0, ','.join(tiebreakers))
+    return tournament_id, [repo.add_team(cursor, tournament_id, team_name) for team_name in team_names]
+
+
+def add_fixture(cursor, tournament_id, team1_id, team2_id, score1=None, score2=None, status='Completed',
+                winner_id='auto', round_number=1):
+    """Inserts a fixture row as stored; winner_id='auto' decides it from the scores (None on a draw)."""
+    if winner_id == 'auto':
+        winner_id = None
+        if team2_id is None:
+            winner_id = team1_id
+        elif score1 is not None and score2 is not None and score1 != score2:
+            winner_id = team1_id if score1 > score2 else team2_id
+    cursor.execute("""
+        INSERT INTO fixtures (tournament_id, round_number, match_number_in_round, team1_id, team2_id,
+                              status, score1, score2, winner_id)
+        VALUES (%s, %s, 1, %s, %s, %s, %s, %s, %s)
+    """, (tournament_id, round_number, team1_id, team2_id, status, score1, score2, winner_id))
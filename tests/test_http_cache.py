@@ -0,0 +1,35 @@
+from app import db_utils
+from app import exporter
+
+from conftest import add_league
+
+
+def test_reused_id_gets_a_new_etag_and_page(app, cursor):
+    tournament_id, _ = add_league(cursor, ['Alpha'], name='Old League')
+    cursor.connection.commit()
+    client = app.test_client()
+    first = client.get(f'/tournament/{tournament_id}')
+    assert first.status_code == 200 and b'Old League' in first.data
+    assert client.get(f'/tournament/{tournament_id}', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # Another tournament under the same id (as after a restore), at the same data_version
+    db_utils.repository().delete_tournament(cursor, tournament_id)
+    cursor.execute("INSERT INTO tournaments (id, name, sport, format, uid) VALUES (%s, 'New League', 'Chess', 'league', %s)",
+                   (tournament_id, 'a' * 16))
+    cursor.connection.commit()
+    second = client.get(f'/tournament/{tournament_id}', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200 and b'New League' in second.data
+    assert second.headers['ETag'] != first.headers['ETag']
+
+
+def test_restored_tournament_gets_a_new_etag(app, cursor):
+    tournament_id, _ = add_league(cursor, ['Alpha', 'Bravo'])
+    cursor.connection.commit()
+    client = app.test_client()
+    etag = client.get(f'/tournament/{tournament_id}').headers['ETag']
+    lines = ''.join(exporter.iter_export(cursor.connection, 'ndjson', [tournament_id])).splitlines()
+    db_utils.repository().delete_tournament(cursor, tournament_id)
+    cursor.connection.commit()
+    exporter.restore(cursor.connection, lines)
+    response = client.get(f'/tournament/{tournament_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
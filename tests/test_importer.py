@@ -0,0 +1,54 @@
+import io
+import json
+
+from app import db_utils
+from app import importer
+
+from conftest import add_league
+
+
+def ndjson(*records):
+    return io.StringIO(''.join(json.dumps(record) + '\n' for record in records))
+
+
+def test_names_that_are_not_text_are_reported_and_skipped(cursor):
+    tournament_id, (alpha,) = add_league(cursor, ['Alpha'])
+    cursor.connection.commit()
+    records = ndjson(
+        {'tournament_id': tournament_id, 'name': 42},
+        {'tournament_id': tournament_id, 'name': ['Bravo']},
+        {'tournament_id': tournament_id, 'name': {'first': 'Charlie'}},
+        {'tournament_id': tournament_id, 'name': True},
+        {'tournament_id': tournament_id, 'name': None},
+        {'tournament_id': tournament_id, 'name': 'Delta'},
+    )
+    report = importer.Importer(cursor.connection, 'participants', 'test').run(importer.read_records(records, 'ndjson'))
+    assert report.participants_inserted == 2
+    assert [number for number, _ in report.errors] == [2, 3, 4, 5]
+    assert report.errors[0][1] == "name must be text"
+    names = [team['name'] for team in db_utils.repository().list_teams(cursor, tournament_id)]
+    assert names == ['42', 'Alpha', 'Delta']
+
+
+def test_result_with_a_bad_team_name_is_skipped(cursor):
+    tournament_id, _ = add_league(cursor, ['Alpha', 'Bravo'])
+    cursor.connection.commit()
+    records = ndjson(
+        {'tournament_id': tournament_id, 'round': 1, 'team1': 'Alpha', 'team2': ['Bravo'], 'score1': 1, 'score2': 0},
+        {'tournament_id': tournament_id, 'round': 1, 'team1': 'Alpha', 'team2': 'Bravo', 'score1': 2, 'score2': 2},
+    )
+    report = importer.Importer(cursor.connection, 'results', 'test').run(importer.read_records(records, 'ndjson'))
+    assert report.fixtures_inserted == 1
+    assert report.errors == [(1, "team2 must be text")]
+    assert len(db_utils.repository().completed_fixtures(cursor, tournament_id)) == 1
+
+
+def test_upload_reports_bad_records_instead_of_failing(app, cursor):
+    tournament_id, _ = add_league(cursor, ['Alpha'])
+    cursor.connection.commit()
+    body = f'{{"tournament_id": {tournament_id}, "name": 42}}\n{{"tournament_id": {tournament_id}, "name": [1]}}\n'
+    response = app.test_client().post('/admin/import', data={
+        'kind': 'participants', 'file': (io.BytesIO(body.encode()), 'teams.ndjson')})
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['participants_inserted'], report['invalid']) == (1, 1)
@@ -0,0 +1,77 @@
+import pytest
+
+from app import db_utils
+from app import live
+
+from conftest import add_league
+
+
+@pytest.fixture
+def subscribe():
+    subscribers = []
+
+    def subscribe(tournament_id):
+        subscriber = live.broker.subscribe(tournament_id)
+        subscribers.append(subscriber)
+        return subscriber
+    yield subscribe
+    for subscriber in subscribers:
+        live.broker.unsubscribe(subscriber)
+
+
+def events(subscriber):
+    """[(event, id)] of the messages queued for subscriber."""
+    received = []
+    while not subscriber.queue.empty():
+        fields = dict(line.split(': ', 1) for line in subscriber.queue.get_nowait().strip().split('\n'))
+        received.append((fields['event'], int(fields['id'])))
+    return received
+
+
+def data_version(cursor, tournament_id):
+    return db_utils.repository().get_tournament(cursor, tournament_id)['data_version']
+
+
+@pytest.mark.parametrize('tournament_format', ['league', 'knockout'])
+def test_generating_fixtures_sends_a_round_event(app, cursor, subscribe, tournament_format):
+    repo = db_utils.repository()
+    tournament_id = repo.create_tournament(cursor, 'Cup', 'Football', tournament_format)
+    for name in ('Alpha', 'Bravo', 'Charlie'):
+        repo.add_team(cursor, tournament_id, name)
+    cursor.connection.commit()
+    subscriber = subscribe(tournament_id)
+    app.test_client().post(f'/tournament/{tournament_id}/generate_fixtures')
+    assert events(subscriber) == [('round', data_version(cursor, tournament_id))]
+
+
+def test_events_carry_their_own_writes_version(app, cursor, subscribe, monkeypatch):
+    tournament_id, _ = add_league(cursor, ['Alpha', 'Bravo'])
+    cursor.connection.commit()
+    app.test_client().post(f'/tournament/{tournament_id}/generate_fixtures')
+    cursor.execute("SELECT id FROM fixtures WHERE tournament_id = %s", (tournament_id,))
+    fixture_id = cursor.fetchone()['id']
+    before = data_version(cursor, tournament_id)
+
+    # Another write commits between this one's commit and its events being published
+    live_fixtures = db_utils.repository().live_fixtures
+
+    def live_fixtures_after_another_write(repository_cursor, *args):
+        db_utils.touch_tournament(cursor, tournament_id)
+        cursor.connection.commit()
+        return live_fixtures(repository_cursor, *args)
+    monkeypatch.setattr(db_utils.repository(), 'live_fixtures', live_fixtures_after_another_write)
+
+    subscriber = subscribe(tournament_id)
+    response = app.test_client().post(f'/tournament/{tournament_id}/results',
+                                      json={'results': [{'fixture_id': fixture_id, 'score1': 2, 'score2': 0}]})
+    assert response.status_code == 200
+    assert events(subscriber) == [('fixture', before + 1), ('standings', before + 1)]
+
+    # A client that saw those events and reconnects is told it missed the other write
+    with app.test_request_context(headers={'Last-Event-ID': str(before + 1)}):
+        stream = live.stream_response(tournament_id, data_version(cursor, tournament_id)).response
+        try:
+            assert next(stream).startswith('retry:')
+            assert 'event: resync' in next(stream)
+        finally:
+            stream.close()
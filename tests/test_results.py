@@ -0,0 +1,149 @@
+import pytest
+
+from app import db_utils
+from app import league_utils
+from app import results
+from app import standings_store
+
+from conftest import add_fixture, add_league
+
+
+@pytest.mark.parametrize('payload', [[{'fixture_id': 1}], {'results': 5}, {'results': {'fixture_id': 1}}, {}, 'results'])
+def test_results_json_must_be_an_object_with_a_list(app, cursor, payload):
+    tournament_id, (alpha, bravo) = add_league(cursor, ['Alpha', 'Bravo'])
+    add_fixture(cursor, tournament_id, alpha, bravo, status='Scheduled', winner_id=None)
+    cursor.connection.commit()
+    response = app.test_client().post(f'/tournament/{tournament_id}/results', json=payload)
+    assert response.status_code == 400
+    assert 'results' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('item', [5, 'x', [1, 2], {'score1': 1}, {'fixture_id': 'one'}])
+def test_results_json_items_need_a_fixture_id(app, cursor, item):
+    tournament_id, _ = add_league(cursor, ['Alpha', 'Bravo'])
+    cursor.connection.commit()
+    response = app.test_client().post(f'/tournament/{tournament_id}/results', json={'results': [item]})
+    assert response.status_code == 400
+
+
+def generate(app, cursor, tournament_format, team_names):
+    """A tournament with its fixtures generated by the route; returns (tournament_id, {(round, match): fixture})."""
+    repo = db_utils.repository()
+    tournament_id = repo.create_tournament(cursor, 'Cup', 'Football', tournament_format)
+    for name in team_names:
+        repo.add_team(cursor, tournament_id, name)
+    cursor.connection.commit()
+    app.test_client().post(f'/tournament/{tournament_id}/generate_fixtures')
+    return tournament_id, fixtures_of(cursor, tournament_id)
+
+
+def fixtures_of(cursor, tournament_id):
+    cursor.execute("""
+        SELECT id, round_number, match_number_in_round, team1_id, team2_id, score1, score2, winner_id, status,
+               version, next_fixture_id
+        FROM fixtures WHERE tournament_id = %s
+    """, (tournament_id,))
+    return {(row['round_number'], row['match_number_in_round']): row for row in cursor.fetchall()}
+
+
+def enter(cursor, entries, versions=None):
+    batch = results.apply_results(cursor, entries, versions=versions)
+    if batch.errors or batch.conflicts:
+        cursor.connection.rollback()
+    else:
+        cursor.connection.commit()
+    return batch
+
+
+def test_result_from_a_stale_version_is_a_conflict(app, cursor):
+    tournament_id, fixtures = generate(app, cursor, 'league', ['Alpha', 'Bravo'])
+    fixture = fixtures[(1, 1)]
+    assert enter(cursor, {fixture['id']: (1, 0)}, {fixture['id']: fixture['version']}).updated == [fixture['id']]
+
+    # A second scorer still on the page they loaded before that result
+    batch = enter(cursor, {fixture['id']: (0, 2)}, {fixture['id']: fixture['version']})
+    assert batch.updated == [] and list(batch.conflicts) == [fixture['id']]
+    assert (fixtures_of(cursor, tournament_id)[(1, 1)]['score1'], fixtures_of(cursor, tournament_id)[(1, 1)]['score2']) == (1, 0)
+
+    response = app.test_client().post(f'/tournament/{tournament_id}/results', json={
+        'results': [{'fixture_id': fixture['id'], 'score1': 0, 'score2': 2, 'version': fixture['version']}]})
+    assert response.status_code == 409
+    assert response.get_json()['conflicts'][str(fixture['id'])]['score1'] == 1
+
+
+def test_compare_and_swap_update_reports_rows_changed_since_they_were_read(app, cursor):
+    tournament_id, fixtures = generate(app, cursor, 'league', ['Alpha', 'Bravo', 'Charlie', 'Delta'])
+    first, second = fixtures[(1, 1)], fixtures[(1, 2)]
+    enter(cursor, {second['id']: (3, 3)})
+    new_result = {'score1': 1, 'score2': 0, 'winner_id': first['team1_id'], 'status': 'Completed'}
+    conflicts = results.update_results(cursor, {first['id']: new_result, second['id']: dict(new_result, winner_id=second['team1_id'])},
+                                       {first['id']: first['version'], second['id']: second['version']})
+    cursor.connection.rollback()
+    assert list(conflicts) == [second['id']]
+    assert conflicts[second['id']]['score1'] == 3
+
+
+def test_winner_change_into_a_decided_next_match_is_blocked(app, cursor):
+    tournament_id, fixtures = generate(app, cursor, 'knockout', ['Alpha', 'Bravo', 'Charlie', 'Delta'])
+    semi1, semi2, final = fixtures[(1, 1)], fixtures[(1, 2)], fixtures[(2, 1)]
+    enter(cursor, {semi1['id']: (1, 0), semi2['id']: (2, 0)})
+    assert enter(cursor, {final['id']: (3, 1)}).updated == [final['id']]
+
+    batch = enter(cursor, {semi1['id']: (0, 1)})
+    assert batch.blocked == {semi1['id']: final['id']} and semi1['id'] in batch.conflicts
+    stored = fixtures_of(cursor, tournament_id)
+    assert (stored[(1, 1)]['winner_id'], stored[(2, 1)]['team1_id']) == (semi1['team1_id'], semi1['team1_id'])
+
+    # Same winner, other score: nothing moves, so it is allowed
+    assert enter(cursor, {semi1['id']: (2, 0)}).updated == [semi1['id']]
+
+    response = app.test_client().post(f'/tournament/{tournament_id}/results', json={
+        'results': [{'fixture_id': semi1['id'], 'score1': 0, 'score2': 1}]})
+    assert response.status_code == 409
+    assert response.get_json()['blocked'] == {str(semi1['id']): final['id']}
+
+
+def test_clearing_the_next_match_and_changing_the_winner_in_one_batch(app, cursor):
+    tournament_id, fixtures = generate(app, cursor, 'knockout', ['Alpha', 'Bravo', 'Charlie', 'Delta'])
+    semi1, semi2, final = fixtures[(1, 1)], fixtures[(1, 2)], fixtures[(2, 1)]
+    enter(cursor, {semi1['id']: (1, 0), semi2['id']: (2, 0)})
+    enter(cursor, {final['id']: (3, 1)})
+
+    batch = enter(cursor, {final['id']: (None, None), semi1['id']: (0, 1)})
+    assert sorted(batch.updated) == sorted([final['id'], semi1['id']]) and batch.advanced == [final['id']]
+    stored = fixtures_of(cursor, tournament_id)[(2, 1)]
+    assert (stored['team1_id'], stored['team2_id']) == (semi1['team2_id'], semi2['team1_id'])
+    assert (stored['score1'], stored['winner_id'], stored['status']) == (None, None, 'Scheduled')
+
+
+def test_clearing_a_first_round_result_empties_the_next_slot(app, cursor):
+    tournament_id, fixtures = generate(app, cursor, 'knockout', ['Alpha', 'Bravo', 'Charlie', 'Delta'])
+    semi1, semi2, final = fixtures[(1, 1)], fixtures[(1, 2)], fixtures[(2, 1)]
+    enter(cursor, {semi1['id']: (1, 0), semi2['id']: (0, 1)})
+    assert fixtures_of(cursor, tournament_id)[(2, 1)]['status'] == 'Scheduled'
+
+    batch = enter(cursor, {semi1['id']: (None, None)})
+    assert batch.updated == [semi1['id']] and batch.advanced == [final['id']]
+    stored = fixtures_of(cursor, tournament_id)
+    assert (stored[(1, 1)]['status'], stored[(1, 1)]['winner_id']) == ('Scheduled', None)
+    assert (stored[(2, 1)]['team1_id'], stored[(2, 1)]['team2_id'], stored[(2, 1)]['status']) == (None, semi2['team2_id'], 'Pending')
+    assert stored[(2, 1)]['version'] > final['version']
+    assert enter(cursor, {final['id']: (1, 0)}).errors # Waiting for the semi-final again
+
+
+def test_league_results_keep_the_stored_table_in_step(app, cursor):
+    tournament_id, fixtures = generate(app, cursor, 'league', ['Alpha', 'Bravo', 'Charlie', 'Delta'])
+    repo = db_utils.repository()
+
+    def assert_table_matches():
+        expected = league_utils.calculate_standings_data(repo.list_teams(cursor, tournament_id), repo.completed_fixtures(cursor, tournament_id))
+        assert standings_store.load_standings(cursor, tournament_id) == expected
+
+    round1 = [fixture['id'] for key, fixture in sorted(fixtures.items()) if key[0] == 1]
+    enter(cursor, {round1[0]: (2, 1), round1[1]: (0, 0)})
+    assert_table_matches()
+    enter(cursor, {round1[0]: (1, 3)}) # Edited: the old result's points come off
+    assert_table_matches()
+    enter(cursor, {round1[1]: (None, None)}) # Cleared
+    assert_table_matches()
+    assert sum(row['mp'] for row in standings_store.load_standings(cursor, tournament_id)) == 2
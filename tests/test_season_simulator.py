@@ -0,0 +1,72 @@
+import concurrent.futures
+
+import pytest
+
+from app import db_utils
+from app import league_utils
+from app import season_simulator
+
+from conftest import add_fixture, add_league
+
+TEAMS = [{'id': i, 'name': name} for i, name in enumerate(['Alpha', 'Bravo', 'Bravo', 'Delta', 'Echo'], start=1)]
+COMPLETED = [
+    {'team1_id': 1, 'team2_id': 2, 'score1': 2, 'score2': 0, 'winner_id': 1},
+    {'team1_id': 3, 'team2_id': 4, 'score1': 1, 'score2': 1, 'winner_id': None},
+    {'team1_id': 5, 'team2_id': 1, 'score1': 0, 'score2': 3, 'winner_id': 1},
+    {'team1_id': 2, 'team2_id': None, 'score1': None, 'score2': None, 'winner_id': 2},
+]
+REMAINING = [{'team1_id': home, 'team2_id': away} for home in range(1, 6) for away in range(1, 6) if home != away][:14]
+
+
+def model(tiebreakers=league_utils.DEFAULT_TIEBREAKERS):
+    return season_simulator.build_model(TEAMS, COMPLETED, REMAINING, league_utils.StandingsRules(tiebreakers=tiebreakers),
+                                        prior_matches=5)
+
+
+@pytest.mark.parametrize('tiebreakers', [league_utils.DEFAULT_TIEBREAKERS, ('h2h_pts', 'w', 'away_gf')])
+def test_same_seed_same_odds(tiebreakers):
+    first = season_simulator.simulate_season(model(tiebreakers), seasons=3000, seed=7, batch_seasons=500)
+    assert season_simulator.simulate_season(model(tiebreakers), seasons=3000, seed=7, batch_seasons=500) == first
+    assert season_simulator.simulate_season(model(tiebreakers), seasons=3000, seed=8, batch_seasons=500) != first
+
+
+def test_worker_processes_do_not_change_the_odds():
+    in_process = season_simulator.simulate_season(model(), seasons=3000, seed=7, workers=0, batch_seasons=500)
+    assert season_simulator.simulate_season(model(), seasons=3000, seed=7, workers=3, batch_seasons=500) == in_process
+
+
+def test_odds_are_probabilities():
+    odds = season_simulator.simulate_season(model(), seasons=2000, seed=1, batch_seasons=300)
+    assert odds['seasons'] == 2000 and odds['remaining_fixtures'] == len(REMAINING)
+    for team in odds['teams']:
+        assert sum(team['positions']) == pytest.approx(1)
+        assert team['title'] == team['positions'][0]
+    for position in range(len(TEAMS)):
+        assert sum(team['positions'][position] for team in odds['teams']) == pytest.approx(1)
+
+
+def test_finished_season_is_certain():
+    table = league_utils.calculate_standings_data(TEAMS, COMPLETED)
+    odds = season_simulator.simulate_season(season_simulator.build_model(TEAMS, COMPLETED, []), seasons=100, seed=3)
+    assert [team['id'] for team in odds['teams']] == [row['id'] for row in table]
+    assert [team['positions'] for team in odds['teams']] == [[float(i == j) for j in range(len(TEAMS))] for i in range(len(TEAMS))]
+    assert [team['expected_pts'] for team in odds['teams']] == [row['pts'] for row in table]
+
+
+def test_odds_page_simulates_in_process(app, monkeypatch):
+    # SIMULATION_WORKERS is for the simulate-season command; a page view never starts a process pool
+    def no_pool(*args, **kwargs):
+        raise AssertionError('a web request started a process pool')
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', no_pool)
+    for key, value in (('SIMULATION_WORKERS', 4), ('SIMULATION_SEASONS', 2000), ('SIMULATION_BATCH_SEASONS', 500)):
+        monkeypatch.setitem(app.config, key, value)
+    with app.app_context():
+        connection = db_utils.get_request_connection()
+        with connection.cursor() as cursor:
+            tournament_id, (a, b, c) = add_league(cursor, ['Alpha', 'Bravo', 'Charlie'])
+            add_fixture(cursor, tournament_id, a, b, 1, 0)
+            add_fixture(cursor, tournament_id, b, c, None, None, status='Scheduled', winner_id=None)
+        connection.commit()
+    response = app.test_client().get(f'/api/v1/tournaments/{tournament_id}/standings/odds')
+    assert response.status_code == 200
+    assert response.get_json()['seasons'] == 2000
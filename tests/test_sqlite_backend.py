@@ -0,0 +1,45 @@
+import sqlite3
+
+from app import db_utils
+from app import sqlite_backend
+
+
+def test_ids_are_not_reused_after_a_delete(cursor):
+    repo = db_utils.repository()
+    old_id = repo.create_tournament(cursor, 'Old', 'Football', 'league')
+    old_team = repo.add_team(cursor, old_id, 'Alpha')
+    repo.delete_tournament(cursor, old_id)
+    new_id = repo.create_tournament(cursor, 'New', 'Football', 'league')
+    assert new_id > old_id
+    assert repo.add_team(cursor, new_id, 'Alpha') > old_team
+
+
+def test_upgrade_from_version_9_keeps_rows_and_stops_id_reuse(tmp_path):
+    path = str(tmp_path / 'v9.db')
+    db = sqlite3.connect(path)
+    db.executescript(sqlite_backend.SCHEMA.replace(' AUTOINCREMENT', ''))
+    db.execute("PRAGMA user_version = 9")
+    db.execute("INSERT INTO tournaments (name, sport, format) VALUES ('Kept', 'Football', 'league'), ('Last', 'Chess', 'league')")
+    db.execute("INSERT INTO participants (tournament_id, name) VALUES (1, 'Alpha'), (1, 'Bravo'), (2, 'Charlie')")
+    db.execute("INSERT INTO fixtures (tournament_id, team1_id, team2_id, status, score1, score2, winner_id) VALUES (1, 1, 2, 'Completed', 2, 1, 1)")
+    db.execute("INSERT INTO standings (tournament_id, participant_id, mp, pts) VALUES (1, 1, 1, 3)")
+    db.commit()
+    db.close()
+
+    connection = sqlite_backend.SQLiteConnection(path)
+    sqlite_backend.ensure_schema(connection)
+    db = connection._db
+    assert db.execute("PRAGMA user_version").fetchone()['user_version'] == sqlite_backend.SCHEMA_VERSION
+    assert db.execute("PRAGMA foreign_keys").fetchone()['foreign_keys'] == 1
+    assert [row['name'] for row in db.execute("SELECT name FROM participants ORDER BY id")] == ['Alpha', 'Bravo', 'Charlie']
+    assert db.execute("SELECT winner_id FROM fixtures").fetchone()['winner_id'] == 1
+    assert db.execute("SELECT pts FROM standings").fetchone()['pts'] == 3
+    assert db.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_fixtures_completed'").fetchone()
+    uids = [row['uid'] for row in db.execute("SELECT uid FROM tournaments")]
+    assert all(len(uid) == 16 for uid in uids) and uids[0] != uids[1]
+
+    db.execute("DELETE FROM tournaments WHERE id = 2")
+    assert db.execute("INSERT INTO tournaments (name, sport, format) VALUES ('New', 'Chess', 'league')").lastrowid == 3
+    db.execute("DELETE FROM tournaments WHERE id = 1") # The foreign keys still cascade
+    assert db.execute("SELECT COUNT(*) AS n FROM fixtures").fetchone()['n'] == 0
+    connection.close()
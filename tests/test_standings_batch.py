@@ -0,0 +1,94 @@
+import pytest
+
+from app import league_utils
+from app import standings_batch
+
+# calculate_standings_batch must return, for every tournament in the batch, exactly
+# what calculate_standings_data returns for that tournament alone.
+
+
+def fixture(tournament_id, team1_id, team2_id, score1=None, score2=None, winner_id='auto'):
+    if winner_id == 'auto':
+        winner_id = None
+        if team2_id is None:
+            winner_id = team1_id
+        elif score1 is not None and score2 is not None and score1 != score2:
+            winner_id = team1_id if score1 > score2 else team2_id
+    return {'tournament_id': tournament_id, 'team1_id': team1_id, 'team2_id': team2_id,
+            'score1': score1, 'score2': score2, 'winner_id': winner_id}
+
+
+def teams_of(tournament_id, *names, first_id):
+    return [{'tournament_id': tournament_id, 'id': first_id + i, 'name': name} for i, name in enumerate(names)]
+
+
+def byes():
+    teams = teams_of(1, 'Alpha', 'Beta', 'Gamma', first_id=1)
+    return teams, [fixture(1, 1, None), fixture(1, 2, None), fixture(1, 3, 1, 2, 0), fixture(1, 2, 3, 1, 1)], {}
+
+
+def missing_scores():
+    teams = teams_of(1, 'Alpha', 'Beta', 'Gamma', first_id=1)
+    fixtures = [fixture(1, 1, 2, 2, None, winner_id=1), fixture(1, 2, 3, None, None, winner_id=None),
+                fixture(1, 3, 1, None, 1, winner_id=1), fixture(1, 1, 3, 0, 0)]
+    return teams, fixtures, {}
+
+
+def foreign_team_ids():
+    # Fixtures naming another tournament's team, or no team at all
+    teams = teams_of(1, 'Alpha', 'Beta', first_id=1) + teams_of(2, 'Alpha', 'Beta', first_id=3)
+    fixtures = [fixture(1, 1, 3, 2, 0), fixture(1, 4, 2, 1, 1), fixture(1, 99, 1, 3, 1), fixture(1, 1, 2, 1, 0),
+                fixture(2, 3, 4, 0, 2), fixture(2, 3, 1, 5, 5), fixture(3, 1, 2, 4, 0)]
+    return teams, fixtures, {}
+
+
+def head_to_head_fallback():
+    # Five teams level on points: head-to-head separates two of them, the 1-0 cycle
+    # between the other three falls through to gf, then name and id
+    teams = teams_of(1, 'Bravo', 'Bravo', 'Alpha', 'Delta', 'Echo', 'Foxtrot', first_id=1)
+    fixtures = [fixture(1, 1, 2, 1, 0), fixture(1, 2, 3, 1, 0), fixture(1, 3, 1, 1, 0),
+                fixture(1, 4, 5, 1, 0), fixture(1, 5, 6, 3, 0)]
+    rules = {1: league_utils.StandingsRules(tiebreakers=('h2h_pts', 'h2h_gd', 'h2h_away_gf', 'gf'))}
+    return teams, fixtures, rules
+
+
+def mixed_tiebreaker_groups():
+    # One batch where each tournament has its own points rules and tiebreakers,
+    # with head-to-head blocks before, between and after the plain columns
+    teams, fixtures, rules = [], [], {}
+    rule_sets = [
+        league_utils.StandingsRules(),
+        league_utils.StandingsRules(2, 1, 0, ('w', 'away_gf')),
+        league_utils.StandingsRules(3, 1, 0, ('h2h_pts', 'gd', 'h2h_gf')),
+        league_utils.StandingsRules(3, 0, -1, ('gd', 'h2h_away_gf', 'h2h_pts', 'gf')),
+        league_utils.StandingsRules(1, 1, 1, ()),
+    ]
+    for position, rule in enumerate(rule_sets):
+        tournament_id = 10 + position
+        first_id = 100 * (position + 1)
+        teams.extend(teams_of(tournament_id, 'Echo', 'Alpha', 'Alpha', 'Kilo', first_id=first_id))
+        a, b, c, d = range(first_id, first_id + 4)
+        fixtures.extend([fixture(tournament_id, a, b, position, 1), fixture(tournament_id, c, d, 1, position % 2),
+                         fixture(tournament_id, b, c, 2, 2), fixture(tournament_id, d, a, 0, position),
+                         fixture(tournament_id, a, None)])
+        rules[tournament_id] = rule
+    return teams, fixtures, rules
+
+
+@pytest.mark.parametrize('scenario', [byes, missing_scores, foreign_team_ids, head_to_head_fallback, mixed_tiebreaker_groups])
+def test_batch_matches_calculate_standings_data(scenario):
+    teams, fixtures, rules = scenario()
+    batch = standings_batch.calculate_standings_batch(teams, fixtures, rules)
+    tournament_ids = {team['tournament_id'] for team in teams}
+    assert set(batch) == tournament_ids
+    for tournament_id in tournament_ids:
+        rule = rules.get(tournament_id) or league_utils.StandingsRules()
+        expected = league_utils.calculate_standings_data(
+            [{'id': team['id'], 'name': team['name']} for team in teams if team['tournament_id'] == tournament_id],
+            [row for row in fixtures if row['tournament_id'] == tournament_id],
+            tiebreakers=rule.tiebreakers, **rule.points)
+        assert batch[tournament_id] == expected
+
+
+def test_batch_without_teams():
+    assert standings_batch.calculate_standings_batch([], [fixture(1, 1, 2, 1, 0)]) == {}
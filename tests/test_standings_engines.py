@@ -0,0 +1,71 @@
+import pytest
+
+from app import db_utils
+from app import league_utils
+
+from conftest import add_fixture, add_league
+
+# calculate_standings_sql must return exactly what the reference calculate_standings_data
+# computes from the same rows, whatever the tiebreakers.
+
+TIEBREAKER_SETS = [
+    (),
+    league_utils.DEFAULT_TIEBREAKERS,
+    ('w', 'away_gf'),
+    ('h2h_pts', 'h2h_gd', 'gd'),
+    ('gd', 'h2h_away_gf', 'gf', 'h2h_pts'),
+]
+POINTS = [
+    {'points_win': 3, 'points_draw': 1, 'points_loss': 0},
+    {'points_win': 2, 'points_draw': 1, 'points_loss': -1},
+]
+
+
+def seed_league(cursor, tiebreakers):
+    # Two pairs of teams share a name, so only the id separates them once level
+    tournament_id, (a, b, c, d, e, f) = add_league(cursor, ['Alpha', 'Beta', 'Beta', 'Delta', 'Echo', 'Echo'], tiebreakers)
+    add_fixture(cursor, tournament_id, a, b, 1, 1) # Draws
+    add_fixture(cursor, tournament_id, c, d, 0, 0)
+    add_fixture(cursor, tournament_id, e, f, 2, 2)
+    add_fixture(cursor, tournament_id, a, None) # Byes
+    add_fixture(cursor, tournament_id, d, None)
+    add_fixture(cursor, tournament_id, b, c, 3, None, winner_id=b) # Missing scores
+    add_fixture(cursor, tournament_id, d, e, None, None, winner_id=None)
+    add_fixture(cursor, tournament_id, f, a, 2, 1) # Ordinary results
+    add_fixture(cursor, tournament_id, c, e, 1, 2)
+    add_fixture(cursor, tournament_id, b, f, 0, 1)
+    add_fixture(cursor, tournament_id, a, c, 4, 0, status='Scheduled', winner_id=None) # Not played yet
+    # Another tournament's results must not leak in
+    other_id, (x, y) = add_league(cursor, ['Alpha', 'Beta'], name='Other')
+    add_fixture(cursor, other_id, x, y, 5, 0)
+    return tournament_id
+
+
+def seed_level_teams(cursor, tiebreakers):
+    # Four teams with identical records under every tiebreaker, two of them sharing a name
+    tournament_id, (a, b, c, d) = add_league(cursor, ['Zulu', 'Mike', 'Mike', 'Alpha'], tiebreakers)
+    add_fixture(cursor, tournament_id, a, b, 1, 1)
+    add_fixture(cursor, tournament_id, c, d, 1, 1)
+    add_fixture(cursor, tournament_id, b, a, 1, 1)
+    add_fixture(cursor, tournament_id, d, c, 1, 1)
+    return tournament_id
+
+
+@pytest.mark.parametrize('seed', [seed_league, seed_level_teams])
+@pytest.mark.parametrize('points', POINTS)
+@pytest.mark.parametrize('tiebreakers', TIEBREAKER_SETS)
+def test_sql_standings_match_python_standings(cursor, seed, points, tiebreakers):
+    tournament_id = seed(cursor, tiebreakers)
+    repo = db_utils.repository()
+    expected = league_utils.calculate_standings_data(repo.list_teams(cursor, tournament_id), repo.completed_fixtures(cursor, tournament_id),
+                                                     tiebreakers=tiebreakers, **points)
+    assert league_utils.calculate_standings_sql(cursor, tournament_id, tiebreakers=tiebreakers, **points) == expected
+
+
+def test_sql_standings_without_results(cursor):
+    tournament_id, _ = add_league(cursor, ['Beta', 'Alpha', 'Alpha'])
+    repo = db_utils.repository()
+    standings = league_utils.calculate_standings_sql(cursor, tournament_id)
+    assert standings == league_utils.calculate_standings_data(repo.list_teams(cursor, tournament_id), [])
+    assert [row['name'] for row in standings] == ['Alpha', 'Alpha', 'Beta']
+    assert all(row['mp'] == row['pts'] == 0 for row in standings)
@@ -0,0 +1,33 @@
+from app import db_utils
+
+
+def totals(client):
+    return {sport: client.get(f'/api/v1/tournaments?sport={sport}').get_json()['total'] for sport in ('Football', 'Chess')}
+
+
+def test_cached_counts_follow_creates_and_deletes(app, cursor):
+    repo = db_utils.repository()
+    repo.create_tournament(cursor, 'Spring Cup', 'Football', 'league')
+    newest_id = repo.create_tournament(cursor, 'Summer Cup', 'Football', 'league')
+    cursor.connection.commit()
+    client = app.test_client()
+    assert totals(client) == {'Football': 2, 'Chess': 0}
+
+    # As many tournaments as before, but not in the same sports
+    repo.delete_tournament(cursor, newest_id)
+    repo.create_tournament(cursor, 'Open', 'Chess', 'league')
+    cursor.connection.commit()
+    assert totals(client) == {'Football': 1, 'Chess': 1}
+
+
+def test_list_version_moves_only_when_tournaments_come_and_go(cursor):
+    repo = db_utils.repository()
+    start = repo.tournament_list_version(cursor)
+    tournament_id = repo.create_tournament(cursor, 'Cup', 'Football', 'knockout')
+    repo.add_team(cursor, tournament_id, 'Alpha')
+    db_utils.touch_tournament(cursor, tournament_id)
+    assert repo.tournament_list_version(cursor) == start + 1
+    assert not repo.delete_tournament(cursor, tournament_id + 1)
+    assert repo.tournament_list_version(cursor) == start + 1
+    repo.delete_tournament(cursor, tournament_id)
+    assert repo.tournament_list_version(cursor) == start + 2